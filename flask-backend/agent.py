@@ -0,0 +1,357 @@
+"""Per-node plant agent, configured from plants.json.
+
+    python agent.py --node pi2
+
+Every plant attached to the node gets a PlantNode: its moisture driver is
+sampled on a background thread, raw samples go to
+data/raw/moisture-<id>.ring and one aggregated row per window is handed to
+`on_window`. The hub (app.py) runs PlantNodes for its own plants; run
+standalone, the agent spools the rows to Azure itself, uploads camera
+captures to the hub's /upload_image/<id> and serves
+
+    POST /capture/<id>               capture and upload now
+    GET  /sensor/moisture/<id>       newest filtered reading
+    GET  /sensor/raw/moisture-<id>   raw samples
+    GET  /sensor/trends              drying rate, forecast and glitches per plant
+    GET  /health                     sensors, cameras and Azure clients: state, init time, errors
+    GET  /metrics                    Prometheus metrics, /metrics/traces for slow requests
+
+so the hub can fan out to any number of nodes with the same calls.
+
+Drivers (plants.json "moisture"):
+    {"driver": "seesaw", "address": 54}                          Adafruit STEMMA soil sensor on I2C
+    {"driver": "serial", "port": "/dev/ttyACM0", "poll": "R"}    Arduino answering `poll` with one reading
+Either may set "sample_rate" (Hz) and "window" (seconds per Azure row).
+"""
+import argparse
+import datetime
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from flask import Flask, Response, jsonify, request
+
+from peer_client import PeerClient
+from plants import PlantRegistry
+from column_store import ColumnStore
+from components import COMPONENTS
+from metrics import CONTENT_TYPE, REGISTRY, install, instrument, render, slow_traces, span
+from sampling import RingBuffer, WindowAggregator, window_columns, window_entity, window_values
+from sensor_sampler import Sample, SensorSampler
+from serial_reader import SerialReader
+
+SAMPLE_RATE = 1.0
+SOIL_WINDOW = 5
+MOISTURE_WINDOW = 60
+RAW_FOLDER = os.path.join("data", "raw")
+RAW_SECONDS = 6 * 3600
+COLUMN_FOLDER = os.path.join("data", "columns")
+SEESAW_ADDRESS = 0x36
+CAPTURE_INTERVAL = 60
+UPLOAD_TIMEOUT = 10
+
+MOISTURE_TABLE_SAS_URL = "key"
+ROLLUP_TABLE_SAS_URL = "key"
+
+
+# Driver libraries are imported when a plant needs them, so a node without
+# I2C (or without a serial sensor) doesn't need them installed.
+# Every driver call is timed into /metrics, every open attempt shows in /health.
+def open_seesaw(address=SEESAW_ADDRESS):
+    def create():
+        import board
+        from adafruit_seesaw.seesaw import Seesaw
+        with span("i2c", f"seesaw-{address}", "open"):
+            return instrument(Seesaw(board.I2C(), addr=address), "i2c", f"seesaw-{address}")
+    return COMPONENTS.open(f"seesaw-{address}", create)
+
+
+def open_serial_port(port, baudrate=9600):
+    def create():
+        import serial
+        with span("serial", port, "open"):
+            return instrument(serial.Serial(port, baudrate, timeout=1), "serial", port)
+    return COMPONENTS.open(f"serial-{port}", create)
+
+
+def open_camera(index):
+    def create():
+        import cv2
+        with span("camera", f"camera-{index}", "open"):
+            camera = cv2.VideoCapture(index)
+            # Keep only the newest frame queued so reads are never stale.
+            camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return instrument(camera, "camera", f"camera-{index}")
+    return COMPONENTS.open(f"camera-{index}", create)
+
+
+def open_table(url, name):
+    from azure.data.tables import TableClient
+    return instrument(TableClient.from_table_url(url), "azure_table", name)
+
+
+class PlantNode:
+    """Moisture sampling, raw buffers and windowed rows for one local plant.
+
+    `on_window(plant, stats)` receives every finished window. With a
+    TrendEngine tracking `moisture-<id>`, readings carry its trend and the
+    status comes from its hysteresis state.
+    """
+
+    def __init__(self, plant, on_window, raw_folder=RAW_FOLDER, trends=None):
+        self.plant = plant
+        self.trends = trends
+        config = plant.moisture
+        rate = config.get("sample_rate", SAMPLE_RATE)
+        self.windows = WindowAggregator(lambda stats: on_window(plant, stats), ("moisture",),
+                                        window=config.get("window", MOISTURE_WINDOW))
+        self.raw = {f"moisture-{plant.id}": self._buffer(raw_folder, f"moisture-{plant.id}", rate)}
+
+        driver = config.get("driver")
+        if driver == "seesaw":
+            self.raw[f"soil-temperature-{plant.id}"] = self._buffer(
+                raw_folder, f"soil-temperature-{plant.id}", rate)
+            address = config.get("address", SEESAW_ADDRESS)
+            # Only the sampler thread touches the I2C bus; readers get its filtered window.
+            self.source = SensorSampler(lambda: open_seesaw(address), sample_rate=rate,
+                                        window=SOIL_WINDOW, on_sample=self._record_sample)
+        elif driver == "serial":
+            poll = config.get("poll")
+            self.source = SerialReader(lambda: open_serial_port(config["port"], config.get("baudrate", 9600)),
+                                       poll=poll.encode() if poll else None, poll_interval=1.0 / rate,
+                                       name=f"PLANT {plant.id}", on_reading=self._record_reading)
+        else:
+            raise ValueError(f"Plant {plant.id} has unknown moisture driver {driver!r}")
+
+    @staticmethod
+    def _buffer(raw_folder, series, rate):
+        return RingBuffer(int(rate * RAW_SECONDS), os.path.join(raw_folder, f"{series}.ring"))
+
+    def start(self):
+        self.source.start()
+
+    def stop(self):
+        self.source.stop()
+        self.windows.flush()
+
+    def _record_sample(self, sample):
+        self.raw[f"moisture-{self.plant.id}"].append(sample.taken_at, sample.moisture)
+        self.raw[f"soil-temperature-{self.plant.id}"].append(sample.taken_at, sample.temperature)
+        self.windows.add(sample.taken_at, {"moisture": sample.moisture})
+
+    def _record_reading(self, reading):
+        self.raw[f"moisture-{self.plant.id}"].append(reading.taken_at, reading.value)
+        self.windows.add(reading.taken_at, {"moisture": reading.value})
+
+    def latest(self):
+        """Newest Sample (temperature is None for serial sensors), or None if stale."""
+        reading = self.source.latest()
+        if reading is None or isinstance(reading, Sample):
+            return reading
+        return Sample(reading.value, None, reading.taken_at)
+
+    def reading(self):
+        """JSON body for /sensor/moisture/<id>."""
+        sample = self.latest()
+        trend = self.trends.trend(f"moisture-{self.plant.id}") if self.trends else None
+        status = self.plant.status(sample.moisture) if sample else None
+        return {
+            "plant_id": self.plant.id,
+            "moisture": sample.moisture if sample else None,
+            "temperature": round(sample.temperature, 2) if sample and sample.temperature is not None else None,
+            "status": trend["state"] if trend and sample else status,
+            "trend": trend,
+        }
+
+    def stats(self):
+        return {"windows": self.windows.windows, **self.source.stats()}
+
+
+# Standalone agent: filled in by main()
+app = Flask(__name__)
+install(app)
+local_plants = {}
+plant_nodes = {}
+cameras = {}
+capture_locks = {}
+hub_url = None
+hub = None
+trends = None
+
+
+def capture_and_upload(plant):
+    """Capture a picture of `plant` and upload it to the hub; returns the hub's answer or None."""
+    import cv2
+    with capture_locks[plant.camera], span("camera", f"camera-{plant.camera}", "capture"):
+        frame, _ = cameras[plant.camera].capture()
+    if frame is None:
+        print(f"[ERROR] Failed to capture image for Plant {plant.id}")
+        return None
+
+    success, imgbuf = cv2.imencode('.jpg', frame)
+    if not success:
+        print("[ERROR] Encoding failed")
+        return None
+
+    files = {'file': (f'plant_{plant.id}.jpg', imgbuf.tobytes(), 'image/jpeg')}
+    try:
+        r = hub.post(f"{hub_url}/upload_image/{plant.id}", files=files, timeout=UPLOAD_TIMEOUT)
+        r.raise_for_status()
+        print(f"[INFO] Uploaded image of Plant {plant.id}")
+        return r.json()
+    except Exception as e:
+        print(f"[ERROR] Upload failed: {e}")
+        return None
+
+
+def capture_loop(plants):
+    """Capture every camera plant every CAPTURE_INTERVAL seconds."""
+    while True:
+        for plant in plants:
+            capture_and_upload(plant)
+        time.sleep(CAPTURE_INTERVAL)
+
+
+def not_found(message):
+    return jsonify({"status": "error", "message": message}), 404
+
+
+@app.route('/capture/<int:plant_id>', methods=['POST'])
+def capture(plant_id):
+    plant = local_plants.get(plant_id)
+    if plant is None:
+        return not_found(f"Plant {plant_id} is not on this node")
+    if plant.camera is None:
+        return not_found(f"Plant {plant_id} has no camera")
+    result = capture_and_upload(plant)
+    if result is None:
+        return jsonify({"status": "error", "message": "Capture or upload failed"}), 500
+    return jsonify(result), 202
+
+
+@app.route('/sensor/moisture/<int:plant_id>')
+def get_moisture(plant_id):
+    node = plant_nodes.get(plant_id)
+    if node is None:
+        return not_found(f"Plant {plant_id} has no moisture sensor on this node")
+    return jsonify(node.reading())
+
+
+@app.route('/sensor/raw/moisture-<int:plant_id>')
+def get_raw_moisture(plant_id):
+    """Raw moisture samples: ?since=<unix time>&limit=<n>."""
+    node = plant_nodes.get(plant_id)
+    if node is None:
+        return not_found(f"Plant {plant_id} has no moisture sensor on this node")
+    series = f"moisture-{plant_id}"
+    ts, values = node.raw[series].samples(request.args.get("since", type=float),
+                                          request.args.get("limit", default=10000, type=int))
+    return jsonify({"series": series, "count": len(ts), "t": ts, "v": values})
+
+
+@app.route('/sensor/trends')
+def get_trends():
+    if trends is None:
+        return jsonify({})
+    return jsonify(trends.analyze())
+
+
+@app.route('/health')
+def health():
+    return jsonify({**COMPONENTS.health(),
+                    "plants": {plant_id: node.stats() for plant_id, node in plant_nodes.items()}})
+
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(render(), mimetype=CONTENT_TYPE)
+
+
+@app.route('/metrics/traces')
+def get_slow_traces():
+    return jsonify(list(slow_traces))
+
+
+def main(argv=None):
+    global hub_url, hub, trends
+    from camera import CaptureWorker
+    from rollups import RollupWriter
+    from row_keys import make_row_key
+    from telemetry_writer import TelemetryWriter
+    from trends import TrendEngine
+
+    parser = argparse.ArgumentParser(description="Run the plants configured for one node.")
+    parser.add_argument("--node", required=True, help="node name in plants.json")
+    parser.add_argument("--config", default=None, help="path to plants.json")
+    args = parser.parse_args(argv)
+
+    registry = PlantRegistry.load(args.config) if args.config else PlantRegistry.load()
+    if args.node not in registry.nodes:
+        parser.error(f"unknown node {args.node!r}")
+    hub_url = registry.nodes[registry.hub]
+    # Keep-alive connections to the hub; uploads fail fast while it is down.
+    hub = PeerClient(pool_size=2)
+
+    moisture_table_client = COMPONENTS.lazy("azure-table-moisture",
+                                            lambda: open_table(MOISTURE_TABLE_SAS_URL, "moisture"))
+    rollup_table_client = COMPONENTS.lazy("azure-table-rollups", lambda: open_table(ROLLUP_TABLE_SAS_URL, "rollups"))
+    # Readings are spooled locally and shipped in batches, so a network outage loses nothing.
+    os.makedirs("data", exist_ok=True)
+    telemetry = TelemetryWriter(os.path.join("data", f"{args.node}_spool.db"),
+                                {"moisture": moisture_table_client, "rollups": rollup_table_client})
+    telemetry.start()
+    rollup_writer = RollupWriter(rollup_table_client, spool=telemetry)
+    column_store = ColumnStore(COLUMN_FOLDER)
+    trends = TrendEngine(column_store)
+
+    def send_moisture_data(plant, stats):
+        """Queue one aggregated moisture row for the Azure Table."""
+        moisture = stats.fields["moisture"]
+        print(f"[MOISTURE] Plant {plant.id}: {moisture.mean:.0f} over {moisture.count} samples")
+        data = window_entity(f"Plant{plant.id}", make_row_key(stats.start), stats)
+        data["Status"] = plant.status(data["moisture"])
+        timestamp_str = datetime.datetime.fromtimestamp(stats.start).isoformat() + "Z"
+        try:
+            telemetry.append("moisture", data)
+            rollup_writer.record(f"Plant{plant.id}", stats.start, {"moisture": data["moisture"]})
+            column_store.append(f"moisture-{plant.id}", stats.start, window_values(stats))
+            print(f"[AZURE] Data queued at {timestamp_str}")
+        except Exception as e:
+            print(f"[AZURE] Error queueing data: {e}")
+
+    plants = registry.on_node(args.node)
+    for plant in plants:
+        local_plants[plant.id] = plant
+        if plant.moisture:
+            column_store.create(f"moisture-{plant.id}", window_columns(["moisture"]))
+            trends.track(f"moisture-{plant.id}", f"moisture-{plant.id}", "moisture", threshold=plant.threshold)
+            plant_nodes[plant.id] = PlantNode(plant, send_moisture_data, trends=trends)
+            plant_nodes[plant.id].start()
+        if plant.camera is not None and plant.camera not in cameras:
+            cameras[plant.camera] = CaptureWorker(lambda index=plant.camera: open_camera(index))
+            capture_locks[plant.camera] = threading.Lock()
+            cameras[plant.camera].start()
+    camera_plants = [plant for plant in plants if plant.camera is not None]
+    if camera_plants:
+        threading.Thread(target=capture_loop, args=(camera_plants,), daemon=True).start()
+
+    REGISTRY.register_stats("telemetry", telemetry.stats)
+    REGISTRY.register_stats("plant", lambda: {plant_id: node.stats() for plant_id, node in plant_nodes.items()},
+                            label="plant")
+    REGISTRY.register_stats("trends", trends.stats)
+    REGISTRY.register_stats("columns", column_store.stats)
+    REGISTRY.register_stats("peer", hub.stats, label="peer")
+    REGISTRY.register_stats("component", COMPONENTS.stats, label="component")
+    COMPONENTS.warm_async()
+
+    port = urlsplit(registry.nodes[args.node]).port or 5000
+    try:
+        app.run(host='0.0.0.0', port=port)
+    finally:
+        for node in plant_nodes.values():
+            node.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,302 +1,638 @@
 import os
+import io
 import cv2
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import Flask, Response, jsonify, render_template, request, send_from_directory, url_for
 from datetime import datetime, timedelta
-from azure.storage.blob import BlobServiceClient
-from azure.data.tables import TableClient
-import io
 from apscheduler.schedulers.background import BackgroundScheduler
-import re
-import time
-import board
-from adafruit_seesaw.seesaw import Seesaw
-import requests
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES
+import queue
+import threading
 from flask import request
-i2c_bus = board.I2C()
-ss = Seesaw(i2c_bus, addr=0x36)
+from row_keys import make_row_key, row_key_ts
+from series_cache import SeriesCacheRegistry
+from rollups import MAX_ROWS, RESOLUTIONS, RollupWriter, choose_resolution, query_rollups
+from telemetry_writer import TelemetryWriter
+from camera import CaptureWorker
+from image_store import LatestImageStore
+from upload_queue import UploadQueue
+from image_catalog import ImageCatalog
+from thumbnails import DerivativeWorker, variant_name
+from image_metrics import ImageMetricsStore, MetricsPipeline
+from live_stream import Broadcaster, ChangePoller
+from sampling import RingBuffer, window_columns, window_entity, window_values
+from column_store import ColumnStore
+from trends import TrendEngine
+from plants import FAN_OUT_WORKERS, PlantRegistry
+from peer_client import PeerClient, PeerUnavailable
+from snapshot import SnapshotCache, gather
+import response_cache
+from response_cache import ResponseCache, is_settled, make_cursor, parse_cursor, to_columns, to_rows
+from agent import PlantNode, open_camera, open_table
+import leader
+from leader import Leadership
+from components import COMPONENTS
+from metrics import CONTENT_TYPE, REGISTRY, install, instrument, job_skipped, render, slow_traces, span, timed_job
+
+# Plants, their sensors, thresholds and nodes come from plants.json; this
+# process is the hub node and runs the plants attached to it.
+plant_registry = PlantRegistry.load()
+NODE_NAME = plant_registry.hub
+# Calls to the other nodes share keep-alive connections and a circuit
+# breaker per node; reads are hedged after PEER_HEDGE_AFTER seconds.
+PEER_TIMEOUT = 3
+PEER_HEDGE_AFTER = 0.5
+CAPTURE_TIMEOUT = 15
+peers = PeerClient(timeout=PEER_TIMEOUT, hedge_after=PEER_HEDGE_AFTER, pool_size=FAN_OUT_WORKERS)
+# Under gunicorn (wsgi.py) one worker is elected to run the sensors, cameras
+# and scheduled jobs; the others forward hardware requests to it on LEADER_PORT.
+LEADER_PORT = 5079
+LEADER_URL = f"http://127.0.0.1:{LEADER_PORT}"
+leadership = None
+
+def owns_hardware():
+    """True in the process that runs the sensors, cameras and jobs (always, without wsgi.py)."""
+    return leadership is None or leadership.is_leader
 
-MOISTURE_THRESHOLD = 600
 app = Flask(__name__)
+# Request timings and upstream calls are exported at /metrics.
+install(app)
 
 AZURE_STORAGE_CONNECTION_STRING = "key"
 CONTAINER_NAME = "trial"
 
-blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+# Uploads above UPLOAD_SINGLE_PUT_SIZE are staged as UPLOAD_BLOCK_SIZE blocks,
+# UPLOAD_BLOCK_CONCURRENCY at a time, then committed as one block blob.
+UPLOAD_SINGLE_PUT_SIZE = 256 * 1024
+UPLOAD_BLOCK_SIZE = 128 * 1024
+UPLOAD_BLOCK_CONCURRENCY = 4
+UPLOAD_WORKERS = 2
+UPLOAD_MAX_PENDING = 20
+# Thumbnails and previews get their own slots so they never crowd out originals.
+DERIVATIVE_UPLOAD_WORKERS = 1
+DERIVATIVE_MAX_PENDING = 20
+
+# Azure clients (and the SDK itself) are created on first use; see /health.
+def open_blob_service():
+    from azure.storage.blob import BlobServiceClient
+    return BlobServiceClient.from_connection_string(
+        AZURE_STORAGE_CONNECTION_STRING,
+        max_single_put_size=UPLOAD_SINGLE_PUT_SIZE,
+        max_block_size=UPLOAD_BLOCK_SIZE)
+
+blob_service_client = COMPONENTS.lazy("azure-blob", open_blob_service)
+container_client = COMPONENTS.lazy("azure-container", lambda: instrument(
+    blob_service_client.get_container_client(CONTAINER_NAME), "azure_blob", CONTAINER_NAME))
+upload_queue = UploadQueue(container_client, workers=UPLOAD_WORKERS,
+                           max_pending=UPLOAD_MAX_PENDING,
+                           max_concurrency=UPLOAD_BLOCK_CONCURRENCY)
+derivative_queue = UploadQueue(container_client, workers=DERIVATIVE_UPLOAD_WORKERS,
+                               max_pending=DERIVATIVE_MAX_PENDING,
+                               max_concurrency=UPLOAD_BLOCK_CONCURRENCY)
 
 TABLE_SAS_URL = "key"
-table_client = TableClient.from_table_url(TABLE_SAS_URL)
+table_client = COMPONENTS.lazy("azure-table-temperature", lambda: open_table(TABLE_SAS_URL, "temperature"))
 
 MOISTURE_TABLE_SAS_URL = "key"
-moisture_table_client = TableClient.from_table_url(MOISTURE_TABLE_SAS_URL)
+moisture_table_client = COMPONENTS.lazy("azure-table-moisture",
+                                        lambda: open_table(MOISTURE_TABLE_SAS_URL, "moisture"))
 
 LIGHT_TABLE_SAS_URL = "key"
-light_table_client = TableClient.from_table_url(LIGHT_TABLE_SAS_URL)
+light_table_client = COMPONENTS.lazy("azure-table-light", lambda: open_table(LIGHT_TABLE_SAS_URL, "light"))
+
+ROLLUP_TABLE_SAS_URL = "key"
+rollup_table_client = COMPONENTS.lazy("azure-table-rollups", lambda: open_table(ROLLUP_TABLE_SAS_URL, "rollups"))
+
+# Readings are spooled locally and shipped in batches, so a network outage loses nothing.
+# The local SQLite stores are components too: opened (and data/ created) on first use.
+DATA_FOLDER = 'data'
+SPOOL_PATH = os.path.join(DATA_FOLDER, 'telemetry_spool.db')
+
+def open_store(cls, *args, **kwargs):
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+    return cls(*args, **kwargs)
+
+telemetry = COMPONENTS.lazy("telemetry-spool", lambda: open_store(
+    TelemetryWriter, SPOOL_PATH, {"moisture": moisture_table_client, "rollups": rollup_table_client}))
+rollup_writer = RollupWriter(rollup_table_client, spool=telemetry)
+
+# Raw samples per series in memory-mapped ring buffers; the plant nodes
+# and enviroment.py write their series to this folder.
+RAW_FOLDER = os.path.join(DATA_FOLDER, 'raw')
+# Every window row is also kept in a local columnar store (one series per
+# plant here; enviroment.py writes `temperature` and `light`) for
+# long-range queries and Parquet export.
+COLUMN_FOLDER = os.path.join(DATA_FOLDER, 'columns')
+column_store = ColumnStore(COLUMN_FOLDER)
+# Rolling statistics, drying rates and glitches over those columns; remote
+# plants' trends come with their node's /sensor/moisture/<id> answer.
+trends = TrendEngine(column_store)
+trends.track("temperature", "temperature", "Temperature")
+trends.track("humidity", "temperature", "Humidity")
+trends.track("light", "light", "Light")
+
+# Partitions written by enviroment.py
+TEMP_PARTITION = "Enviroment"
+LIGHT_PARTITION = "LightLevel"
 LOCAL_IMAGE_FOLDER = 'temp_images'
-os.makedirs(LOCAL_IMAGE_FOLDER, exist_ok=True)
-
-
-last_fetched_time = None
-latest_temperature_data = {"temperature": None, "humidity": None}
-last_fetched_lighttime = None
-latest_light_data = {"intensity": None}
-def get_recent_moisture_data(plant_id, start_date=None, end_date=None, limit=20):
-    try:
-        entities = list(moisture_table_client.list_entities())
-        
-        if start_date and end_date:
-            try:
-                start_ts = datetime.fromisoformat(start_date.replace('Z', '+00:00')).timestamp()
-                end_ts   = datetime.fromisoformat(end_date.replace('Z', '+00:00')).timestamp()
-            except ValueError:
-                return jsonify({"error": "Invalid timestamp format"}), 400
-        else:
-            # Default to last 7 days if no date range is provided
-            cutoff_ts = (datetime.now() - timedelta(days=7)).timestamp()
-            start_ts, end_ts = cutoff_ts, datetime.now().timestamp()
-
-        filtered = [
-            e for e in entities
-            if e["PartitionKey"] == f"Plant{plant_id}"
-               and start_ts <= float(e["RowKey"]) <= end_ts
-        ]
-
-        filtered.sort(key=lambda x: float(x["RowKey"]), reverse=True)
-
-        return [
-            {
-                "time": datetime.fromtimestamp(float(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
-                "moisture": e.get("moisture", "N/A")  # use .get() with a fallback
-            }
-            for e in filtered[:limit]
-            if "moisture" in e 
-        ]
+# Index of uploaded images behind /analytics, filled at upload time and
+# reconciled against the container in the background.
+CATALOG_PATH = os.path.join(DATA_FOLDER, 'image_catalog.db')
+image_catalog = COMPONENTS.lazy("image-catalog", lambda: open_store(ImageCatalog, CATALOG_PATH))
+# Green coverage, canopy, colour and frame-to-frame change of every image,
+# per plant, next to the catalog.
+# Image metrics are computed in worker processes, forked by startup().
+IMAGE_METRICS_WORKERS = 2
+image_metrics = MetricsPipeline(None, COMPONENTS.lazy("image-metrics-store",
+                                                      lambda: open_store(ImageMetricsStore, CATALOG_PATH)),
+                                workers=IMAGE_METRICS_WORKERS)
+ANALYTICS_PAGE_SIZE = 20
+# Latest image per plant is served from memory; set to False to skip the SD-card copy
+# (only with a single web worker: the others read the latest image from it).
+PERSIST_LOCAL_IMAGES = True
+JPEG_QUALITY = 90
+image_store = LatestImageStore(LOCAL_IMAGE_FOLDER if PERSIST_LOCAL_IMAGES else None)
+
+# Recent rows per table partition, refreshed at most every CACHE_MAX_AGE seconds.
+CACHE_MAX_AGE = 10
+CACHE_MAX_ROWS = 7 * 24 * 60
+sensor_caches = SeriesCacheRegistry(max_rows=CACHE_MAX_ROWS, max_age=CACHE_MAX_AGE)
+# /sensor/snapshot and /sensor/history bodies are rebuilt at most every
+# SNAPSHOT_MAX_AGE seconds; revalidations inside that window cost no queries.
+SNAPSHOT_MAX_AGE = 5
+snapshots = SnapshotCache(max_age=SNAPSHOT_MAX_AGE)
+# Pages of the per-series history endpoints; pages of settled windows never expire.
+HISTORY_MAX_AGE = CACHE_MAX_AGE
+HISTORY_CACHE_BYTES = 16 * 1024 * 1024
+history_pages = ResponseCache(max_age=HISTORY_MAX_AGE, max_bytes=HISTORY_CACHE_BYTES)
+# Points per history page unless ?limit= asks for fewer; older ones are a ?cursor= away.
+HISTORY_PAGE_LIMIT = MAX_ROWS
+RAW_HISTORY_LIMIT = 20
+
+def moisture_cache(plant_id):
+    return sensor_caches.get("moisture", moisture_table_client, f"Plant{plant_id}", ["RowKey", "moisture"])
+
+def temperature_cache():
+    return sensor_caches.get("temperature", table_client, TEMP_PARTITION, ["RowKey", "Temperature", "Humidity"])
+
+def light_cache():
+    return sensor_caches.get("light", light_table_client, LIGHT_PARTITION, ["RowKey", "Light"])
+
+def parse_time_window(start_date, end_date, default_span):
+    """Return (start_ts, end_ts); raises ValueError on a malformed timestamp."""
+    if start_date and end_date:
+        start_ts = datetime.fromisoformat(start_date.replace('Z', '+00:00')).timestamp()
+        end_ts   = datetime.fromisoformat(end_date.replace('Z', '+00:00')).timestamp()
+    else:
+        end_ts   = datetime.now().timestamp()
+        start_ts = (datetime.now() - default_span).timestamp()
+    return start_ts, end_ts
+
+def parse_resolution(start_ts, end_ts):
+    """Return the requested `resolution` or the one that suits the window."""
+    resolution = request.args.get("resolution") or choose_resolution(start_ts, end_ts)
+    if resolution != "raw" and resolution not in RESOLUTIONS:
+        raise ValueError(resolution)
+    return resolution
+
+# History points carry their exact "ts" for cursors and the columns format;
+# upstream errors propagate to the route, so a failed query is never cached.
+def get_rollup_history(series, fields, start_ts, end_ts, resolution, limit=MAX_ROWS):
+    """History from the rollup table; `fields` maps response names to raw properties."""
+    history = []
+    for e in query_rollups(rollup_table_client, series, resolution, start_ts, end_ts, limit):
+        ts = row_key_ts(e["RowKey"])
+        point = {"ts": ts, "time": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")}
+        for name, field in fields.items():
+            point[name] = e.get(field)
+            point[f"{name}_min"] = e.get(f"{field}_min")
+            point[f"{name}_max"] = e.get(f"{field}_max")
+        point["count"] = max(e.get(f"{field}_count", 0) for field in fields.values())
+        history.append(point)
+    return history
+
+def get_recent_moisture_data(plant_id, start_ts, end_ts, limit=RAW_HISTORY_LIMIT):
+    entities = moisture_cache(plant_id).window(start_ts, end_ts, limit)
+    return [
+        {
+            "ts": row_key_ts(e["RowKey"]),
+            "time": datetime.fromtimestamp(row_key_ts(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
+            "moisture": e.get("moisture", "N/A")  # use .get() with a fallback
+        }
+        for e in entities
+        if "moisture" in e
+    ]
 
-    except Exception as e:
-        print(f"Error fetching moisture history for Plant {plant_id}: {e}")
-        return []
 def get_latest_moisture_from_azure(plant_id):
     try:
-        entities = list(moisture_table_client.list_entities())
-        filtered = [
-            e for e in entities
-            if e["PartitionKey"] == f"Plant{plant_id}"
-               and "moisture" in e
-        ]
-        if not filtered:
+        latest = moisture_cache(plant_id).latest()
+        if latest is None or "moisture" not in latest:
             return {"moisture": None, "status": None}
 
-        filtered.sort(key=lambda e: e["RowKey"], reverse=True)
-        latest = filtered[0]
         moisture = latest["moisture"]
-
-        # Set threshold based on plant
-        threshold = 500 if plant_id == 2 else MOISTURE_THRESHOLD
-        status = "dry" if moisture < threshold else "ok"
-        
-        return {"moisture": moisture, "status": status}
+        return {"moisture": moisture, "status": plant_registry.get(plant_id).status(moisture)}
     except Exception as e:
         print(f"Error fetching latest moisture for Plant {plant_id}: {e}")
         return {"moisture": None, "status": None}
 
-def get_recent_temperature_data(start_date=None, end_date=None, limit=20):
-    try:
-        entities = list(table_client.list_entities())
-
-        if start_date and end_date:
-            try:
-                start_ts = datetime.fromisoformat(start_date.replace('Z', '+00:00')).timestamp()
-                end_ts   = datetime.fromisoformat(end_date.replace('Z', '+00:00')).timestamp()
-            except ValueError:
-                return jsonify({"error": "Invalid timestamp format"}), 400
-        else:
-            cutoff_ts = (datetime.now() - timedelta(days=7)).timestamp()
-            start_ts, end_ts = cutoff_ts, datetime.now().timestamp()
-
-        filtered = [
-            e for e in entities
-            if e.get("Temperature") is not None
-               and start_ts <= float(e["RowKey"]) <= end_ts
-        ]
-
-        # Sort by timestamp descending
-        filtered.sort(key=lambda x: float(x["RowKey"]), reverse=True)
-
-        return [
-            {
-                "time": datetime.fromtimestamp(float(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
-                "temperature": e["Temperature"],
-                "humidity": e["Humidity"]
-            }
-            for e in filtered[:limit]
-        ]
-    except Exception as e:
-        print(f"Error fetching temperature history: {e}")
-        return []
-def read_soil_moisture():
-    """Return a tuple (moisture_value, temp_celsius, status_str)."""
-    moisture = ss.moisture_read()
-    temp = ss.get_temp()
-    status = "dry" if moisture < MOISTURE_THRESHOLD else "ok"
-    return moisture, temp, status
-
-def log_moisture_to_azure(moisture, status, plant_id):
-    try:
-        entity = {
-            "PartitionKey": f"Plant{plant_id}",
-            "RowKey": str(datetime.now().timestamp()),
-            "moisture": moisture,
-            "Status": status
+def get_recent_temperature_data(start_ts, end_ts, limit=RAW_HISTORY_LIMIT):
+    entities = temperature_cache().window(start_ts, end_ts, limit)
+    return [
+        {
+            "ts": row_key_ts(e["RowKey"]),
+            "time": datetime.fromtimestamp(row_key_ts(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
+            "temperature": e["Temperature"],
+            "humidity": e["Humidity"]
         }
+        for e in entities
+        if e.get("Temperature") is not None
+    ]
 
-        moisture_table_client.create_entity(entity=entity)
+def get_recent_light_data(start_ts, end_ts, limit=HISTORY_PAGE_LIMIT):
+    entities = light_cache().window(start_ts, end_ts, limit)
+    return [
+        {
+          "ts": row_key_ts(e["RowKey"]),
+          "time": datetime.fromtimestamp(row_key_ts(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
+          "intensity": e["Light"]
+        }
+        for e in entities
+        if "Light" in e
+    ]
 
-        print(f"Moisture data logged to Azure Table for Plant {plant_id}")
+def moisture_history(plant_id, start_ts, end_ts, resolution, limit=None):
+    if resolution != "raw":
+        return get_rollup_history(f"Plant{plant_id}", {"moisture": "moisture"}, start_ts, end_ts, resolution,
+                                  limit or MAX_ROWS)
+    return get_recent_moisture_data(plant_id, start_ts, end_ts, limit or RAW_HISTORY_LIMIT)
+
+def temperature_history(start_ts, end_ts, resolution, limit=None):
+    if resolution != "raw":
+        return get_rollup_history(TEMP_PARTITION, {"temperature": "Temperature", "humidity": "Humidity"},
+                                  start_ts, end_ts, resolution, limit or MAX_ROWS)
+    return get_recent_temperature_data(start_ts, end_ts, limit or RAW_HISTORY_LIMIT)
+
+def light_history(start_ts, end_ts, resolution, limit=None):
+    if resolution != "raw":
+        return get_rollup_history(LIGHT_PARTITION, {"intensity": "Light"}, start_ts, end_ts, resolution,
+                                  limit or MAX_ROWS)
+    return get_recent_light_data(start_ts, end_ts, limit or HISTORY_PAGE_LIMIT)
+
+def format_history(points, fmt):
+    return to_columns(points) if fmt == "columns" else to_rows(points)
+
+def log_moisture_window(plant, stats):
+    """Queue one row per window: mean moisture plus its min/max/std/count."""
+    plant_id = plant.id
+    try:
+        entity = window_entity(f"Plant{plant_id}", make_row_key(stats.start), stats)
+        moisture = entity["moisture"]
+        status = plant.status(moisture)
+        entity["Status"] = status
+
+        telemetry.append("moisture", entity)
+        rollup_writer.record(f"Plant{plant_id}", stats.start, {"moisture": moisture})
+        column_store.append(f"moisture-{plant_id}", stats.start, window_values(stats))
+        # The trend picks the new row up right away; its state doesn't flap at the threshold.
+        trend = trends.trend(f"moisture-{plant_id}")
+        live_updates.publish(f"moisture-{plant_id}", {"plant_id": plant_id, "moisture": moisture,
+                                                      "status": trend["state"] if trend else status,
+                                                      "trend": trend})
+
+        print(f"Moisture data queued for Azure Table for Plant {plant_id} "
+              f"({stats.fields['moisture'].count} samples)")
     except Exception as e:
         print(f"Error logging moisture data: {e}")
 
-
-def get_latest_temperature_from_azure():
-    global last_fetched_time, latest_temperature_data
-
+# Sensors of the plants on this node: sampled in the background, one
+# aggregated row per window, raw samples served from their ring buffers.
+# startup() creates the nodes, whose buffers are files under RAW_FOLDER.
+local_plants = [plant for plant in plant_registry.on_node(NODE_NAME) if plant.moisture]
+plant_nodes = {}
+raw_buffers = {}
+for plant in local_plants:
+    trends.track(f"moisture-{plant.id}", f"moisture-{plant.id}", "moisture", threshold=plant.threshold)
+
+def fetch_remote_moisture(plant, node_url=None):
+    """Live reading from the plant's node, or the newest Azure row if the node doesn't answer."""
     try:
-        entities = list(table_client.list_entities())
-        
-        if not entities:
-            return {"temperature": None, "humidity": None}
-
-        entities.sort(key=lambda e: e.get("RowKey", ""), reverse=True)
-
-        latest = entities[0]
-
-        if last_fetched_time is None or latest.get("RowKey") != last_fetched_time:
-
-            temperature = latest.get("Temperature")
-            humidity = latest.get("Humidity")
-
-            if temperature is None or humidity is None:
-                return {"temperature": None, "humidity": None}
+        resp = peers.get(f"{node_url or plant_registry.node_url(plant)}/sensor/moisture/{plant.id}")
+        resp.raise_for_status()
+        return {**resp.json(), "source": "node"}
+    except Exception as e:
+        print(f"Plant {plant.id} node unreachable, using Azure: {e}")
+        return {"plant_id": plant.id, **get_latest_moisture_from_azure(plant.id), "source": "azure"}
 
-            last_fetched_time = latest.get("RowKey")
+def plant_moisture(plant):
+    node = plant_nodes.get(plant.id)
+    if node is None:
+        return fetch_remote_moisture(plant)
+    if owns_hardware():
+        return {**node.reading(), "source": "local"}
+    return fetch_remote_moisture(plant, LEADER_URL)
 
-            latest_temperature_data = {"temperature": temperature, "humidity": humidity}
 
-            return latest_temperature_data
-        
-        return latest_temperature_data
+def get_latest_temperature_from_azure():
+    try:
+        latest = temperature_cache().latest()
+        if latest is None or latest.get("Temperature") is None or latest.get("Humidity") is None:
+            return {"temperature": None, "humidity": None}
 
-    except KeyError as e:
-        return {"temperature": None, "humidity": None}
+        return {"temperature": latest["Temperature"], "humidity": latest["Humidity"]}
     except Exception as e:
+        print(f"Error fetching latest temperature: {e}")
         return {"temperature": None, "humidity": None}
 
 def get_latest_light_from_azure():
-    global last_fetched_lighttime, latest_light_data
-
     try:
-        entities = list(light_table_client.list_entities())
-        
-        if not entities:
+        latest = light_cache().latest()
+        if latest is None or latest.get("Light") is None:
             return {"intensity": None}
 
-        entities.sort(key=lambda e: e.get("RowKey", ""), reverse=True)
-
-        latest = entities[0]
-
-        if last_fetched_lighttime is None or latest.get("RowKey") != last_fetched_lighttime:
-
-            intensity = latest.get("Light")
-
-            if intensity is None:
-                return {"intensity": None}
-
-            last_fetched_lighttime = latest.get("RowKey")
-
-            latest_light_data = {"intensity": intensity}
-
-            return latest_light_data
-        
-        return latest_light_data
-
-    except KeyError as e:
-        return {"temperature": None}
+        return {"intensity": latest["Light"]}
     except Exception as e:
-        return {"temperature": None}
-def upload_to_azure(file_stream, blob_name):
+        print(f"Error fetching latest light intensity: {e}")
+        return {"intensity": None}
+# Live readings for /stream. Moisture of local plants is pushed by the
+# logger; the rest is written by other processes (or, for local plants, by
+# the leader worker), so one poller watches the caches.
+live_updates = Broadcaster()
+
+def latest_moisture_event(plant_id):
+    return {"plant_id": plant_id, **get_latest_moisture_from_azure(plant_id)}
+
+stream_sources = {
+    "temperature": get_latest_temperature_from_azure,
+    "light": get_latest_light_from_azure,
+}
+local_plant_ids = {plant.id for plant in local_plants}
+for plant in plant_registry.all():
+    if plant.id not in local_plant_ids:
+        stream_sources[f"moisture-{plant.id}"] = lambda plant_id=plant.id: latest_moisture_event(plant_id)
+    else:
+        stream_sources[f"moisture-{plant.id}"] = \
+            lambda plant_id=plant.id: None if owns_hardware() else latest_moisture_event(plant_id)
+stream_poller = ChangePoller(live_updates, stream_sources)
+
+def build_snapshot():
+    """Current reading of every sensor and plant, gathered concurrently."""
+    plants = plant_registry.all()
+    calls = {"temperature": get_latest_temperature_from_azure, "light": get_latest_light_from_azure}
+    for plant in plants:
+        calls[f"plant-{plant.id}"] = lambda plant=plant: plant_moisture(plant)
+    results = gather(calls)
+
+    def value(name, default):
+        result, error = results[name]
+        if error is not None:
+            print(f"Error reading {name} for the snapshot: {error}")
+            return default
+        return result
+
+    environment = value("temperature", {"temperature": None, "humidity": None})
+    snapshot = {
+        "temperature": environment["temperature"],
+        "humidity": environment["humidity"],
+        "light": value("light", {"intensity": None})["intensity"],
+        "plants": [],
+    }
+    for plant in plants:
+        reading = value(f"plant-{plant.id}", {"moisture": None, "status": None})
+        snapshot["plants"].append({"id": plant.id, "name": plant.name, **reading})
+    return snapshot
+
+def history_source(series):
+    """History function for a /sensor/history series name, or None."""
+    if series == "temperature":
+        return temperature_history
+    if series == "light":
+        return light_history
+    if series.startswith("moisture-") and series[9:].isdigit() and plant_registry.get(int(series[9:])):
+        return lambda start_ts, end_ts, resolution: moisture_history(int(series[9:]), start_ts, end_ts, resolution)
+    return None
+
+def cached_json(snapshot):
+    """Response for a cached snapshot; 304 when the client's If-None-Match still matches."""
+    response = Response(snapshot.body, mimetype="application/json")
+    response.set_etag(snapshot.etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def cached_page(page):
+    """Response for a cached history page, compressed as the client accepts; 304 when its ETag still matches."""
+    encoding, body = history_pages.encode(page, request.headers.get("Accept-Encoding", ""))
+    response = Response(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if encoding == "identity":
+        response.set_etag(page.etag)
+    else:
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(f"{page.etag}-{encoding}")
+    if page.immutable:
+        response.headers["Cache-Control"] = f"public, max-age={response_cache.IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response.cache_control.no_cache = True
+    if page.next_cursor:
+        args = {**request.args.to_dict(), "cursor": page.next_cursor}
+        response.headers["Link"] = f'<{url_for(request.endpoint, **request.view_args, **args)}>; rel="next"'
+    return response.make_conditional(request)
+
+def history_settled(end_ts, resolution):
+    """True when no reading up to end_ts can still reach the tables from this process or, within
+    SETTLE_SECONDS, from the others (enviroment.py, the plant nodes)."""
+    if not is_settled(end_ts, resolution):
+        return False
     try:
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.upload_blob(file_stream, overwrite=True)
-        return f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_name}"
+        pending = [telemetry.oldest_pending(), rollup_writer.oldest_pending()]
     except Exception as e:
-        print(f"Azure Upload Error: {e}")
-        return None
-
+        print(f"Error checking pending telemetry: {e}")
+        return False
+    return all(oldest is None or oldest > end_ts for oldest in pending)
 
-def capture_image(plant_id):
-    camera = cv2.VideoCapture(0)
-    if not camera.isOpened():
-        print("Error: Could not open camera.")
-        return None
+def history_page(series, source, default_span, raw_limit):
+    """One page of a per-series history endpoint: start_date/end_date/resolution as before, plus
+    ?limit= (at most HISTORY_PAGE_LIMIT), ?cursor= from the previous page and ?format=rows|columns."""
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    try:
+        start_ts, end_ts = parse_time_window(start_date, end_date, default_span)
+    except ValueError:
+        return jsonify({"error": "Invalid timestamp format"}), 400
+    try:
+        resolution = parse_resolution(start_ts, end_ts)
+    except ValueError:
+        return jsonify({"error": "Invalid resolution"}), 400
+    fmt = request.args.get("format", "rows")
+    if fmt not in response_cache.FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+    cursor = request.args.get("cursor")
+    try:
+        limit = int(request.args.get("limit") or (raw_limit if resolution == "raw" else HISTORY_PAGE_LIMIT))
+        if cursor:
+            # Points are newest first; the next page ends just before the oldest one served.
+            end_ts = min(end_ts, parse_cursor(cursor) - 1e-6)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    limit = max(1, min(limit, HISTORY_PAGE_LIMIT))
+
+    explicit = bool(start_date and end_date)
+    window = (start_ts, end_ts) if explicit else ("last", default_span.total_seconds(), cursor)
+    key = (series, window, resolution, fmt, limit)
+
+    def page_data(points, next_cursor):
+        if fmt == "columns":
+            return {"resolution": resolution, **to_columns(points), "next": next_cursor}
+        return to_rows(points)
+
+    def build():
+        # Checked before the query: a row still queued now could be sent before the query and missed by it.
+        settled = explicit and history_settled(end_ts, resolution)
+        points = source(start_ts, end_ts, resolution, limit + 1)
+        next_cursor = make_cursor(points[limit - 1]["ts"]) if len(points) > limit else None
+        return page_data(points[:limit], next_cursor), next_cursor, settled and bool(points)
 
-    for _ in range(5):
-        ret, frame = camera.read()
-        time.sleep(0.1)
+    try:
+        page = history_pages.get(key, build)
+    except Exception as e:
+        print(f"Error fetching {series} history: {e}")
+        return jsonify(page_data([], None))
+    return cached_page(page)
 
-    ret, frame = camera.read()
-    camera.release()
+def blob_url(blob_name):
+    return f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_name}"
 
-    if ret:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        image_filename = f"plant_{plant_id}_{timestamp}.jpg"
-        local_image_path = os.path.join(LOCAL_IMAGE_FOLDER, f"plant_{plant_id}.jpg")
+def catalog_upload(job):
+    image_catalog.add(job["blob"], job["bytes"])
 
-        if os.path.exists(local_image_path):
-            os.remove(local_image_path)
+def upload_derivative(original, variant, data):
+    try:
+        derivative_queue.submit(variant_name(original, variant), data,
+                                on_done=lambda job: image_catalog.add_variant(original, variant))
+    except queue.Full:
+        print(f"Derivative upload queue full, skipping {variant} of {original}")
+
+# Thumbnails and previews for /analytics, built off the request path.
+thumbnail_worker = DerivativeWorker(upload_derivative)
+
+
+# One worker per camera device of this node's plants.
+camera_plants = [plant for plant in plant_registry.on_node(NODE_NAME) if plant.camera is not None]
+camera_workers = {}
+for plant in camera_plants:
+    if plant.camera not in camera_workers:
+        camera_workers[plant.camera] = CaptureWorker(lambda index=plant.camera: open_camera(index))
+# Serializes the scheduled job and the /capture route.
+capture_lock = threading.Lock()
+
+def capture_image(plant):
+    """Store the plant camera's newest frame and queue its upload; callers hold capture_lock.
+
+    Returns (job_id, blob_url), or None if no frame was captured. Raises
+    queue.Full when the upload queue is at capacity.
+    """
+    plant_id = plant.id
+    with span("camera", f"camera-{plant.camera}", "capture"):
+        frame, _ = camera_workers[plant.camera].capture()
+
+    if frame is None:
+        print("Error: Failed to capture image.")
+        return None
 
-        cv2.imwrite(local_image_path, frame)
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        print("Error: Failed to encode image.")
+        return None
 
-        with open(local_image_path, 'rb') as f:
-            image_stream = io.BytesIO(f.read())
+    # Encode once; the same bytes are served locally and uploaded.
+    data = encoded.tobytes()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    image_filename = f"plant_{plant_id}_{timestamp}.jpg"
+    image_store.put(f"plant_{plant_id}.jpg", data)
 
-        azure_url = upload_to_azure(image_stream, image_filename)
-        return azure_url if azure_url else None
-    else:
-        print("Error: Failed to capture image.")
-        return None
+    job_id = upload_queue.submit(image_filename, data, on_done=catalog_upload)
+    thumbnail_worker.submit(image_filename, data, frame)
+    image_metrics.submit(image_filename, data)
+    return job_id, blob_url(image_filename)
 
 
-job_running = False
+@timed_job("capture")
 def capture_image_automatically():
-    global job_running
-    if not job_running:
-        job_running = True
-        print(f"Starting image capture for Plant 1 at {datetime.now()}")
-        capture_image(1)
-        print(f"Image capture for Plant 1 finished at {datetime.now()}")
-        job_running = False
-    else:
+    if not capture_lock.acquire(blocking=False):
         print("Job already running, skipping this cycle.")
-def log_moisture_automatically():
+        job_skipped.inc(job="capture")
+        return
+    try:
+        for plant in camera_plants:
+            print(f"Starting image capture for Plant {plant.id} at {datetime.now()}")
+            capture_image(plant)
+            print(f"Image capture for Plant {plant.id} finished at {datetime.now()}")
+    except queue.Full:
+        print("Upload queue full, skipping this capture's upload.")
+    finally:
+        capture_lock.release()
+
+@timed_job("reconcile_catalog")
+def reconcile_image_catalog():
     try:
-        print(f"Logging moisture data for Plant 1 at {datetime.now()}")
-        moisture, temp, status = read_soil_moisture()
-        log_moisture_to_azure(moisture, status, 1)  # Assuming plant_id is 1
-        print(f"Moisture data logged for Plant 1 at {datetime.now()}")
+        image_catalog.reconcile(container_client, plant_ids=[plant.id for plant in plant_registry.all()])
     except Exception as e:
-        print(f"Error logging moisture automatically: {e}")
+        print(f"Error reconciling image catalog: {e}")
 
 scheduler = BackgroundScheduler()
 
+def count_skipped_run(event):
+    job_skipped.inc(job=event.job_id)
+
+scheduler.add_listener(count_skipped_run, EVENT_JOB_MAX_INSTANCES)
+
 def schedule_jobs():
     for job in scheduler.get_jobs():
         job.remove()
 
-    scheduler.add_job(func=capture_image_automatically, trigger="interval", minutes=1, max_instances=1)
-    scheduler.add_job(func=log_moisture_automatically, trigger="interval", minutes=1, max_instances=1)
+    scheduler.add_job(func=capture_image_automatically, trigger="interval", minutes=1, max_instances=1,
+                      id="capture")
+    scheduler.add_job(func=reconcile_image_catalog, trigger="interval", minutes=5, max_instances=1,
+                      id="reconcile_catalog",
+                      next_run_time=datetime.now())
+
+def start_hardware():
+    """Start the sensors, cameras, telemetry shipping and scheduled jobs; only one process may."""
+    telemetry.start()
+    for node in plant_nodes.values():
+        node.start()
+    for worker in camera_workers.values():
+        worker.start()
+    if not scheduler.running:
+        schedule_jobs()
+        scheduler.start()
+
+def lead():
+    start_hardware()
+    leader.serve(app, LEADER_PORT)
+
+def elect_leader():
+    """Multi-worker mode: the worker holding the leader lock starts the hardware, the others follow it."""
+    global leadership
+    leadership = Leadership(lead, os.path.join(DATA_FOLDER, "leader.lock"))
+    leadership.start()
+
+# Routes that need this node's cameras or sensor samplers; followers pass them to the leader.
+LEADER_ENDPOINTS = {"capture", "capture_all", "get_sampler_stats"}
+
+@app.before_request
+def forward_to_leader():
+    if owns_hardware() or request.endpoint not in LEADER_ENDPOINTS:
+        return None
+    headers = {"Content-Type": request.content_type} if request.content_type else {}
+    try:
+        resp = peers.request(request.method, f"{LEADER_URL}{request.full_path}", timeout=CAPTURE_TIMEOUT,
+                             data=request.get_data(), headers=headers)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Leader worker unavailable: {e}"}), 503
+    return Response(resp.content, status=resp.status_code, content_type=resp.headers.get("Content-Type"))
 
-if not scheduler.running:
-    schedule_jobs()
-    scheduler.start()
+@app.route('/leader/stats')
+def get_leader_stats():
+    return jsonify(leadership.stats() if leadership else {"pid": os.getpid(), "leader": True})
 
 
 @app.route('/')
@@ -304,21 +640,16 @@ def home():
     return render_template('index.html')
 @app.route("/sensor/moisture/<int:plant_id>/history", methods=["GET"])
 def get_moisture_history(plant_id):
-    start_date = request.args.get("start_date")
-    end_date = request.args.get("end_date")
-
-    data = get_recent_moisture_data(plant_id, start_date, end_date)
-    return jsonify(data)
+    return history_page(f"moisture-{plant_id}",
+                        lambda start_ts, end_ts, resolution, limit:
+                            moisture_history(plant_id, start_ts, end_ts, resolution, limit),
+                        timedelta(days=7), RAW_HISTORY_LIMIT)
 
 
 
 @app.route("/sensor/temperature/history", methods=["GET"])
 def get_temperature_history():
-    start_date = request.args.get("start_date")
-    end_date = request.args.get("end_date")
-
-    data = get_recent_temperature_data(start_date, end_date)
-    return jsonify(data)
+    return history_page("temperature", temperature_history, timedelta(days=7), RAW_HISTORY_LIMIT)
 
 
 @app.route('/sensor/temperature')
@@ -326,22 +657,28 @@ def get_temperature():
     data = get_latest_temperature_from_azure()
     return jsonify(data)
 
+def unknown_plant(plant_id):
+    return jsonify({"status": "error", "message": f"Unknown plant {plant_id}"}), 404
+
+@app.route('/plants')
+def get_plants():
+    """Every configured plant with its current moisture, fetched from all nodes concurrently."""
+    plants = plant_registry.all()
+    results = plant_registry.fan_out(plant_moisture, plants)
+    summary = []
+    for plant in plants:
+        reading, error = results[plant.id]
+        if error is not None:
+            reading = {"moisture": None, "status": None, "error": str(error)}
+        summary.append({**plant.to_dict(), **reading})
+    return jsonify(summary)
+
 @app.route('/sensor/moisture/<int:plant_id>')
 def get_moisture(plant_id):
-    if plant_id == 2:
-        data = get_latest_moisture_from_azure(2)
-        return jsonify({
-            "plant_id": plant_id,
-            "moisture": data["moisture"],
-            "status": data["status"]
-        })
-    moisture, temp, status = read_soil_moisture()
-    return jsonify({
-        "plant_id": plant_id,
-        "moisture": moisture,
-        "temperature": round(temp, 2),
-        "status": status
-    })
+    plant = plant_registry.get(plant_id)
+    if plant is None:
+        return unknown_plant(plant_id)
+    return jsonify(plant_moisture(plant))
 
 @app.route('/sensor/light')
 def get_light():
@@ -350,33 +687,167 @@ def get_light():
 
 @app.route('/sensor/light/history', methods=["GET"])
 def get_light_history():
-    start_date = request.args.get("start_date")
-    end_date   = request.args.get("end_date")
-
-    if not (start_date and end_date):
-        end_ts   = datetime.now().timestamp()
-        start_ts = (datetime.now() - timedelta(hours=1)).timestamp()
+    return history_page("light", light_history, timedelta(hours=1), HISTORY_PAGE_LIMIT)
+
+@app.route('/sensor/snapshot')
+def get_snapshot():
+    """Temperature, humidity, light and every plant's moisture in one response."""
+    return cached_json(snapshots.get("snapshot", build_snapshot))
+
+@app.route('/sensor/history')
+def get_history():
+    """Several histories in one response: ?series=temperature,light,moisture-1 (default: all),
+    plus the start_date/end_date/resolution/format of the per-series endpoints (default: last 7 days)."""
+    names = request.args.get("series")
+    if names:
+        names = names.split(",")
     else:
-        start_ts = datetime.fromisoformat(start_date.replace('Z','+00:00')).timestamp()
-        end_ts   = datetime.fromisoformat(end_date.replace('Z','+00:00')).timestamp()
-
-    entities = list(light_table_client.list_entities())
-    filtered = [
-        e for e in entities
-        if start_ts <= float(e["RowKey"]) <= end_ts
-        and "Light" in e
-    ]
-    filtered.sort(key=lambda e: float(e["RowKey"]), reverse=True)
-    history = [
-        {
-          "time": datetime.fromtimestamp(float(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
-          "intensity": e["Light"]
-        }
-        for e in filtered
-    ]
-    return jsonify(history)
+        names = ["temperature", "light"] + [f"moisture-{plant.id}" for plant in plant_registry.all()]
+    sources = {name: history_source(name) for name in names}
+    unknown = [name for name, source in sources.items() if source is None]
+    if unknown:
+        return jsonify({"error": f"Unknown series: {', '.join(unknown)}"}), 400
 
-PI2_URL = "http://192.168.0.185:5073/capture" 
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    try:
+        start_ts, end_ts = parse_time_window(start_date, end_date, timedelta(days=7))
+    except ValueError:
+        return jsonify({"error": "Invalid timestamp format"}), 400
+    try:
+        resolution = parse_resolution(start_ts, end_ts)
+    except ValueError:
+        return jsonify({"error": "Invalid resolution"}), 400
+    fmt = request.args.get("format", "rows")
+    if fmt not in response_cache.FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+
+    def build():
+        results = gather({name: lambda source=source: source(start_ts, end_ts, resolution)
+                          for name, source in sources.items()})
+        series = {}
+        for name, (result, error) in results.items():
+            if error is not None:
+                print(f"Error fetching {name} history: {error}")
+            series[name] = format_history(result if error is None else [], fmt)
+        return {"resolution": resolution, "series": series}
+
+    key = ("history", tuple(names), start_date, end_date, request.args.get("resolution"), fmt)
+    return cached_json(snapshots.get(key, build))
+
+@app.route('/sensor/snapshot/stats')
+def get_snapshot_stats():
+    return jsonify(snapshots.stats())
+
+@app.route('/sensor/history/stats')
+def get_history_page_stats():
+    return jsonify(history_pages.stats())
+
+@app.route('/sensor/raw/<series>')
+def get_raw_samples(series):
+    """Raw high-rate samples: ?since=<unix time>&limit=<n>, newest `limit` kept."""
+    since = request.args.get("since", type=float)
+    limit = request.args.get("limit", default=10000, type=int)
+    buffer = raw_buffers.get(series)
+    path = os.path.join(RAW_FOLDER, f"{series}.ring")
+    if buffer is None:
+        # Series recorded by enviroment.py
+        if not series.replace('-', '').isalnum() or not os.path.exists(path):
+            return jsonify({"error": "Unknown series"}), 404
+        buffer = RingBuffer.open(path)
+        try:
+            ts, values = buffer.samples(since, limit)
+        finally:
+            buffer.close()
+    else:
+        ts, values = buffer.samples(since, limit)
+    return jsonify({"series": series, "count": len(ts), "t": ts, "v": values})
+
+@app.route('/sensor/columns/<series>')
+def get_columns(series):
+    """Window rows from the local column store as columns: ?start_date&end_date&fields=a,b&limit&every."""
+    if column_store.fields(series) is None:
+        return jsonify({"error": "Unknown series"}), 404
+    try:
+        start_ts, end_ts = parse_time_window(request.args.get("start_date"), request.args.get("end_date"),
+                                             timedelta(days=1))
+    except ValueError:
+        return jsonify({"error": "Invalid timestamp format"}), 400
+    fields = request.args.get("fields")
+    columns = column_store.columns(series, start_ts, end_ts, fields.split(",") if fields else None,
+                                   limit=request.args.get("limit", type=int),
+                                   every=max(1, request.args.get("every", default=1, type=int)))
+    return jsonify({"series": series, "count": len(columns["t"]), "columns": columns})
+
+@app.route('/sensor/columns/<series>/export.parquet')
+def export_columns(series):
+    """Parquet file of a range of `series` (needs pyarrow): ?start_date&end_date, default last 30 days."""
+    if column_store.fields(series) is None:
+        return jsonify({"error": "Unknown series"}), 404
+    try:
+        start_ts, end_ts = parse_time_window(request.args.get("start_date"), request.args.get("end_date"),
+                                             timedelta(days=30))
+    except ValueError:
+        return jsonify({"error": "Invalid timestamp format"}), 400
+    buffer = io.BytesIO()
+    try:
+        column_store.export_parquet(series, buffer, start_ts, end_ts)
+    except ImportError:
+        return jsonify({"error": "Parquet export needs pyarrow"}), 501
+    return Response(buffer.getvalue(), mimetype="application/vnd.apache.parquet",
+                    headers={"Content-Disposition": f"attachment; filename={series}.parquet"})
+
+@app.route('/sensor/columns/stats')
+def get_column_stats():
+    return jsonify(column_store.stats())
+
+@app.route('/sensor/trends')
+def get_trends():
+    """Rolling statistics, drying rate, time until dry and glitches of every local series."""
+    return jsonify(trends.analyze())
+
+@app.route('/sensor/trends/stats')
+def get_trend_stats():
+    return jsonify(trends.stats())
+
+@app.route('/sensor/sampler/stats')
+def get_sampler_stats():
+    return jsonify({plant_id: node.stats() for plant_id, node in plant_nodes.items()})
+
+@app.route('/sensor/cache/stats')
+def get_cache_stats():
+    return jsonify(sensor_caches.stats())
+
+@app.route('/telemetry/stats')
+def get_telemetry_stats():
+    return jsonify(telemetry.stats())
+
+@app.route('/stream')
+def stream():
+    response = Response(live_updates.stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route('/stream/stats')
+def get_stream_stats():
+    return jsonify(live_updates.stats())
+
+@app.route('/uploads')
+def get_uploads():
+    return jsonify(upload_queue.summary())
+
+@app.route('/uploads/<job_id>')
+def get_upload(job_id):
+    job = upload_queue.status(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown upload job"}), 404
+    return jsonify(job)
+
+def upload_queue_full():
+    response = jsonify({"status": "error", "message": "Upload queue is full, try again shortly"})
+    response.headers["Retry-After"] = "5"
+    return response, 503
 
 @app.route('/upload_image/<int:plant_id>', methods=['POST'])
 def upload_image(plant_id):
@@ -385,58 +856,193 @@ def upload_image(plant_id):
         return jsonify({"status":"error","message":"No file uploaded"}), 400
 
     filename = f"plant_{plant_id}.jpg"
-    save_path = os.path.join(LOCAL_IMAGE_FOLDER, filename)
-    file.save(save_path)
+    data = file.read()
+    image_store.put(filename, data)
 
-    with open(save_path, 'rb') as f:
-        url = upload_to_azure(io.BytesIO(f.read()), f"plant_{plant_id}_{datetime.now():%Y%m%d_%H%M%S}.jpg")
-    return jsonify({"status":"success","local": filename, "azure_url": url})
+    blob_name = f"plant_{plant_id}_{datetime.now():%Y%m%d_%H%M%S}.jpg"
+    try:
+        job_id = upload_queue.submit(blob_name, data, on_done=catalog_upload)
+    except queue.Full:
+        return upload_queue_full()
+    thumbnail_worker.submit(blob_name, data)
+    image_metrics.submit(blob_name, data)
+    return jsonify({"status":"success","local": filename, "azure_url": blob_url(blob_name),
+                    "job_id": job_id, "upload": "queued"}), 202
 @app.route('/capture/<int:plant_id>', methods=['POST'])
 def capture(plant_id):
-    if plant_id == 2:
+    plant = plant_registry.get(plant_id)
+    if plant is None:
+        return unknown_plant(plant_id)
+    try:
+        body, status = capture_plant(plant)
+    except queue.Full:
+        return upload_queue_full()
+    return jsonify(body), status
+
+@app.route('/capture/all', methods=['POST'])
+def capture_all():
+    """Capture every plant with a camera at once; takes as long as the slowest node."""
+    plants = [plant for plant in plant_registry.all() if plant.camera is not None]
+    results = plant_registry.fan_out(capture_plant, plants, timeout=CAPTURE_TIMEOUT)
+    summary = {}
+    for plant in plants:
+        result, error = results[plant.id]
+        if isinstance(error, queue.Full):
+            result = {"status": "error", "message": "Upload queue is full"}, 503
+        elif error is not None:
+            result = {"status": "error", "message": str(error)}, 500
+        body, status = result
+        summary[plant.id] = {**body, "code": status}
+    return jsonify(summary), 202
+
+def capture_plant(plant):
+    """Capture one plant here or on its node; returns (body, status). Raises queue.Full."""
+    if plant.node != NODE_NAME:
         try:
-            resp = requests.post(PI2_URL, timeout=10)
+            resp = peers.post(f"{plant_registry.node_url(plant)}/capture/{plant.id}",
+                              timeout=CAPTURE_TIMEOUT)
             resp.raise_for_status()
-            return resp.json() 
+            return resp.json(), resp.status_code
+        except PeerUnavailable as e:
+            return {"status": "error", "message": str(e)}, 503
         except Exception as e:
-            return jsonify({"status":"error","message":str(e)}), 500
-    else:
-        image_url = capture_image(plant_id)
-        if image_url:
-            return jsonify({"status": "success", "image_url": image_url})
-        return jsonify({"status": "error", "message": "Failed to capture image"}), 500
+            return {"status":"error","message":str(e)}, 500
+    if plant.camera is None:
+        return {"status": "error", "message": f"Plant {plant.id} has no camera"}, 404
+    with capture_lock:
+        result = capture_image(plant)
+    if result:
+        job_id, image_url = result
+        return {"status": "success", "image_url": image_url, "job_id": job_id, "upload": "queued"}, 202
+    return {"status": "error", "message": "Failed to capture image"}, 500
+
+@app.route('/peers/stats')
+def get_peer_stats():
+    return jsonify(peers.stats())
 @app.route('/analytics')
 def analytics():
+    # Optional filters: plant=<id>, start_date/end_date=YYYY-MM-DD, before=<cursor from an "Older" link>
+    plant = request.args.get("plant", type=int)
+    start_date = request.args.get("start_date") or None
+    end_date = request.args.get("end_date") or None
+    before = request.args.get("before") if plant else None
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y%m%d_000000") if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d").strftime("%Y%m%d_235959") if end_date else None
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
     plant_images = {}
     try:
-        blob_list = container_client.list_blobs()
-        for blob in blob_list:
-            match = re.match(r"plant_(\d+)_(\d{8}_\d{6})\.jpg", blob.name)
-            if match:
-                plant_id = match.group(1)
-                timestamp_str = match.group(2)
-                try:
-                    timestamp = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                    formatted_timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    formatted_timestamp = "Unknown timestamp"
-
-                plant_key = f"Plant {plant_id}"
-                if plant_key not in plant_images:
-                    plant_images[plant_key] = []
-
-                blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob.name}"
-                plant_images[plant_key].append({"url": blob_url, "timestamp": formatted_timestamp})
+        for plant_id in [plant] if plant else image_catalog.plants():
+            rows, older = image_catalog.page(plant_id, start, end, before, ANALYTICS_PAGE_SIZE)
+            images = []
+            for blob_name, taken_at, variants in rows:
+                timestamp = datetime.strptime(taken_at, "%Y%m%d_%H%M%S")
+                # Originals without derivatives (older uploads) are shown as they are.
+                images.append({
+                    "url": blob_url(blob_name),
+                    "thumb": blob_url(variant_name(blob_name, "thumb")) if "thumb" in variants else None,
+                    "preview": blob_url(variant_name(blob_name, "preview")) if "preview" in variants else None,
+                    "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S")})
+            plant_images[f"Plant {plant_id}"] = {"id": plant_id, "images": images, "older": older}
     except Exception as e:
-        print(f"Error listing blobs: {e}")
+        print(f"Error reading image catalog: {e}")
+
+    return render_template('analytics.html', plant_images=plant_images, plant=plant,
+                           start_date=start_date, end_date=end_date, before=before)
+
+@app.route('/analytics/catalog/stats')
+def get_catalog_stats():
+    return jsonify(image_catalog.stats())
 
-    return render_template('analytics.html', plant_images=plant_images)
+@app.route('/analytics/metrics/<int:plant_id>')
+def get_image_metrics(plant_id):
+    """Per-image metrics of one plant for charts, oldest first: ?start_date&end_date=YYYY-MM-DD&limit."""
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y%m%d_000000") if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d").strftime("%Y%m%d_235959") if end_date else None
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    store = image_metrics.store
+    series = store.series(plant_id, start, end, request.args.get("limit", default=500, type=int))
+    series["time"] = [datetime.strptime(t, "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S") for t in series["time"]]
+    return jsonify({"plant_id": plant_id, **series, "histogram": store.latest_histogram(plant_id)})
+
+@app.route('/analytics/metrics/stats')
+def get_image_metrics_stats():
+    return jsonify(image_metrics.stats())
+
+# Every component's stats() is exported next to the request and upstream timings.
+# Through lambdas, so registering doesn't open the stores.
+REGISTRY.register_stats("telemetry", lambda: telemetry.stats())
+REGISTRY.register_stats("cache", sensor_caches.stats, label="cache")
+REGISTRY.register_stats("snapshot", snapshots.stats)
+REGISTRY.register_stats("history_pages", history_pages.stats)
+REGISTRY.register_stats("columns", column_store.stats)
+REGISTRY.register_stats("trends", trends.stats)
+REGISTRY.register_stats("catalog", lambda: image_catalog.stats())
+REGISTRY.register_stats("image_metrics", image_metrics.stats)
+REGISTRY.register_stats("stream", live_updates.stats)
+REGISTRY.register_stats("uploads", lambda: upload_queue.summary()["counts"])
+REGISTRY.register_stats("derivative_uploads", lambda: derivative_queue.summary()["counts"])
+REGISTRY.register_stats("peer", peers.stats, label="peer")
+REGISTRY.register_stats("plant", lambda: {plant_id: node.stats() for plant_id, node in plant_nodes.items()},
+                        label="plant")
+REGISTRY.register_stats("component", COMPONENTS.stats, label="component")
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(render(), mimetype=CONTENT_TYPE)
+
+@app.route('/metrics/traces')
+def get_slow_traces():
+    return jsonify(list(slow_traces))
+
+@app.route('/health')
+def health():
+    """State and init time of every sensor, camera and Azure client; "degraded" while one is failing."""
+    body = COMPONENTS.health()
+    body["hardware"] = owns_hardware()
+    if owns_hardware():
+        body["plants"] = {plant_id: node.stats() for plant_id, node in plant_nodes.items()}
+    return jsonify(body)
 
 
 @app.route('/temp_images/<filename>')
 def serve_image(filename):
-    return send_from_directory(LOCAL_IMAGE_FOLDER, filename)
+    image = image_store.get(filename)
+    if image is None:
+        return send_from_directory(LOCAL_IMAGE_FOLDER, filename)
+
+    response = Response(image.data, mimetype="image/jpeg")
+    response.set_etag(image.etag)
+    response.last_modified = image.updated_at / 1e9
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def startup():
+    """Start this process's background work; call once, before serving and before start_hardware().
+
+    Importing app.py starts no thread and touches no file; this does.
+    """
+    # Forks the image metrics workers, so it must run before anything starts a thread.
+    image_metrics.start()
+    os.makedirs(LOCAL_IMAGE_FOLDER, exist_ok=True)
+    for plant in local_plants:
+        node = plant_nodes[plant.id] = PlantNode(plant, log_moisture_window, RAW_FOLDER, trends=trends)
+        raw_buffers.update(node.raw)
+        column_store.create(f"moisture-{plant.id}", window_columns(["moisture"]))
+    stream_poller.start()
+    # The API serves right away; the clients and stores are created in the background meanwhile.
+    COMPONENTS.warm_async()
 
 
 if __name__ == '__main__':
+    # Single process: this one owns the hardware. Use wsgi.py to run several workers.
+    startup()
+    start_hardware()
     app.run(host='0.0.0.0', port=5071, debug=True, use_reloader=False)
@@ -0,0 +1,54 @@
+"""Compute image metrics for every catalogued image that has none yet.
+
+Images uploaded before the metrics pipeline existed (or skipped while it
+was saturated) are downloaded in parallel batches, preferring their
+preview, and analysed on a process pool; progress is printed every few
+seconds. Run it on the hub against the same catalog database as the app;
+it can be interrupted and started again at any time.
+
+    python backfill_image_metrics.py "<container SAS URL>" [--reconcile] [--workers 4]
+"""
+import argparse
+import os
+
+from image_catalog import ImageCatalog
+from image_metrics import BATCH_SIZE, DOWNLOAD_WORKERS, ImageMetricsStore, backfill, start_pool
+
+CATALOG_PATH = os.path.join("data", "image_catalog.db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute image metrics for catalogued images.")
+    parser.add_argument("container_url", help="SAS URL of the image container")
+    parser.add_argument("--db", default=CATALOG_PATH, help="image catalog database")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="bring the catalog in line with the container first")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="analysis processes")
+    parser.add_argument("--downloads", type=int, default=DOWNLOAD_WORKERS, help="parallel downloads")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many images")
+    args = parser.parse_args()
+
+    # Fork the analysis processes before the Azure client starts any threads.
+    pool = start_pool(args.workers)
+    from azure.storage.blob import ContainerClient
+    container_client = ContainerClient.from_container_url(args.container_url)
+
+    catalog = ImageCatalog(args.db)
+    if args.reconcile:
+        while not catalog.reconcile(container_client):
+            print(f"[BACKFILL] Catalogued {catalog.count()} images so far")
+    store = ImageMetricsStore(args.db)
+
+    def download(blob_name):
+        return container_client.download_blob(blob_name).readall()
+
+    done, failed, elapsed = backfill(store, download, pool, args.batch_size, args.downloads, args.limit,
+                                     report=lambda line: print(f"[BACKFILL] {line}"))
+    pool.shutdown()
+    rate = done / elapsed if elapsed else 0.0
+    print(f"[BACKFILL] Analysed {done} images in {elapsed:.1f}s ({rate:.1f} images/s), {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Rebuild the rollup table from a raw sensor table.
+
+Raw rows come back newest-first within each partition, so buckets complete
+one after another while the table is scanned; each finished bucket is
+written with REPLACE semantics in 100-entity transactions per rollup
+partition. Running it again simply rewrites the same buckets.
+
+    python backfill_rollups.py "<raw table SAS URL>" "<rollup table SAS URL>" \\
+        --fields moisture [--partition Plant1 --partition Plant2]
+"""
+import argparse
+import time
+
+from rollups import RESOLUTIONS, Bucket, bucket_start
+from row_keys import is_legacy_key, row_key_ts
+from table_query import iter_entities
+
+BATCH_SIZE = 100
+REPORT_INTERVAL = 5.0
+
+
+class BackfillSink:
+    """Collects finished rollup entities and writes them per partition in batches."""
+
+    def __init__(self, table_client, dry_run=False):
+        self.table_client = table_client
+        self.dry_run = dry_run
+        self.pending = {}
+        self.written = 0
+
+    def add(self, entity):
+        batch = self.pending.setdefault(entity["PartitionKey"], [])
+        batch.append(("upsert", entity, {"mode": "replace"}))
+        if len(batch) >= BATCH_SIZE:
+            self._submit(entity["PartitionKey"])
+
+    def close(self):
+        for partition in list(self.pending):
+            self._submit(partition)
+
+    def _submit(self, partition):
+        batch = self.pending.pop(partition, [])
+        if batch and not self.dry_run:
+            self.table_client.submit_transaction(batch)
+        self.written += len(batch)
+
+
+def backfill(raw_client, sink, fields, partitions=None, resolutions=RESOLUTIONS):
+    """Scan raw rows and emit every rollup bucket; returns (rows_scanned, seconds)."""
+    started = time.monotonic()
+    last_report = started
+    scanned = 0
+    open_buckets = {}
+    sources = [iter_entities(raw_client, partition) for partition in partitions] if partitions \
+        else [iter_entities(raw_client)]
+
+    def close(key):
+        start, bucket = open_buckets.pop(key)
+        sink.add(bucket.to_entity(key[0], key[1], start))
+
+    for rows in sources:
+        for entity in rows:
+            if is_legacy_key(entity["RowKey"]):
+                continue
+            series = entity["PartitionKey"]
+            ts = row_key_ts(entity["RowKey"])
+            values = {field: entity.get(field) for field in fields}
+            for resolution, seconds in resolutions.items():
+                key = (series, resolution)
+                start = bucket_start(ts, seconds)
+                current = open_buckets.get(key)
+                if current is not None and current[0] != start:
+                    close(key)
+                    current = None
+                if current is None:
+                    current = open_buckets[key] = (start, Bucket())
+                current[1].add(values)
+            scanned += 1
+            now = time.monotonic()
+            if now - last_report >= REPORT_INTERVAL:
+                last_report = now
+                print(f"[BACKFILL] {scanned} rows, {scanned / (now - started):.0f} rows/s, "
+                      f"{sink.written} buckets written, partition {series}")
+    for key in list(open_buckets):
+        close(key)
+    sink.close()
+    return scanned, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild rollups from a raw sensor table.")
+    parser.add_argument("raw_table_url", help="SAS URL of the raw sensor table")
+    parser.add_argument("rollup_table_url", help="SAS URL of the rollup table")
+    parser.add_argument("--fields", nargs="+", required=True,
+                        help="numeric properties to aggregate, e.g. moisture or Temperature Humidity")
+    parser.add_argument("--partition", action="append", dest="partitions",
+                        help="limit the scan to this PartitionKey (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="scan without writing")
+    args = parser.parse_args()
+
+    from azure.data.tables import TableClient
+    raw_client = TableClient.from_table_url(args.raw_table_url)
+    sink = BackfillSink(TableClient.from_table_url(args.rollup_table_url), args.dry_run)
+
+    scanned, elapsed = backfill(raw_client, sink, args.fields, args.partitions)
+    rate = scanned / elapsed if elapsed else 0.0
+    print(f"[BACKFILL] Scanned {scanned} rows in {elapsed:.1f}s ({rate:.0f} rows/s), "
+          f"wrote {sink.written} buckets")
+
+
+if __name__ == "__main__":
+    main()
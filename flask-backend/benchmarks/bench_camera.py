@@ -0,0 +1,85 @@
+"""Capture latency: open-per-shot camera access vs the persistent CaptureWorker.
+
+The legacy path opens the device, discards five warm-up frames 0.1 s apart,
+reads one frame and releases it, as capture_image used to. The worker path
+serves the same number of captures from a running CaptureWorker, issued
+concurrently from a "scheduler" and a "route" thread. Both use
+FakeFrameSource, and the worker also survives an unplugged camera. Run from
+flask-backend/:
+
+    python benchmarks/bench_camera.py [--captures 20] [--open-delay 0.5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_devices import FakeFrameSource
+from camera import CaptureWorker
+
+
+def legacy_capture(open_delay):
+    camera = FakeFrameSource(open_delay=open_delay)
+    for _ in range(5):
+        camera.read()
+        time.sleep(0.1)
+    ret, frame = camera.read()
+    camera.release()
+    return frame
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=20)
+    parser.add_argument("--open-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    legacy = []
+    for _ in range(min(args.captures, 5)):
+        started = time.perf_counter()
+        legacy_capture(args.open_delay)
+        legacy.append(time.perf_counter() - started)
+    print(f"open-per-shot: p50 {percentile(legacy, 0.5):7.1f} ms  p99 {percentile(legacy, 0.99):7.1f} ms")
+
+    FakeFrameSource.opened = 0
+    worker = CaptureWorker(lambda: FakeFrameSource(open_delay=args.open_delay,
+                                                   fail_after=args.captures * 3))
+    worker.start()
+    worker.capture()
+    latencies = []
+    lock = threading.Lock()
+
+    def client(count):
+        for _ in range(count):
+            started = time.perf_counter()
+            frame, _ = worker.capture()
+            elapsed = time.perf_counter() - started
+            assert frame is not None
+            with lock:
+                latencies.append(elapsed)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=client, args=(args.captures // 2,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"worker:        p50 {percentile(latencies, 0.5):7.3f} ms  p99 {percentile(latencies, 0.99):7.3f} ms")
+
+    time.sleep(args.open_delay + 2 * args.captures * 3 / 5)
+    frame, taken = worker.capture()
+    worker.stop()
+    print(f"worker read {worker.frames_read} frames, reopened the device {worker.reopens} times "
+          f"({FakeFrameSource.opened} opens), last frame {time.time() - taken:.2f}s old")
+
+
+if __name__ == "__main__":
+    main()
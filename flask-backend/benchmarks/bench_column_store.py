@@ -0,0 +1,95 @@
+"""Long-range history: Azure list-and-filter vs the local column store.
+
+Loads `--days` of one-minute temperature windows both into a
+FakeTableClient and into a ColumnStore in a temp folder. The legacy path
+is what a raw history query does today: query_window() over the
+partition, then turn every entity's RowKey into a time and pick its
+fields. The store answers the same range by binary-searching each day's
+timestamp column and slicing the columns. The fake table has no network
+latency, so the legacy numbers are its CPU cost only; the page count shows
+how many round trips Azure would add. Run from flask-backend/:
+
+    python benchmarks/bench_column_store.py [--days 365]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from column_store import ColumnStore
+from row_keys import make_row_key, row_key_ts
+from sampling import window_columns
+from table_query import query_window
+
+PARTITION = "Enviroment"
+
+
+def legacy_history(client, start_ts, end_ts):
+    entities = query_window(client, PARTITION, start_ts, end_ts, select=["RowKey", "Temperature", "Humidity"])
+    return [{"time": datetime.fromtimestamp(row_key_ts(e["RowKey"])).strftime("%Y-%m-%d %H:%M"),
+             "temperature": e["Temperature"], "humidity": e["Humidity"]}
+            for e in entities if e.get("Temperature") is not None]
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    end_ts = time.time() // 60 * 60
+    start_ts = end_ts - args.days * 86400
+    rows = args.days * 1440
+
+    client = FakeTableClient()
+    client.load({"PartitionKey": PARTITION, "RowKey": make_row_key(start_ts + i * 60),
+                 "Temperature": 20 + (i % 100) / 10, "Humidity": 40 + (i % 50) / 10} for i in range(rows))
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = ColumnStore(folder)
+        store.create("temperature", window_columns(["Temperature", "Humidity"]))
+        started = time.perf_counter()
+        for i in range(rows):
+            store.append("temperature", start_ts + i * 60,
+                         {"Temperature": 20 + (i % 100) / 10, "Temperature_count": 30,
+                          "Humidity": 40 + (i % 50) / 10, "Humidity_count": 30})
+        per_append = (time.perf_counter() - started) / rows
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(folder) for name in names)
+        print(f"{rows} rows ({args.days} days): {per_append * 1e6:.1f} us per append, "
+              f"{size / rows:.0f} bytes per row on disk (10 columns + time)")
+
+        fields = ["Temperature", "Humidity"]
+        client.reset_counters()
+        legacy, history = timed(lambda: legacy_history(client, start_ts, end_ts))
+        print(f"{args.days}-day query, list-and-filter: {legacy * 1000:8.0f} ms, {len(history)} rows, "
+              f"{client.pages} pages (round trips)")
+        cold, columns = timed(lambda: store.columns("temperature", start_ts, end_ts, fields))
+        warm, columns = timed(lambda: store.columns("temperature", start_ts, end_ts, fields))
+        print(f"{args.days}-day query, column store:   {cold * 1000:8.0f} ms cold, {warm * 1000:.0f} ms warm, "
+              f"{len(columns['t'])} rows")
+        assert len(columns["t"]) == len(history)
+        thinned, columns = timed(lambda: store.columns("temperature", start_ts, end_ts, fields, every=60))
+        print(f"{args.days}-day query, every 60th row: {thinned * 1000:8.1f} ms, {len(columns['t'])} rows")
+
+        day_start = end_ts - 86400 * (args.days // 2)
+        client.reset_counters()
+        legacy, history = timed(lambda: legacy_history(client, day_start, day_start + 86400))
+        store_day, columns = timed(lambda: store.columns("temperature", day_start, day_start + 86400, fields))
+        print(f"one day from {args.days // 2} days ago: list-and-filter {legacy * 1000:.1f} ms "
+              f"({client.pages} pages), column store {store_day * 1000:.2f} ms, {len(columns['t'])} rows")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
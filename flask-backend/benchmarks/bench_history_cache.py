@@ -0,0 +1,119 @@
+"""Repeated chart loads of past history windows: rebuilt every time vs ResponseCache.
+
+Loads `--days` of 1m and 1h moisture rollups into a FakeTableClient with
+`--page-latency` per page, then loads the charts of every settled day (1m,
+up to 1000 points per page and cursor pages for the rest) and of the whole
+period (1h) `--loads` times. The uncached path queries the rollups and
+serializes each page on every load, like the endpoints did; the cached one
+goes through ResponseCache and gzip. It prints time per load and table
+queries, then the bytes of one day's page as rows and columns JSON, gzip
+and (if installed) brotli. Run from flask-backend/:
+
+    python benchmarks/bench_history_cache.py [--days 30] [--loads 5]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from response_cache import ResponseCache, _brotli, is_settled, make_cursor, parse_cursor, to_columns, to_rows
+from rollups import bucket_start, query_rollups, rollup_partition
+from row_keys import make_row_key, row_key_ts
+
+SERIES = "Plant1"
+PAGE_LIMIT = 1000
+
+
+def rollup_points(client, resolution, start_ts, end_ts, limit):
+    points = []
+    for e in query_rollups(client, SERIES, resolution, start_ts, end_ts, limit):
+        ts = row_key_ts(e["RowKey"])
+        points.append({"ts": ts, "time": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M"),
+                       "moisture": e.get("moisture"), "moisture_min": e.get("moisture_min"),
+                       "moisture_max": e.get("moisture_max"), "count": e.get("moisture_count", 0)})
+    return points
+
+
+def build_page(client, resolution, start_ts, end_ts, fmt):
+    """(data, next_cursor, immutable); nothing is spooled here, so a settled, non-empty page is final."""
+    points = rollup_points(client, resolution, start_ts, end_ts, PAGE_LIMIT + 1)
+    next_cursor = make_cursor(points[PAGE_LIMIT - 1]["ts"]) if len(points) > PAGE_LIMIT else None
+    data = to_columns(points[:PAGE_LIMIT]) if fmt == "columns" else to_rows(points[:PAGE_LIMIT])
+    return data, next_cursor, bool(points) and is_settled(end_ts, resolution)
+
+
+def load_chart(client, resolution, start_ts, end_ts, cache=None):
+    """Every page of one chart; returns the bytes sent."""
+    sent = 0
+    cursor = None
+    while True:
+        page_end = min(end_ts, parse_cursor(cursor) - 1e-6) if cursor else end_ts
+        if cache is None:
+            data, cursor, _ = build_page(client, resolution, start_ts, page_end, "rows")
+            sent += len(json.dumps(data, separators=(",", ":")).encode())
+        else:
+            key = (SERIES, (start_ts, page_end), resolution, "rows", PAGE_LIMIT)
+            page = cache.get(key, lambda: build_page(client, resolution, start_ts, page_end, "rows"))
+            sent += len(cache.encode(page, "gzip")[1])
+            cursor = page.next_cursor
+        if cursor is None:
+            return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--loads", type=int, default=5)
+    parser.add_argument("--page-latency", type=float, default=0.02, help="seconds per table page")
+    args = parser.parse_args()
+
+    end_ts = bucket_start(time.time(), 86400)
+    start_ts = end_ts - args.days * 86400
+    client = FakeTableClient(page_latency=args.page_latency)
+    for resolution, seconds in (("1m", 60), ("1h", 3600)):
+        client.load({"PartitionKey": rollup_partition(SERIES, resolution), "RowKey": make_row_key(ts),
+                     "moisture": 700 - (ts % 86400) / 360, "moisture_min": 690.0, "moisture_max": 710.0,
+                     "moisture_std": 2.5, "moisture_count": seconds // 60}
+                    for ts in range(start_ts, end_ts, seconds))
+
+    # A day that ended less than SETTLE_SECONDS ago is only cached for the short max-age.
+    charts = [("1m", day, day + 86400 - 1) for day in range(start_ts, end_ts, 86400)]
+    charts.append(("1h", start_ts, end_ts - 1))
+
+    cache = ResponseCache()
+    print(f"{len(charts)} charts ({args.days} days at 1m, plus {args.days} days at 1h), {args.loads} loads each:")
+    for name, selected, loads in (("rebuilt", None, args.loads), ("cold", cache, 1), ("cached", cache, args.loads)):
+        client.reset_counters()
+        started = time.perf_counter()
+        sent = 0
+        for _ in range(loads):
+            for resolution, first, last in charts:
+                sent += load_chart(client, resolution, first, last, selected)
+        elapsed = time.perf_counter() - started
+        print(f"  {name:<8} {elapsed / loads * 1000:8.1f} ms per load  "
+              f"{client.calls / loads:6.1f} table queries per load  {sent / loads / 1024:8.1f} KiB per load")
+    print(f"  cache: {cache.stats()}")
+
+    day = charts[0]
+    rows, _, _ = build_page(client, day[0], day[1], day[2], "rows")
+    columns, _, _ = build_page(client, day[0], day[1], day[2], "columns")
+    print(f"one day at 1m ({len(rows)} points):")
+    brotli = _brotli()
+    for name, data in (("rows", rows), ("columns", columns)):
+        body = json.dumps(data, separators=(",", ":")).encode()
+        sizes = f"{len(body) / 1024:7.1f} KiB  gzip {len(gzip.compress(body, 6)) / 1024:6.1f} KiB"
+        if brotli:
+            sizes += f"  br {len(brotli.compress(body, quality=5)) / 1024:6.1f} KiB"
+        print(f"  {name:<8} {sizes}")
+    if not brotli:
+        print("  (install brotli for the br column)")
+
+
+if __name__ == "__main__":
+    main()
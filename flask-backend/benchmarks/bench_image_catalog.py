@@ -0,0 +1,94 @@
+"""/analytics cost: listing the whole container vs paging through ImageCatalog.
+
+FakeContainerClient is filled with one-per-minute captures for several
+plants. The legacy page load lists and regex-parses every blob, as the
+route used to; the catalog page load reads one page per plant from SQLite,
+for the newest page and for a page deep in the history. Also reports the
+initial resumable import and the cost of an incremental reconcile. Run from
+flask-backend/:
+
+    python benchmarks/bench_image_catalog.py [--days 60] [--plants 2]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeContainerClient
+from image_catalog import ImageCatalog
+
+
+def legacy_page(container):
+    plant_images = {}
+    for blob in container.list_blobs():
+        match = re.match(r"plant_(\d+)_(\d{8}_\d{6})\.jpg", blob.name)
+        if match:
+            timestamp = datetime.strptime(match.group(2), "%Y%m%d_%H%M%S")
+            plant_images.setdefault(f"Plant {match.group(1)}", []).append(
+                {"url": blob.name, "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S")})
+    return plant_images
+
+
+def catalog_page(catalog, before=None):
+    pages = {}
+    for plant_id in catalog.plants():
+        rows, older = catalog.page(plant_id, before=before)
+        pages[plant_id] = (rows, older)
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--plants", type=int, default=2)
+    args = parser.parse_args()
+
+    container = FakeContainerClient(request_latency=0.01)
+    end = datetime(2025, 6, 1)
+    minutes = args.days * 24 * 60
+    for plant_id in range(1, args.plants + 1):
+        for i in range(minutes):
+            container.blobs[f"plant_{plant_id}_{end - timedelta(minutes=i):%Y%m%d_%H%M%S}.jpg"] = b""
+    print(f"{len(container.blobs)} blobs ({args.plants} plants x {args.days} days), 10 ms per list request")
+
+    started = time.perf_counter()
+    legacy_page(container)
+    legacy = time.perf_counter() - started
+    print(f"  list whole container: {legacy * 1000:9.1f} ms per page view ({container.requests} list requests)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        catalog = ImageCatalog(os.path.join(folder, "catalog.db"))
+        started = time.perf_counter()
+        runs = 1
+        while not catalog.reconcile(container, today=end):
+            runs += 1
+        print(f"  initial import:       {time.perf_counter() - started:9.1f} s in {runs} resumable runs "
+              f"({catalog.count()} images)")
+
+        started = time.perf_counter()
+        pages = catalog_page(catalog)
+        newest = time.perf_counter() - started
+        cursor = "20250401_000000"
+        started = time.perf_counter()
+        catalog_page(catalog, before=cursor)
+        deep = time.perf_counter() - started
+        print(f"  catalog, newest page: {newest * 1000:9.3f} ms per page view")
+        print(f"  catalog, older page:  {deep * 1000:9.3f} ms per page view")
+
+        for plant_id in range(1, args.plants + 1):
+            container.blobs[f"plant_{plant_id}_{end + timedelta(minutes=1):%Y%m%d_%H%M%S}.jpg"] = b""
+        requests = container.requests
+        started = time.perf_counter()
+        catalog.reconcile(container, today=end + timedelta(days=1))
+        print(f"  incremental reconcile: {(time.perf_counter() - started) * 1000:8.1f} ms, "
+              f"{container.requests - requests} list requests, {catalog.count()} images")
+        assert len(pages[1][0]) == 20
+
+
+if __name__ == "__main__":
+    main()
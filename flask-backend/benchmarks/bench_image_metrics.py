@@ -0,0 +1,108 @@
+"""Image metrics: capture-path cost and backfill throughput.
+
+Synthetic plant photos (a green canopy that grows from frame to frame on
+a soil-coloured background) are JPEG-encoded as capture_image does. The
+capture-path numbers compare computing the metrics inline with handing
+the bytes to MetricsPipeline. The backfill part puts `--images` of them in
+a FakeContainerClient (`--latency` per request) and analyses them one by
+one (download, compute, store) vs with backfill() on a process pool.
+Needs OpenCV and NumPy. Run from flask-backend/:
+
+    python benchmarks/bench_image_metrics.py [--images 200] [--width 1920] [--height 1080]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from benchmarks.fake_azure import FakeContainerClient
+from image_catalog import ImageCatalog
+from image_metrics import ImageMetricsStore, MetricsPipeline, backfill, compute_metrics, start_pool
+
+
+def plant_photo(width, height, growth, seed):
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (40, 70, 110)
+    centre = (width // 2, height // 2)
+    axes = (int(width * (0.1 + 0.25 * growth)), int(height * (0.1 + 0.3 * growth)))
+    cv2.ellipse(frame, centre, axes, 0, 0, 360, (40, 160, 60), -1)
+    cv2.ellipse(frame, (centre[0] + axes[0] // 2, centre[1]), (axes[0] // 6, axes[1] // 6), 0, 0, 360,
+                (40, 200, 220), -1)
+    noise = rng.integers(0, 20, (height, width, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode(".jpg", cv2.add(frame, noise), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def blob_names(count):
+    start = datetime(2025, 1, 1)
+    return [f"plant_1_{start + timedelta(hours=i):%Y%m%d_%H%M%S}.jpg" for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    pool = start_pool(args.workers)
+    names = blob_names(args.images)
+    photos = {name: plant_photo(args.width, args.height, i / args.images, i) for i, name in enumerate(names)}
+
+    with tempfile.TemporaryDirectory() as folder:
+        runs = 20
+        sample = photos[names[0]]
+        started = time.perf_counter()
+        for _ in range(runs):
+            compute_metrics(sample)
+        inline = (time.perf_counter() - started) / runs
+
+        pipeline = MetricsPipeline(pool, ImageMetricsStore(os.path.join(folder, "capture.db")), max_pending=runs)
+        started = time.perf_counter()
+        for name in names[:runs]:
+            pipeline.submit(name, photos[name])
+        handed_over = (time.perf_counter() - started) / runs
+        while pipeline.stats()["pending"]:
+            time.sleep(0.01)
+        print(f"{args.width}x{args.height} JPEG ({len(sample) // 1024} KiB): metrics inline {inline * 1000:.1f} ms "
+              f"per capture, handed to the process pool {handed_over * 1e6:.0f} us")
+
+        container = FakeContainerClient(request_latency=args.latency, bandwidth=8 * 1024 * 1024)
+        container.blobs.update(photos)
+        print(f"backfill of {args.images} images, {args.latency * 1000:.0f} ms per download:")
+
+        store = ImageMetricsStore(os.path.join(folder, "sequential.db"))
+        ImageCatalog(os.path.join(folder, "sequential.db")).add_many((name, len(data)) for name, data in photos.items())
+        started = time.perf_counter()
+        for name, _ in store.missing(limit=args.images):
+            store.add(name, compute_metrics(container.download_blob(name).readall()))
+        sequential = time.perf_counter() - started
+        print(f"  one by one          {sequential:6.1f} s  ({args.images / sequential:5.1f} images/s)")
+
+        db = os.path.join(folder, "backfill.db")
+        ImageCatalog(db).add_many((name, len(data)) for name, data in photos.items())
+        store = ImageMetricsStore(db)
+        done, failed, elapsed = backfill(store, lambda name: container.download_blob(name).readall(), pool,
+                                         report=lambda line: print(f"    {line}"))
+        print(f"  backfill, {args.workers} processes {elapsed:6.1f} s  ({done / elapsed:5.1f} images/s), "
+              f"{failed} failed")
+
+        series = store.series(1)
+        print(f"  coverage {series['coverage'][0]} -> {series['coverage'][-1]}, "
+              f"canopy {series['canopy'][0]} -> {series['canopy'][-1]}, "
+              f"mean change between frames {np.mean(series['change'][1:]):.3f}")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Per-capture wall time and SD-card writes: disk round-trip vs in-memory encode.
+
+The old path wrote each frame with cv2.imwrite, read the file back into a
+BytesIO and handed that to the uploader. The new path encodes once with
+cv2.imencode and hands the same bytes to the uploader and LatestImageStore,
+which writes the file on a background thread (or not at all). The uploader
+is a no-op here so only local costs are measured. Pin to one core with
+--cpu 0 to approximate a Raspberry Pi's budget. Needs OpenCV and NumPy.
+Run from flask-backend/:
+
+    python benchmarks/bench_image_pipeline.py [--captures 50] [--cpu 0]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_store import LatestImageStore
+
+
+def synthetic_frame(width, height, seed):
+    rng = np.random.default_rng(seed)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :, 1] = np.linspace(40, 200, width, dtype=np.uint8)
+    noise = rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+    return cv2.add(frame, noise)
+
+
+def upload(data):
+    return len(data)
+
+
+def disk_round_trip(frame, folder, stats):
+    path = os.path.join(folder, "plant_1.jpg")
+    if os.path.exists(path):
+        os.remove(path)
+    cv2.imwrite(path, frame)
+    stats["writes"] += 1
+    stats["bytes"] += os.path.getsize(path)
+    with open(path, "rb") as f:
+        stream = io.BytesIO(f.read())
+    return upload(stream.getvalue())
+
+
+def in_memory(frame, store):
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    data = encoded.tobytes()
+    store.put("plant_1.jpg", data)
+    return upload(data)
+
+
+def timed(fn, frames, *args):
+    started, cpu = time.perf_counter(), time.process_time()
+    for frame in frames:
+        fn(frame, *args)
+    count = len(frames)
+    return (time.perf_counter() - started) / count * 1000, (time.process_time() - cpu) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=50)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--cpu", type=int, help="pin the benchmark to this CPU core")
+    args = parser.parse_args()
+    if args.cpu is not None:
+        os.sched_setaffinity(0, {args.cpu})
+        cv2.setNumThreads(1)
+
+    frames = [synthetic_frame(args.width, args.height, i) for i in range(args.captures)]
+    folder = tempfile.mkdtemp()
+
+    disk_stats = {"writes": 0, "bytes": 0}
+    old_wall, old_cpu = timed(disk_round_trip, frames, folder, disk_stats)
+
+    async_store = LatestImageStore(folder)
+    new_wall, new_cpu = timed(in_memory, frames, async_store)
+    async_store.close()
+
+    memory_store = LatestImageStore()
+    mem_wall, mem_cpu = timed(in_memory, frames, memory_store)
+
+    print(f"{'path':<28} {'wall ms':>8} {'cpu ms':>7} {'disk writes':>11} {'MB written':>10}")
+    print(f"{'imwrite + reread':<28} {old_wall:>8.2f} {old_cpu:>7.2f} {disk_stats['writes']:>11} "
+          f"{disk_stats['bytes'] / 1e6:>10.2f}")
+    print(f"{'imencode + async disk copy':<28} {new_wall:>8.2f} {new_cpu:>7.2f} "
+          f"{async_store.disk_writes:>11} {async_store.bytes_written / 1e6:>10.2f}")
+    print(f"{'imencode, memory only':<28} {mem_wall:>8.2f} {mem_cpu:>7.2f} {0:>11} {0:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
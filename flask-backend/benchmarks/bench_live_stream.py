@@ -0,0 +1,114 @@
+"""Per-client cost of dashboard updates: 5-second polling vs the /stream fan-out.
+
+N simulated dashboards are kept open for the same period. In polling mode
+each one requests the latest temperature every `--poll` seconds and the
+handler JSON-encodes a fresh response, as /sensor/temperature does. In
+stream mode one ChangePoller publishes a new reading every `--poll` seconds
+and every client reads it from its Broadcaster.stream() generator. The
+report shows handler invocations, CPU per client and delivery delay. Run
+from flask-backend/:
+
+    python benchmarks/bench_live_stream.py [--clients 100] [--seconds 10] [--poll 0.5]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_stream import Broadcaster, ChangePoller
+
+
+class Sensor:
+    """Latest reading, changing every `period` seconds like the logger's output."""
+
+    def __init__(self, period):
+        self.period = period
+        self.started = time.time()
+
+    def latest(self):
+        tick = int((time.time() - self.started) / self.period)
+        return {"temperature": 20 + tick % 10, "humidity": 50, "produced": self.started + tick * self.period}
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+def run_polling(clients, seconds, interval, sensor):
+    delays, requests = [], [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client(offset):
+        stop.wait(offset)
+        seen = None
+        while not stop.is_set():
+            body = json.dumps(sensor.latest())
+            data = json.loads(body)
+            with lock:
+                requests[0] += 1
+                if data["produced"] != seen:
+                    seen = data["produced"]
+                    delays.append(time.time() - data["produced"])
+            stop.wait(interval)
+
+    threads = [threading.Thread(target=client, args=(interval * i / clients,)) for i in range(clients)]
+    return run(threads, stop, seconds), requests[0], delays
+
+
+def run_stream(clients, seconds, interval, sensor):
+    broadcaster = Broadcaster()
+    delays = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client():
+        for chunk in broadcaster.stream(heartbeat=0.2):
+            if stop.is_set():
+                break
+            if chunk.startswith(b"event:"):
+                data = json.loads(chunk.split(b"data: ", 1)[1])
+                with lock:
+                    delays.append(time.time() - data["produced"])
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    poller = ChangePoller(broadcaster, {"temperature": sensor.latest}, interval=interval / 10)
+    poller.start()
+    cpu = run(threads, stop, seconds)
+    poller.stop()
+    return cpu, broadcaster.published, delays
+
+
+def run(threads, stop, seconds):
+    started = time.process_time()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return time.process_time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--poll", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients for {args.seconds:.0f} s, a new reading every {args.poll} s")
+    for name, mode in (("polling", run_polling), ("stream ", run_stream)):
+        cpu, handled, delays = mode(args.clients, args.seconds, args.poll, Sensor(args.poll))
+        print(f"  {name}: {handled:6d} handler calls, "
+              f"{cpu / args.clients / args.seconds * 1000:6.2f} ms CPU per client per second, "
+              f"delivery delay p50 {percentile(delays, 0.5):6.1f} ms  p99 {percentile(delays, 0.99):6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Load test of the hub app: every sensor, capture, upload and analytics route.
+
+Starts app.py through benchmarks.harness (in-memory Azure seeded with
+`--months` of readings and `--images-per-day` photos per plant, fake
+Seesaw/serial sensors and cameras) behind a threaded WSGI server on
+localhost, then drives each route with `--concurrency` keep-alive clients
+for `--requests` requests. Per route and concurrency it prints p50/p99
+latency, throughput, non-2xx answers and the upstream table queries,
+entities read and blob requests per request, plus the latency of the first
+(cold-cache) request. `--json` also writes the numbers to a file so runs
+can be compared. Needs Flask, OpenCV and NumPy. Run from flask-backend/:
+
+    python benchmarks/bench_load.py [--plants 4] [--months 1] [--concurrency 1 8 32] [--routes sensor capture]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness
+
+
+def multipart(field, filename, data, content_type="image/jpeg"):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def routes(plants, photo):
+    now = datetime.now()
+
+    def window(days):
+        return f"start_date={(now - timedelta(days=days)).isoformat()}&end_date={now.isoformat()}"
+    upload, headers = multipart("file", "plant.jpg", photo)
+    return [
+        ("GET", "/sensor/temperature", None, {}, None),
+        ("GET", "/sensor/light", None, {}, None),
+        ("GET", "/sensor/moisture/1", None, {}, None),
+        ("GET", "/plants", None, {}, None),
+        ("GET", "/sensor/snapshot", None, {}, None),
+        ("GET", "/sensor/history", None, {}, None),
+        ("GET", f"/sensor/moisture/1/history?{window(1)}", None, {}, "1 day"),
+        ("GET", f"/sensor/moisture/1/history?{window(7)}&resolution=raw", None, {}, "7 days raw"),
+        ("GET", f"/sensor/temperature/history?{window(30)}", None, {}, "30 days"),
+        ("GET", f"/sensor/light/history?{window(1)}", None, {}, "1 day"),
+        ("GET", "/sensor/raw/moisture-1?limit=1000", None, {}, "1000 samples"),
+        ("GET", f"/sensor/columns/moisture-{plants}?{window(30)}", None, {}, "30 days"),
+        ("GET", "/sensor/trends", None, {}, None),
+        ("GET", "/sensor/cache/stats", None, {}, None),
+        ("POST", "/capture/1", None, {}, None),
+        ("POST", "/capture/all", None, {}, None),
+        ("POST", "/upload_image/1", upload, headers, f"{len(photo) // 1024} KiB"),
+        ("GET", "/analytics", None, {}, None),
+        ("GET", "/analytics?plant=1", None, {}, None),
+        ("GET", "/analytics/metrics/1", None, {}, None),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def drive(port, method, path, body, headers, concurrency, requests):
+    """Send `requests` requests from `concurrency` keep-alive clients; returns (latencies, statuses, elapsed)."""
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except Exception:
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                status = "error"
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plants", type=int, default=4)
+    parser.add_argument("--months", type=float, default=1)
+    parser.add_argument("--images-per-day", type=int, default=24)
+    parser.add_argument("--table-latency", type=float, default=0.02, help="seconds per table page")
+    parser.add_argument("--blob-latency", type=float, default=0.05, help="seconds per blob request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency")
+    parser.add_argument("--routes", nargs="*", help="only routes containing one of these substrings")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    from werkzeug.serving import make_server
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    folder = tempfile.mkdtemp(prefix="plant-load-")
+    app, table, container, devices = harness.load_app(folder, args.plants, args.months, args.images_per_day,
+                                                      args.table_latency, args.blob_latency)
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Let the samplers fill their first windows before the sensor routes are hit.
+    time.sleep(3)
+
+    photo = container.blobs[min(container.blobs)] if container.blobs else b""
+    selected = [route for route in routes(args.plants, photo)
+                if not args.routes or any(part in route[1] for part in args.routes)]
+    results = []
+    print(f"{'route':<58} {'conc':>4} {'cold ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} "
+          f"{'non-2xx':>7} {'queries':>8} {'entities':>9} {'blob req':>8}")
+    for method, path, body, headers, note in selected:
+        label = f"{method} {path.split('?')[0] if note else path}" + (f" ({note})" if note else "")
+        cold, _, _ = drive(server.server_port, method, path, body, headers, 1, 1)
+        for concurrency in args.concurrency:
+            calls, entities, blobs = table.calls, table.entities_returned, container.requests
+            latencies, statuses, elapsed = drive(server.server_port, method, path, body, headers,
+                                                 concurrency, args.requests)
+            count = len(latencies)
+            row = {"route": label, "path": path, "concurrency": concurrency,
+                   "requests": count, "cold_ms": round(cold[0] * 1000, 1),
+                   "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                   "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                   "throughput": round(count / elapsed, 1),
+                   "non_2xx": sum(n for status, n in statuses.items()
+                                  if not isinstance(status, int) or not 200 <= status < 400),
+                   "table_queries": round((table.calls - calls) / count, 2),
+                   "entities": round((table.entities_returned - entities) / count, 1),
+                   "blob_requests": round((container.requests - blobs) / count, 2)}
+            results.append(row)
+            print(f"{label:<58} {concurrency:>4} {row['cold_ms']:>8} {row['p50_ms']:>8} "
+                  f"{row['p99_ms']:>8} {row['throughput']:>8} {row['non_2xx']:>7} {row['table_queries']:>8} "
+                  f"{row['entities']:>9} {row['blob_requests']:>8}")
+            # Let queued uploads and derivatives drain so one route's backlog doesn't bill the next.
+            app.upload_queue.wait(timeout=60)
+            app.derivative_queue.wait(timeout=60)
+
+    print(f"upload queue: {app.upload_queue.summary()['counts']}, "
+          f"derivative queue: {app.derivative_queue.summary()['counts']}, image metrics: {app.image_metrics.stats()}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    server.shutdown()
+    app.scheduler.shutdown(wait=False)
+    for device in devices.values():
+        device.unplug()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Metrics: what instrumentation costs on the hot path, and what a trace shows.
+
+* per-call overhead of an instrument()ed FakeTableClient vs the raw one,
+  for a point read and for a paged query (one span per page);
+* Histogram.observe() and span() on their own;
+* render() of a registry the size of a hub's (every route, upstream
+  target and component stats());
+* one snapshot build over SeriesCaches whose tables answer in `--latency`
+  seconds, one of them `--slow` seconds, gathered concurrently under
+  trace(): the spans recorded on the pool threads name the slow table, as
+  the Server-Timing header does for a real request.
+
+Run from flask-backend/:
+
+    python benchmarks/bench_metrics.py [--calls 100000] [--latency 0.02] [--slow 0.3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from metrics import REGISTRY, instrument, render, span, trace, upstream_seconds
+from row_keys import make_row_key
+from series_cache import SeriesCache
+from snapshot import gather
+
+
+def load(client, partition, fields, rows=1000):
+    now = time.time()
+    client.load({"PartitionKey": partition, "RowKey": make_row_key(now - i * 60), **fields}
+                for i in range(rows))
+
+
+def per_call(call, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        call()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow", type=float, default=0.3)
+    parser.add_argument("--plants", type=int, default=10)
+    args = parser.parse_args()
+
+    raw = FakeTableClient()
+    load(raw, "Plant1", {"moisture": 500})
+    wrapped = instrument(raw, "azure_table", "bench")
+    row_key = next(iter(raw.query_entities("PartitionKey eq 'Plant1'")))["RowKey"]
+
+    plain = per_call(lambda: raw.get_entity("Plant1", row_key), args.calls)
+    timed = per_call(lambda: wrapped.get_entity("Plant1", row_key), args.calls)
+    print(f"get_entity: raw {plain * 1e6:.2f} us, instrumented {timed * 1e6:.2f} us "
+          f"(+{(timed - plain) * 1e6:.2f} us per call)")
+
+    queries = max(1, args.calls // 1000)
+    plain = per_call(lambda: list(raw.query_entities("PartitionKey eq 'Plant1'", results_per_page=100)), queries)
+    timed = per_call(lambda: list(wrapped.query_entities("PartitionKey eq 'Plant1'", results_per_page=100)),
+                     queries)
+    print(f"query of 1000 entities in 10 pages: raw {plain * 1e3:.3f} ms, instrumented {timed * 1e3:.3f} ms "
+          f"(+{(timed - plain) * 1e6:.1f} us per query)")
+
+    observe = per_call(lambda: upstream_seconds.observe(0.01, kind="azure_table", target="bench", op="x"),
+                       args.calls)
+
+    def spanned():
+        with span("bench", "bench", "noop"):
+            pass
+    print(f"Histogram.observe {observe * 1e6:.2f} us, empty span() {per_call(spanned, args.calls) * 1e6:.2f} us")
+
+    # A hub's worth of series: ~40 routes x 3 statuses, 12 upstream targets x 6 ops, 15 stats() sources.
+    for route in range(40):
+        for status in (200, 304, 500):
+            REGISTRY.histogram("http_request_seconds", "").observe(0.05, method="GET", route=f"/r{route}",
+                                                                   status=status)
+    for target in range(12):
+        for op in range(6):
+            upstream_seconds.observe(0.02, kind="azure_table", target=f"t{target}", op=f"op{op}")
+    for source in range(15):
+        REGISTRY.register_stats(f"component{source}", lambda: {f"counter{i}": i for i in range(10)})
+    started = time.perf_counter()
+    body = render()
+    elapsed = time.perf_counter() - started
+    print(f"render(): {len(body.splitlines())} lines, {len(body) // 1024} KiB in {elapsed * 1000:.1f} ms")
+
+    tables = {"temperature": instrument(FakeTableClient(args.latency), "azure_table", "temperature"),
+              "light": instrument(FakeTableClient(args.latency), "azure_table", "light"),
+              "moisture": instrument(FakeTableClient(args.slow), "azure_table", "moisture")}
+    load(tables["temperature"], "Enviroment", {"Temperature": 21.5, "Humidity": 40.0})
+    load(tables["light"], "LightLevel", {"Light": 300})
+    for plant_id in range(1, args.plants + 1):
+        load(tables["moisture"], f"Plant{plant_id}", {"moisture": 500 + plant_id})
+    caches = {"temperature": SeriesCache(tables["temperature"], "Enviroment", ["RowKey", "Temperature"], max_age=0),
+              "light": SeriesCache(tables["light"], "LightLevel", ["RowKey", "Light"], max_age=0)}
+    for plant_id in range(1, args.plants + 1):
+        caches[f"moisture-{plant_id}"] = SeriesCache(tables["moisture"], f"Plant{plant_id}",
+                                                     ["RowKey", "moisture"], max_age=0)
+
+    started = time.perf_counter()
+    with trace() as spans:
+        gather({name: cache.latest for name, cache in caches.items()})
+    elapsed = time.perf_counter() - started
+    totals = {}
+    for s in spans:
+        count, ms = totals.get(s["target"], (0, 0.0))
+        totals[s["target"]] = (count + 1, max(ms, s["ms"]))
+    print(f"snapshot of {len(caches)} series in {elapsed * 1000:.0f} ms, {len(spans)} spans recorded on the pool:")
+    for target, (count, ms) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"  azure_table {target:<12} {count:3d} calls, slowest {ms:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
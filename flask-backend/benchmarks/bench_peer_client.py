@@ -0,0 +1,107 @@
+"""Pi-to-Pi calls: fresh sequential requests vs PeerClient (keep-alive, hedging, breakers).
+
+All numbers come from FakeNodeServer stub nodes on localhost:
+
+* capture-all: POST /capture/<id> to nodes answering in 0.1-0.6 s, one
+  after another over fresh connections vs concurrently through
+  PeerClient, as /capture/all does.
+* hedging: GETs to a node that takes 1 s for 5% of requests, with and
+  without a hedged second request after `--hedge-after` seconds.
+* breaker: calls to a hung node with a 0.5 s timeout, with the circuit
+  breaker disabled vs the default one.
+
+Uses HttpClientSession so it runs without `requests`. Run from flask-backend/:
+
+    python benchmarks/bench_peer_client.py [--calls 200] [--hedge-after 0.1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_devices import FakeNodeServer, HttpClientSession
+from peer_client import PeerClient
+from plants import Plant, PlantRegistry
+
+
+def timed(call):
+    started = time.perf_counter()
+    try:
+        call()
+    except Exception:
+        pass
+    return time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_capture_all():
+    latencies = [0.1, 0.2, 0.3, 0.4, 0.6]
+    servers = [FakeNodeServer(latency=latency) for latency in latencies]
+    registry = PlantRegistry("node0", {f"node{i}": s.url for i, s in enumerate(servers)},
+                             [Plant(i + 1, f"node{i}", camera=0) for i in range(len(servers))])
+    plants = registry.all()
+
+    def capture_url(plant):
+        return f"{registry.node_url(plant)}/capture/{plant.id}"
+
+    fresh = HttpClientSession(keep_alive=False)
+    sequential = timed(lambda: [fresh.post(capture_url(plant), timeout=10) for plant in plants])
+
+    peers = PeerClient(HttpClientSession(), timeout=10)
+    concurrent = timed(lambda: registry.fan_out(lambda plant: peers.post(capture_url(plant)), plants,
+                                                 timeout=10))
+    print(f"capture-all, {len(plants)} nodes answering in {min(latencies)}-{max(latencies)} s: "
+          f"sequential {sequential * 1000:.0f} ms, concurrent {concurrent * 1000:.0f} ms "
+          f"(sum of nodes {sum(latencies) * 1000:.0f} ms, slowest {max(latencies) * 1000:.0f} ms)")
+    for server in servers:
+        server.close()
+
+
+def bench_hedging(calls, hedge_after):
+    server = FakeNodeServer(latency=0.02, slow_rate=0.05, slow_latency=1.0, seed=1)
+    url = f"{server.url}/sensor/moisture/1"
+    print(f"{calls} GETs, 5% of them 1 s slow:")
+    for label, hedge in (("no hedging", None), (f"hedge after {hedge_after * 1000:.0f} ms", hedge_after)):
+        peers = PeerClient(HttpClientSession(), timeout=5, hedge_after=hedge)
+        times = [timed(lambda: peers.get(url)) for _ in range(calls)]
+        stats = peers.stats()[server.url]
+        print(f"  {label:<18} p50 {statistics.median(times) * 1000:6.0f} ms   "
+              f"p99 {percentile(times, 0.99) * 1000:6.0f} ms   max {max(times) * 1000:6.0f} ms   "
+              f"{stats['hedges']} hedged")
+    server.close()
+
+
+def bench_breaker():
+    server = FakeNodeServer(hang=5.0)
+    url = f"{server.url}/sensor/moisture/2"
+    calls = 20
+    print(f"{calls} calls to a hung node, 0.5 s timeout:")
+    for label, failures in (("no breaker", 10 ** 9), ("circuit breaker", 5)):
+        peers = PeerClient(HttpClientSession(), timeout=0.5, hedge_after=None, failures=failures)
+        total = sum(timed(lambda: peers.get(url)) for _ in range(calls))
+        stats = peers.stats()[server.url]
+        print(f"  {label:<18} {total:5.1f} s blocked in total, {stats['requests']} sent, "
+              f"{stats['rejected']} failed fast, state {stats['state']}")
+    server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--hedge-after", type=float, default=0.1)
+    args = parser.parse_args()
+
+    bench_capture_all()
+    bench_hedging(args.calls, args.hedge_after)
+    bench_breaker()
+
+
+if __name__ == "__main__":
+    main()
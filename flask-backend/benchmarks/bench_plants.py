@@ -0,0 +1,79 @@
+"""Dashboard moisture for N plants: sequential per-plant calls vs the registry's fan-out.
+
+Each plant sits on its own simulated node (FakeNodeServer on localhost,
+answering after `--latency` seconds). The legacy path asks the nodes one
+after another over a fresh connection each time, as the old `PI2_URL`
+proxying did; the registry path runs PlantRegistry.fan_out() over
+keep-alive connections, which is what /plants does. The last run hangs
+one node to show that fan_out's timeout bounds the page. Uses
+HttpClientSession so it runs without `requests`. Run from flask-backend/:
+
+    python benchmarks/bench_plants.py [--plants 2 10 50] [--latency 0.03]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_devices import FakeNodeServer, HttpClientSession
+from plants import Plant, PlantRegistry
+
+
+def fetch(session, registry, plant):
+    return session.get(f"{registry.node_url(plant)}/sensor/moisture/{plant.id}", timeout=30).json()
+
+
+def build(count, latency):
+    servers = [FakeNodeServer(latency=latency, moisture=400 + i) for i in range(count)]
+    nodes = {f"node{i}": server.url for i, server in enumerate(servers)}
+    plants = [Plant(i + 1, f"node{i}", moisture={"driver": "serial"}) for i in range(count)]
+    return servers, PlantRegistry("node0", nodes, plants)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plants", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'plants':>6} {'sequential, new conn':>22} {'fan-out, keep-alive':>21} {'connections':>12}")
+    for count in args.plants:
+        servers, registry = build(count, args.latency)
+        plants = registry.all()
+
+        fresh = HttpClientSession(keep_alive=False)
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for plant in plants:
+                fetch(fresh, registry, plant)
+        sequential = (time.perf_counter() - started) / args.rounds
+        legacy_connections = sum(server.connections for server in servers)
+
+        pool = HttpClientSession()
+        registry.fan_out(lambda plant: fetch(pool, registry, plant), plants)  # warm the pool
+        before = sum(server.connections for server in servers)
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            results = registry.fan_out(lambda plant: fetch(pool, registry, plant), plants)
+        fanned = (time.perf_counter() - started) / args.rounds
+        assert all(error is None for _, error in results.values())
+        new_connections = sum(server.connections for server in servers) - before
+        print(f"{count:>6} {sequential * 1000:>19.0f} ms {fanned * 1000:>18.0f} ms "
+              f"{legacy_connections:>5} vs {new_connections}")
+        if count == max(args.plants):
+            servers[0].hang = 10.0
+            started = time.perf_counter()
+            results = registry.fan_out(lambda plant: fetch(pool, registry, plant), plants, timeout=1.0)
+            elapsed = time.perf_counter() - started
+            timed_out = sum(1 for _, error in results.values() if error is not None)
+            print(f"{count} plants, one node hung for 10 s: page answered in {elapsed * 1000:.0f} ms "
+                  f"with {timed_out} plant timed out")
+        for server in servers:
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
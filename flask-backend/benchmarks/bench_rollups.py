@@ -0,0 +1,74 @@
+"""Rows read for long history windows, raw table vs rollups.
+
+Feeds N days of per-minute moisture readings through RollupWriter (as the
+loggers do), rebuilds the same rollups with backfill_rollups into a second
+table and checks both agree, then compares raw and rollup reads for several
+chart spans. Run from flask-backend/:
+
+    python benchmarks/bench_rollups.py [--days 90]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backfill_rollups import BackfillSink, backfill
+from benchmarks.fake_azure import FakeTableClient
+from rollups import RollupWriter, choose_resolution, query_rollups
+from row_keys import make_row_key
+from table_query import query_window
+
+SPANS = [("2 hours", 2 * 3600), ("7 days", 7 * 86400), ("30 days", 30 * 86400),
+         ("90 days", 90 * 86400)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    raw = FakeTableClient()
+    live = FakeTableClient()
+    writer = RollupWriter(live)
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(args.days * 24 * 60, 0, -1):
+        ts = now - i * 60
+        value = 400 + (i * 7) % 300
+        raw.create_entity({"PartitionKey": "Plant1", "RowKey": make_row_key(ts), "moisture": value})
+        writer.add("Plant1", ts, {"moisture": value})
+    writer.flush()
+    print(f"Logged {len(raw)} readings into {len(live)} buckets "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    rebuilt = FakeTableClient()
+    scanned, elapsed = backfill(raw, BackfillSink(rebuilt), ["moisture"])
+    print(f"Backfill scanned {scanned} rows in {elapsed:.1f}s ({scanned / elapsed:.0f} rows/s)")
+    for key, entity in live._entities.items():
+        assert rebuilt._entities[key] == entity, key
+
+    # Warm the fakes' sorted indexes so the first timed query doesn't pay for it.
+    query_window(raw, "Plant1", now - 60, now)
+    query_rollups(live, "Plant1", "1d", now - 86400, now)
+
+    print(f"{'span':>8} {'resolution':>10} {'raw rows':>9} {'raw ms':>8} {'rollup rows':>11} {'ms':>6}")
+    for label, span in SPANS:
+        start_ts = now - span
+        resolution = choose_resolution(start_ts, now)
+        raw.reset_counters()
+        t0 = time.perf_counter()
+        query_window(raw, "Plant1", start_ts, now)
+        raw_ms = (time.perf_counter() - t0) * 1000
+        if resolution == "raw":
+            rows, ms = raw.entities_returned, raw_ms
+        else:
+            t0 = time.perf_counter()
+            rows = len(query_rollups(live, "Plant1", resolution, start_ts, now))
+            ms = (time.perf_counter() - t0) * 1000
+        print(f"{label:>8} {resolution:>10} {raw.entities_returned:>9} {raw_ms:>8.1f} {rows:>11} {ms:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
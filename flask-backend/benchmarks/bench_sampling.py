@@ -0,0 +1,81 @@
+"""High-rate sampling: Azure rows, memory and raw-read cost of the ring buffers.
+
+Feeds a simulated day of moisture, temperature/humidity and light samples
+at the given rates through WindowAggregator and file-backed RingBuffers,
+as app.py, enviroment.py and 2ndsetup.py do. Reports rows sent to Azure
+against writing every sample, bytes per buffered sample against a deque of
+tuples, and how long a /sensor/raw read of the whole buffer takes from a
+second RingBuffer attached to the same file. Run from flask-backend/:
+
+    python benchmarks/bench_sampling.py [--rate 5] [--hours 24]
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sampling import RingBuffer, WindowAggregator, window_entity
+
+RAW_SECONDS = 6 * 3600
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=5)
+    parser.add_argument("--hours", type=float, default=24)
+    args = parser.parse_args()
+
+    rows = []
+    series = {"moisture": ("moisture",), "temperature": ("Temperature", "Humidity"), "light": ("Light",)}
+    with tempfile.TemporaryDirectory() as folder:
+        capacity = int(args.rate * RAW_SECONDS)
+        buffers = {name: RingBuffer(capacity, os.path.join(folder, f"{name}.ring")) for name in series}
+        windows = {name: WindowAggregator(lambda stats, name=name: rows.append(window_entity(name, "k", stats)),
+                                          fields) for name, fields in series.items()}
+
+        samples = int(args.hours * 3600 * args.rate)
+        started = time.perf_counter()
+        t0 = 1_700_000_000.0
+        for i in range(samples):
+            ts = t0 + i / args.rate
+            for name, fields in series.items():
+                value = 500 + 50 * math.sin(i / 1000)
+                buffers[name].append(ts, value)
+                windows[name].add(ts, {field: value for field in fields})
+        for aggregator in windows.values():
+            aggregator.flush()
+        elapsed = time.perf_counter() - started
+        per_sample = elapsed / (samples * len(series)) * 1e6
+        print(f"{len(series)} sensors at {args.rate} Hz for {args.hours:.0f} h: "
+              f"{samples * len(series)} samples, {per_sample:.1f} us each to buffer and aggregate")
+        print(f"  Azure rows: {len(rows)} aggregated vs {samples * len(series)} one-per-sample")
+
+        reader = RingBuffer.open(os.path.join(folder, "light.ring"))
+        started = time.perf_counter()
+        ts, values = reader.samples()
+        print(f"  raw read of {len(ts)} samples ({RAW_SECONDS // 3600} h) from another handle: "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        started = time.perf_counter()
+        ts, values = reader.samples(since=ts[-1] - 60)
+        print(f"  raw read of the last minute ({len(ts)} samples): {(time.perf_counter() - started) * 1000:.2f} ms")
+        reader.close()
+        for buffer in buffers.values():
+            buffer.close()
+
+    tracemalloc.start()
+    plain = deque(maxlen=capacity)
+    for i in range(capacity):
+        plain.append((t0 + i / args.rate, 500.0 + i % 7))
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  memory per buffered sample: 16 bytes in RingBuffer vs {used / capacity:.0f} bytes in a deque of tuples")
+
+
+if __name__ == "__main__":
+    main()
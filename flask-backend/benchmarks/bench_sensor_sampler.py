@@ -0,0 +1,82 @@
+"""Moisture endpoint latency and read integrity: direct I2C reads vs SensorSampler.
+
+Several threads stand in for concurrent /sensor/moisture/1 requests plus the
+logger job. In the direct mode each one performs its own Seesaw read, as
+read_soil_moisture() used to, against one shared FakeSeesaw; overlapping
+transactions come back corrupted. In the sampler mode they read the
+median-filtered window of a SensorSampler that owns the same kind of
+device. The sensor also returns a spike on 5% of reads. Run from
+flask-backend/:
+
+    python benchmarks/bench_sensor_sampler.py [--threads 8] [--requests 200] [--bus-delay 0.005]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_devices import FakeSeesaw
+from sensor_sampler import SensorSampler
+
+TRUE_MOISTURE = 700
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+def hammer(threads, requests, read):
+    latencies, wrong = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests):
+            started = time.perf_counter()
+            moisture = read()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if moisture != TRUE_MOISTURE:
+                    wrong[0] += 1
+            time.sleep(0.002)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, wrong[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--bus-delay", type=float, default=0.005)
+    args = parser.parse_args()
+    total = args.threads * args.requests
+
+    sensor = FakeSeesaw(TRUE_MOISTURE, bus_delay=args.bus_delay, glitch_rate=0.05)
+    latencies, wrong = hammer(args.threads, args.requests, sensor.moisture_read)
+    print(f"direct reads:   p50 {percentile(latencies, 0.5):7.3f} ms  p99 {percentile(latencies, 0.99):7.3f} ms  "
+          f"{wrong}/{total} wrong values, {sensor.collisions} bus collisions, {sensor.reads} bus reads")
+
+    drivers = []
+    sampler = SensorSampler(lambda: drivers.append(FakeSeesaw(TRUE_MOISTURE, bus_delay=args.bus_delay,
+                                                              glitch_rate=0.05)) or drivers[-1],
+                            sample_rate=20, window=5)
+    sampler.start()
+    sampler.wait_ready()
+    time.sleep(0.3)
+    latencies, wrong = hammer(args.threads, args.requests, lambda: sampler.latest().moisture)
+    sampler.stop()
+    print(f"SensorSampler:  p50 {percentile(latencies, 0.5):7.3f} ms  p99 {percentile(latencies, 0.99):7.3f} ms  "
+          f"{wrong}/{total} wrong values, {drivers[0].collisions} bus collisions, {drivers[0].reads} bus reads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Serial sensor reads: open/sleep/read/close per sample vs a persistent SerialReader.
+
+Runs against PtySerialDevice, a fake Arduino on a pseudo-terminal. The
+legacy path is enviroment.py's old get_ldr_value(): open the port, sleep
+1 s, read a line, close. The reader path keeps one port open and serves
+latest() from its buffer; it is also run against a request/response
+device (Plant 2's b'R' protocol) and through an unplug/replug cycle. Uses
+pyserial when it is installed and a minimal tty port otherwise. Run from
+flask-backend/:
+
+    python benchmarks/bench_serial_reader.py [--reads 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_devices import PtySerialDevice, open_serial
+from serial_reader import SerialReader, parse_int
+
+
+def legacy_read(path):
+    port = open_serial(path, timeout=1)
+    time.sleep(1)
+    line = port.readline()
+    port.close()
+    return parse_int(line)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "ttyUSB0")
+        device = PtySerialDevice(path, value=512, rate=10)
+
+        started = time.perf_counter()
+        values = [legacy_read(path) for _ in range(args.reads)]
+        per_read = (time.perf_counter() - started) / args.reads
+        print(f"open/sleep/read/close: {per_read * 1000:8.1f} ms per reading, values {values}")
+
+        reader = SerialReader(lambda: open_serial(path, timeout=0.2), name="LDR")
+        reader.start()
+        wait_for(lambda: reader.latest() is not None)
+        calls = 100000
+        started = time.perf_counter()
+        for _ in range(calls):
+            reading = reader.latest()
+        per_call = (time.perf_counter() - started) / calls
+        print(f"SerialReader.latest(): {per_call * 1e6:8.2f} us per reading, value {reading.value}, "
+              f"{reader.lines} lines buffered, {reader.bad_frames} malformed")
+
+        device.unplug()
+        unplugged = time.time()
+        time.sleep(2)
+        device.plug()
+        plugged = time.time()
+        wait_for(lambda: reader.latest() is not None and reader.latest().taken_at > plugged)
+        print(f"unplugged for {plugged - unplugged:.1f} s: readings resumed "
+              f"{(reader.latest().taken_at - plugged) * 1000:.0f} ms after replug, "
+              f"{reader.reconnects} reconnect(s)")
+        reader.stop()
+        device.unplug()
+
+        path = os.path.join(folder, "ttyACM0")
+        device = PtySerialDevice(path, value=420, respond_to=b"R")
+        reader = SerialReader(lambda: open_serial(path, timeout=0.2), poll=b"R", poll_interval=0.5,
+                              name="MOISTURE")
+        reader.start()
+        time.sleep(3)
+        reader.stop()
+        device.unplug()
+        print(f"polled device: {len(reader.readings())} readings in 3 s at one poll per 0.5 s, "
+              f"latest {reader.readings()[-1].value}")
+
+
+if __name__ == "__main__":
+    main()
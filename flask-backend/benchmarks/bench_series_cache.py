@@ -0,0 +1,84 @@
+"""Show that N polling dashboard tabs cost one upstream query per refresh interval.
+
+Each simulated tab polls the temperature cache's latest() every `--poll`
+seconds while a writer appends one reading per `--write` seconds. The run
+scales the intervals of the real dashboard (5 s poll, 60 s writes, 10 s
+cache age) down so it finishes quickly. Run from flask-backend/:
+
+    python benchmarks/bench_series_cache.py [--tabs 1 10 50]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from row_keys import make_row_key
+from series_cache import SeriesCache
+
+PARTITION = "Enviroment"
+
+
+def reading(ts):
+    return {"PartitionKey": PARTITION, "RowKey": make_row_key(ts),
+            "Temperature": 21.5, "Humidity": 40.0}
+
+
+def run(tabs, duration, poll, write, max_age):
+    client = FakeTableClient()
+    now = time.time()
+    client.load(reading(now - i * 60) for i in range(20_000))
+    cache = SeriesCache(client, PARTITION, ["RowKey", "Temperature", "Humidity"], max_age=max_age)
+    stop = threading.Event()
+    samples = []
+
+    def writer():
+        while not stop.wait(write):
+            client.create_entity(reading(time.time()))
+
+    def tab():
+        while not stop.is_set():
+            started = time.perf_counter()
+            latest = cache.latest()
+            samples.append((time.perf_counter() - started, latest["RowKey"]))
+            stop.wait(poll)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=tab) for _ in range(tabs)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    latencies = sorted(seconds for seconds, _ in samples)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    return len(latencies), stats, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--poll", type=float, default=0.05)
+    parser.add_argument("--write", type=float, default=0.6)
+    parser.add_argument("--max-age", type=float, default=0.1)
+    args = parser.parse_args()
+
+    intervals = args.duration / args.max_age
+    print(f"{'tabs':>5} {'requests':>9} {'hits':>7} {'upstream':>9} {'per interval':>13} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'refresh ms':>10}")
+    for tabs in args.tabs:
+        requests, stats, p50, p99 = run(tabs, args.duration, args.poll, args.write, args.max_age)
+        print(f"{tabs:>5} {requests:>9} {stats['hits']:>7} {stats['upstream_queries']:>9} "
+              f"{stats['upstream_queries'] / intervals:>13.2f} {p50:>7.3f} {p99:>7.3f} "
+              f"{stats['refresh_ms_avg']:>10}")
+
+
+if __name__ == "__main__":
+    main()
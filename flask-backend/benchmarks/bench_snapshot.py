@@ -0,0 +1,110 @@
+"""Dashboard refresh: one request per sensor vs /sensor/snapshot with ETag revalidation.
+
+Sensor rows live in FakeTableClients whose queries take `--latency`
+seconds; each read goes through a SeriesCache whose max age has run out,
+as on a dashboard refresh after a quiet period. The legacy path is the
+browser calling /sensor/temperature, /sensor/light and
+/sensor/moisture/<id> one after another. The snapshot path builds the same
+readings concurrently with gather() through a SnapshotCache; later
+refreshes inside its max age revalidate with If-None-Match and get a 304
+without touching the tables. Run from flask-backend/:
+
+    python benchmarks/bench_snapshot.py [--plants 2 10] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from row_keys import make_row_key
+from series_cache import SeriesCache
+from snapshot import SnapshotCache, gather
+
+
+def load(client, partition, fields, rows=2000):
+    now = time.time()
+    client.load({"PartitionKey": partition, "RowKey": make_row_key(now - i * 60), **fields}
+                for i in range(rows))
+
+
+def build_sources(plants, latency):
+    env, light, moisture = FakeTableClient(latency), FakeTableClient(latency), FakeTableClient(latency)
+    load(env, "Enviroment", {"Temperature": 21.5, "Humidity": 40.0})
+    load(light, "LightLevel", {"Light": 300})
+    for plant_id in range(1, plants + 1):
+        load(moisture, f"Plant{plant_id}", {"moisture": 500 + plant_id})
+    caches = {"temperature": SeriesCache(env, "Enviroment", ["RowKey", "Temperature", "Humidity"], max_age=0),
+              "light": SeriesCache(light, "LightLevel", ["RowKey", "Light"], max_age=0)}
+    for plant_id in range(1, plants + 1):
+        caches[f"moisture-{plant_id}"] = SeriesCache(moisture, f"Plant{plant_id}", ["RowKey", "moisture"],
+                                                     max_age=0)
+    return caches, (env, light, moisture)
+
+
+def upstream_queries(clients):
+    return sum(client.calls for client in clients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plants", type=int, nargs="+", default=[2, 10])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tabs", type=int, default=20)
+    args = parser.parse_args()
+
+    for plants in args.plants:
+        caches, clients = build_sources(plants, args.latency)
+        for cache in caches.values():
+            cache.latest()
+        for client in clients:
+            client.reset_counters()
+
+        started = time.perf_counter()
+        for cache in caches.values():
+            cache.latest()
+        serial = time.perf_counter() - started
+        serial_queries = upstream_queries(clients)
+
+        def build():
+            results = gather({name: cache.latest for name, cache in caches.items()})
+            return {name: result for name, (result, _) in results.items()}
+
+        snapshots = SnapshotCache(max_age=5)
+        for client in clients:
+            client.reset_counters()
+        started = time.perf_counter()
+        snapshot = snapshots.get("snapshot", build)
+        built = time.perf_counter() - started
+        build_queries = upstream_queries(clients)
+
+        started = time.perf_counter()
+        revalidations = 100
+        not_modified = sum(snapshots.get("snapshot", build).etag == snapshot.etag for _ in range(revalidations))
+        per_revalidation = (time.perf_counter() - started) / revalidations
+        revalidation_queries = upstream_queries(clients) - build_queries
+
+        print(f"{plants} plants: {len(caches)} requests one after another {serial * 1000:.0f} ms "
+              f"({serial_queries} queries); snapshot {built * 1000:.0f} ms ({build_queries} queries, "
+              f"{len(snapshot.body)} bytes); {not_modified}/{revalidations} revalidations answered 304 "
+              f"in {per_revalidation * 1e6:.1f} us with {revalidation_queries} queries")
+
+        # Every open tab refreshes right after the snapshot expired.
+        snapshots = SnapshotCache(max_age=5)
+        for client in clients:
+            client.reset_counters()
+        threads = [threading.Thread(target=snapshots.get, args=("snapshot", build)) for _ in range(args.tabs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = snapshots.stats()
+        print(f"  {args.tabs} tabs at once: {stats['builds']} build, {stats['shared_builds']} shared it, "
+              f"{upstream_queries(clients)} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Time from starting the hub to its first answers, with lazy vs eagerly created clients.
+
+The history is seeded once through benchmarks.harness with `--client-delay`
+seconds per Azure client creation and `--open-delay` per Seesaw, serial
+port and camera open (what the SDK and drivers cost on a Pi). Then, for each
+mode, a process is forked that imports app.py, starts the hardware and
+serves on a socket bound beforehand, so requests queue from the first
+instant:
+
+* eager: COMPONENTS.warm() before serving, i.e. every Azure client is
+  created up front like before components.py;
+* lazy: serving starts right away; clients are created by the first
+  request that needs them or by the background warm-up.
+
+For each route the time from fork to the first answer is printed, then the
+components' init times from /health. Needs Flask, OpenCV and NumPy. Run
+from flask-backend/:
+
+    python benchmarks/bench_startup.py [--client-delay 1.5] [--open-delay 2]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness
+
+ROUTES = ("/health", "/plants", "/sensor/moisture/1", "/sensor/snapshot", "/sensor/history")
+
+
+def run_worker(sock, eager):
+    import app
+    from components import COMPONENTS
+    from werkzeug.serving import make_server
+    app.startup()
+    if eager:
+        COMPONENTS.warm()
+    app.start_hardware()
+    server = make_server("127.0.0.1", 0, app.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def first_answers(port, started):
+    """Seconds from `started` to the first answer of every route, requested all at once."""
+    answers = {}
+
+    def ask(path):
+        status, _ = get(port, path)
+        answers[path] = (time.monotonic() - started, status)
+    threads = [threading.Thread(target=ask, args=(path,)) for path in ROUTES]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["eager", "lazy"], choices=["eager", "lazy"])
+    parser.add_argument("--plants", type=int, default=4)
+    parser.add_argument("--months", type=float, default=0.1)
+    parser.add_argument("--client-delay", type=float, default=1.5, help="seconds per Azure client creation")
+    parser.add_argument("--open-delay", type=float, default=2.0, help="seconds per device open")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="plant-startup-")
+    table, container, devices = harness.prepare(folder, args.plants, args.months, client_delay=args.client_delay,
+                                                open_delay=args.open_delay)
+
+    for mode in args.modes:
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(128)
+        port = sock.getsockname()[1]
+        started = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, mode == "eager")
+            finally:
+                os._exit(0)
+
+        print(f"{mode}:")
+        for path, (elapsed, status) in first_answers(port, started).items():
+            print(f"  {path:<28} first answer after {elapsed:6.2f} s  ({status})")
+        # Let the cameras and samplers finish opening before their init times are read.
+        time.sleep(args.open_delay + 1)
+        _, body = get(port, "/health")
+        for name, component in sorted(json.loads(body)["components"].items()):
+            print(f"  {name:<28} {component['state']:<7} init {component['init_ms']} ms")
+
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        sock.close()
+
+    for device in devices.values():
+        device.unplug()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare the old list-and-filter table reads with table_query.
+
+Seeds an in-memory table with one moisture reading per minute for two plants
+using the old `str(timestamp)` RowKeys, times the old history and "latest"
+paths, migrates the table to inverted keys with migrate_row_keys, and times
+query_window / query_latest on the result as the table grows. Run from
+flask-backend/:
+
+    python benchmarks/bench_table_query.py [--page-latency 0.02]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from migrate_row_keys import migrate_table
+from table_query import query_latest, query_window
+
+SIZES = [10_000, 100_000, 500_000]
+PLANTS = 2
+
+
+def seed(client, rows_per_plant, now):
+    client.load(
+        {
+            "PartitionKey": f"Plant{plant_id}",
+            "RowKey": str(now - i * 60),
+            "moisture": 400 + i % 300,
+            "Status": "ok",
+        }
+        for plant_id in range(1, PLANTS + 1)
+        for i in range(rows_per_plant)
+    )
+
+
+def legacy_history(client, plant_id, start_ts, end_ts, limit):
+    entities = list(client.list_entities())
+    filtered = [
+        e for e in entities
+        if e["PartitionKey"] == f"Plant{plant_id}"
+           and start_ts <= float(e["RowKey"]) <= end_ts
+    ]
+    filtered.sort(key=lambda x: float(x["RowKey"]), reverse=True)
+    return [e["moisture"] for e in filtered[:limit]]
+
+
+def legacy_latest(client, plant_id):
+    entities = list(client.list_entities())
+    filtered = [e for e in entities if e["PartitionKey"] == f"Plant{plant_id}"]
+    filtered.sort(key=lambda e: e["RowKey"], reverse=True)
+    return filtered[0]["moisture"]
+
+
+def windowed_history(client, plant_id, start_ts, end_ts, limit):
+    rows = query_window(client, f"Plant{plant_id}", start_ts, end_ts,
+                        select=["RowKey", "moisture"], limit=limit)
+    return [e["moisture"] for e in rows]
+
+
+def single_latest(client, plant_id):
+    return query_latest(client, f"Plant{plant_id}", select=["moisture"])["moisture"]
+
+
+def measure(fn, client, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        client.reset_counters()
+        started = time.perf_counter()
+        result = fn(client, *args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, client.entities_returned, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-latency", type=float, default=0.0,
+                        help="simulated round-trip per result page, in seconds")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    now = datetime.now().timestamp()
+    start_ts = (datetime.now() - timedelta(days=7)).timestamp()
+    print(f"{'rows':>8} | {'history ms':>10} {'scanned':>8} -> {'ms':>6} {'scanned':>7} | "
+          f"{'latest ms':>9} -> {'ms':>6} | {'migrate rows/s':>14}")
+    for size in SIZES:
+        client = FakeTableClient(page_latency=args.page_latency)
+        seed(client, size // PLANTS, now)
+        old_hist = measure(legacy_history, client, 1, start_ts, now, args.limit)
+        old_latest = measure(legacy_latest, client, 2)
+
+        moved, elapsed = migrate_table(client)
+        assert moved == size
+
+        new_hist = measure(windowed_history, client, 1, start_ts, now, args.limit)
+        new_latest = measure(single_latest, client, 2)
+        assert old_hist[2] == new_hist[2] and old_latest[2] == new_latest[2]
+        print(f"{size:>8} | {old_hist[0]:>10.1f} {old_hist[1]:>8} -> {new_hist[0]:>6.2f} "
+              f"{new_hist[1]:>7} | {old_latest[0]:>9.1f} -> {new_latest[0]:>6.2f} | "
+              f"{moved / elapsed:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Simulate a 1-hour Azure outage and count lost readings and outbound requests.
+
+Three loggers (two plants' moisture plus temperature) write one reading per
+simulated minute, each also feeding the rollups, for `--hours` hours with
+the table service down for the second hour. Halfway through the outage the
+writer is stopped and a new one is opened on the same spool, as after a
+reboot. One simulated minute lasts `--minute` real seconds. Run from
+flask-backend/:
+
+    python benchmarks/bench_telemetry_outage.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeTableClient
+from rollups import RESOLUTIONS, RollupWriter
+from row_keys import make_row_key
+from telemetry_writer import TelemetryWriter
+
+SERIES = [("moisture", "Plant1", "moisture"), ("moisture", "Plant2", "moisture"),
+          ("temperature", "Enviroment", "Temperature")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=int, default=3)
+    parser.add_argument("--minute", type=float, default=0.01,
+                        help="real seconds per simulated minute")
+    args = parser.parse_args()
+
+    tables = {"moisture": FakeTableClient(), "temperature": FakeTableClient(),
+              "rollups": FakeTableClient()}
+    spool_path = os.path.join(tempfile.mkdtemp(), "spool.db")
+    flush_interval = 5 * args.minute
+
+    def open_writer():
+        writer = TelemetryWriter(spool_path, tables, flush_interval=flush_interval,
+                                 max_backoff=4 * flush_interval)
+        writer.start()
+        return writer, RollupWriter(tables["rollups"], spool=writer)
+
+    writer, rollups = open_writer()
+    requests = failures = 0
+    sim_start = time.time() - args.hours * 3600
+    minutes = args.hours * 60
+    outage = range(60, 120)
+    print(f"Simulating {minutes} minutes, outage during minutes {outage.start}-{outage.stop}")
+    for minute in range(minutes):
+        for table in tables.values():
+            table.down = minute in outage
+        if minute == (outage.start + outage.stop) // 2:
+            writer.stop()
+            requests, failures = requests + writer.requests, failures + writer.failures
+            print(f"  minute {minute}: restarting writer with {writer.pending()} rows spooled")
+            writer, rollups = open_writer()
+        ts = sim_start + minute * 60
+        for table_name, partition, field in SERIES:
+            value = 400 + minute % 50
+            writer.append(table_name, {"PartitionKey": partition, "RowKey": make_row_key(ts),
+                                       field: value})
+            rollups.record(partition, ts, {field: value})
+        time.sleep(args.minute)
+
+    deadline = time.time() + 60 * flush_interval
+    while writer.pending() and time.time() < deadline:
+        time.sleep(flush_interval)
+    writer.stop()
+    requests, failures = requests + writer.requests, failures + writer.failures
+
+    # Every reading is counted once in every resolution, held buckets and restart included.
+    for resolution in RESOLUTIONS:
+        buckets = [e for (partition, _), e in tables["rollups"]._entities.items()
+                   if partition.endswith(f"-{resolution}")]
+        counted = sum(e.get("moisture_count", e.get("Temperature_count", 0)) for e in buckets)
+        assert counted == minutes * len(SERIES), f"{resolution} rollups count {counted} readings"
+
+    readings = minutes * len(SERIES)
+    stored = len(tables["moisture"]) + len(tables["temperature"])
+    buckets = len(tables["rollups"])
+    baseline = readings + readings * 3
+    print(f"readings logged:        {readings}")
+    print(f"readings in Azure:      {stored} (lost {readings - stored})")
+    print(f"rollup buckets:         {buckets}")
+    print(f"failed flushes:         {failures}")
+    print(f"outbound requests:      {requests} "
+          f"(vs {baseline} with one request per reading and rollup bucket)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Bytes per /analytics page view and capture latency with image derivatives.
+
+Synthetic camera frames are JPEG-encoded as capture_image does. "Before"
+is the legacy page, which put every original in the container into the
+collapsed and expanded galleries; "after" is one catalog page of 20 WebP
+thumbnails per plant. Capture latency compares building the derivatives
+inline with handing them to DerivativeWorker. Needs OpenCV and NumPy. Run
+from flask-backend/:
+
+    python benchmarks/bench_thumbnails.py [--width 1920] [--height 1080] [--images-per-plant 1440]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from thumbnails import DerivativeWorker, make_derivatives
+
+PLANTS = 2
+PAGE_SIZE = 20
+
+
+def synthetic_frame(width, height, seed):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 0.3 + y * 0.2) % 256
+    frame[..., 1] = (x * 0.6 + 40) % 256
+    frame[..., 2] = (y * 0.5 + 20) % 256
+    noise = rng.integers(0, 24, (height, width, 3), dtype=np.uint8)
+    return cv2.add(frame, noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--images-per-plant", type=int, default=1440)
+    parser.add_argument("--samples", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = [synthetic_frame(args.width, args.height, seed) for seed in range(args.samples)]
+    originals, thumbs, previews = [], [], []
+    for frame in frames:
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        originals.append(len(encoded))
+        derivatives = make_derivatives(encoded.tobytes(), frame)
+        thumbs.append(len(derivatives.get("thumb", encoded)))
+        previews.append(len(derivatives.get("preview", encoded)))
+    original, thumb, preview = (sum(sizes) / len(sizes) for sizes in (originals, thumbs, previews))
+    print(f"{args.width}x{args.height}: original {original / 1024:.0f} KiB, "
+          f"preview {preview / 1024:.0f} KiB, thumbnail {thumb / 1024:.1f} KiB")
+
+    before = PLANTS * args.images_per_plant * original
+    after = PLANTS * PAGE_SIZE * thumb
+    print(f"analytics page view, {PLANTS} plants x {args.images_per_plant} images:")
+    print(f"  before (every original):        {before / 1024 / 1024:9.1f} MiB")
+    print(f"  after (one page of thumbnails): {after / 1024 / 1024:9.3f} MiB  ({before / after:.0f}x less)")
+
+    uploaded = []
+    worker = DerivativeWorker(lambda original, variant, data: uploaded.append(len(data)))
+    inline, queued = [], []
+    for i, frame in enumerate(frames):
+        started = time.perf_counter()
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        make_derivatives(encoded.tobytes(), frame)
+        inline.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        worker.submit(f"plant_1_20250101_{i:06d}.jpg", encoded.tobytes(), frame)
+        queued.append(time.perf_counter() - started)
+        time.sleep(0.2)
+    worker.close()
+    print(f"capture path: derivatives inline {sum(inline) / len(inline) * 1000:.1f} ms, "
+          f"via DerivativeWorker {sum(queued) / len(queued) * 1000:.1f} ms "
+          f"({worker.generated} generated, {len(uploaded)} variants uploaded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Trend engine: cost per minute with months of history, and alert flapping.
+
+Fills a ColumnStore in a temp folder with `--days` of one-minute moisture
+windows for each of `--plants` plants (drying sawtooths with noise,
+waterings and the odd glitch) plus temperature and light, then:
+
+* times the first analyze() (loads the last day of every series) and the
+  steady state: one new row per series, then analyze(), as every minute;
+* replays the last day minute by minute and counts dry/ok status changes,
+  the flat per-reading threshold (Plant.status) vs the engine's
+  hysteresis state, plus the newest readings flagged as anomalies and
+  the glitches found in the day.
+
+Run from flask-backend/:
+
+    python benchmarks/bench_trends.py [--plants 2 10 50] [--days 30]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from column_store import ColumnStore
+from plants import Plant
+from trends import TrendEngine
+
+THRESHOLD = 600
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def moisture_at(minute, plant_id, rng):
+    """Dries by ~10/hour from 800, watered every ~2.5 days; noisy, with rare glitches."""
+    period = 3600 + plant_id * 7
+    level = 800 - (minute % period) * 10 / 60 + rng.gauss(0, 3)
+    if rng.random() < 0.001:
+        level += rng.choice([-400, 400])
+    return level
+
+
+def fill(store, plants, days, end_ts, seed=1):
+    rng = random.Random(seed)
+    store.create("temperature", ["Temperature", "Humidity"])
+    store.create("light", ["Light"])
+    for plant in plants:
+        store.create(f"moisture-{plant.id}", ["moisture"])
+    start_minute = int(end_ts // 60) - days * 1440
+    for minute in range(start_minute, start_minute + days * 1440):
+        ts = minute * 60
+        store.append("temperature", ts, {"Temperature": 21 + rng.gauss(0, 0.2), "Humidity": 45.0})
+        store.append("light", ts, {"Light": max(0.0, 500 - abs(minute % 1440 - 720))})
+        for plant in plants:
+            store.append(f"moisture-{plant.id}", ts, {"moisture": moisture_at(minute, plant.id, rng)})
+    return rng
+
+
+def make_engine(store, plants, clock):
+    engine = TrendEngine(store, clock=clock)
+    engine.track("temperature", "temperature", "Temperature")
+    engine.track("light", "light", "Light")
+    for plant in plants:
+        engine.track(f"moisture-{plant.id}", f"moisture-{plant.id}", "moisture", threshold=plant.threshold)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plants", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    for count in args.plants:
+        plants = [Plant(i, "node", threshold=THRESHOLD) for i in range(1, count + 1)]
+        with tempfile.TemporaryDirectory() as folder:
+            end_ts = time.time() // 60 * 60
+            store = ColumnStore(folder)
+            replay_from = end_ts - 86400
+            rng = fill(store, plants, args.days, replay_from)
+
+            clock = Clock(replay_from)
+            engine = make_engine(store, plants, clock)
+            started = time.perf_counter()
+            engine.analyze()
+            first = time.perf_counter() - started
+
+            # Replay the last day: every minute one row per series arrives and the engine runs.
+            flat_changes = engine_changes = anomalies = 0
+            flat_state, engine_state = {}, {}
+            started = time.perf_counter()
+            for minute in range(int(replay_from // 60), int(end_ts // 60)):
+                ts = minute * 60
+                store.append("temperature", ts, {"Temperature": 21 + rng.gauss(0, 0.2), "Humidity": 45.0})
+                store.append("light", ts, {"Light": max(0.0, 500 - abs(minute % 1440 - 720))})
+                readings = {}
+                for plant in plants:
+                    readings[plant.id] = moisture_at(minute, plant.id, rng)
+                    store.append(f"moisture-{plant.id}", ts, {"moisture": readings[plant.id]})
+                clock.now = ts + 1
+                trends = engine.analyze()
+                for plant in plants:
+                    flat = plant.status(readings[plant.id])
+                    state = trends[f"moisture-{plant.id}"]["state"]
+                    flat_changes += flat_state.get(plant.id, flat) != flat
+                    engine_changes += engine_state.get(plant.id, state) != state
+                    flat_state[plant.id], engine_state[plant.id] = flat, state
+                    anomalies += trends[f"moisture-{plant.id}"]["anomaly"]
+            per_minute = (time.perf_counter() - started) / 1440
+
+            sample = trends["moisture-1"]
+            glitches = sum(trends[f"moisture-{plant.id}"]["glitches_24h"] for plant in plants)
+            print(f"{count} plants, {args.days} days stored: first analyze {first * 1000:.0f} ms, "
+                  f"then {per_minute * 1000:.1f} ms per minute (append + analyze, "
+                  f"{engine.stats()['avg_analyze_ms']} ms of it analysis)")
+            print(f"  last day: {flat_changes} dry/ok changes with the flat threshold, {engine_changes} with "
+                  f"hysteresis; {anomalies} newest readings flagged, {glitches} glitches in the day")
+            print(f"  plant 1 now: {sample['smoothed']} ({sample['state']}), {sample['rate_per_hour']}/h, "
+                  f"dry in {sample['hours_until_dry']} h")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
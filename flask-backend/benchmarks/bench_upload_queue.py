@@ -0,0 +1,90 @@
+"""Upload latency and backpressure: synchronous uploads vs UploadQueue.
+
+A burst of captures (JPEG-sized payloads) is uploaded to FakeContainerClient
+first inline, the way the routes used to, and then through UploadQueue with
+different worker and block concurrency settings. The report shows how long a
+route is blocked per capture and how long the whole burst takes to reach
+storage. A last run shrinks the queue and takes storage offline to show
+submit() rejecting work once `max_pending` jobs are waiting. Run from
+flask-backend/:
+
+    python benchmarks/bench_upload_queue.py [--captures 40] [--size 600000]
+"""
+import argparse
+import os
+import queue
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_azure import FakeContainerClient
+from upload_queue import UploadQueue
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+def run_sync(captures, payload):
+    container = FakeContainerClient()
+    route = []
+    started = time.perf_counter()
+    for i in range(captures):
+        t = time.perf_counter()
+        container.get_blob_client(f"plant_1_{i:06d}.jpg").upload_blob(payload, overwrite=True)
+        route.append(time.perf_counter() - t)
+    return route, time.perf_counter() - started, container
+
+
+def run_queue(captures, payload, workers, max_concurrency):
+    container = FakeContainerClient()
+    uploads = UploadQueue(container, workers=workers, max_pending=captures,
+                          max_concurrency=max_concurrency)
+    route = []
+    started = time.perf_counter()
+    for i in range(captures):
+        t = time.perf_counter()
+        uploads.submit(f"plant_1_{i:06d}.jpg", payload)
+        route.append(time.perf_counter() - t)
+    uploads.wait()
+    return route, time.perf_counter() - started, container
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=40)
+    parser.add_argument("--size", type=int, default=600000)
+    args = parser.parse_args()
+    payload = os.urandom(args.size)
+
+    print(f"{args.captures} captures of {args.size / 1024:.0f} KiB, 50 ms per request, 1 MiB/s per connection")
+    route, total, container = run_sync(args.captures, payload)
+    print(f"  synchronous:               route p50 {percentile(route, 0.5):8.2f} ms  "
+          f"burst drained in {total:6.2f} s  ({container.requests} requests)")
+    for workers, max_concurrency in ((1, 1), (1, 4), (2, 4), (4, 4)):
+        route, total, container = run_queue(args.captures, payload, workers, max_concurrency)
+        assert len(container.blobs) == args.captures
+        print(f"  queue {workers} workers x {max_concurrency} blocks: route p50 {percentile(route, 0.5):8.3f} ms  "
+              f"burst drained in {total:6.2f} s  ({container.requests} requests, "
+              f"{container.max_active} concurrent)")
+
+    container = FakeContainerClient()
+    container.down = True
+    uploads = UploadQueue(container, workers=2, max_pending=5)
+    accepted = rejected = 0
+    for i in range(args.captures):
+        try:
+            uploads.submit(f"plant_1_{i:06d}.jpg", payload)
+            accepted += 1
+        except queue.Full:
+            rejected += 1
+    uploads.wait()
+    counts = uploads.summary()["counts"]
+    print(f"storage offline, max_pending 5: {accepted} accepted, {rejected} rejected with queue.Full, "
+          f"{counts['failed']} failed, {counts['queued'] + counts['in_flight']} still pending")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Hub throughput with 1 vs N web workers, exactly one of them running the hardware.
+
+The history is seeded once through benchmarks.harness; then, for each
+`--workers` count, that many processes are forked from it, each importing
+app.py and calling elect_leader() like wsgi.py does under gunicorn, and
+serving on one shared listening socket. The same routes are driven by
+`--concurrency` keep-alive clients and requests/s compared. /leader/stats
+is sampled to check that every worker answers and exactly one leads;
+finally the leader is killed and the time until a follower takes over is
+measured. Each worker has its own copy of the in-memory Azure, so writes
+are not shared between them. Needs Flask, OpenCV and NumPy. Run from
+flask-backend/:
+
+    python benchmarks/bench_workers.py [--workers 1 4] [--concurrency 16] [--requests 400]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness
+from benchmarks.bench_load import drive, percentile, routes
+
+ROUTES = ("/sensor/history", "/sensor/snapshot", "/sensor/trends", "/sensor/columns", "/analytics?plant=1",
+          "/capture/1")
+
+
+def run_worker(sock):
+    import app
+    from werkzeug.serving import make_server
+    app.startup()
+    app.elect_leader()
+    server = make_server("127.0.0.1", 0, app.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def fork_workers(sock, count):
+    pids = []
+    for _ in range(count):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    return pids
+
+
+def leader_stats(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/leader/stats")
+            return json.loads(conn.getresponse().read())
+        except (OSError, ValueError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--plants", type=int, default=4)
+    parser.add_argument("--months", type=float, default=1)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="plant-workers-")
+    table, container, devices = harness.prepare(folder, args.plants, args.months)
+    photo = container.blobs[min(container.blobs)]
+    selected = [route for route in routes(args.plants, photo) if route[1].startswith(ROUTES)]
+
+    throughput = {}
+    for count in args.workers:
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(128)
+        port = sock.getsockname()[1]
+        pids = fork_workers(sock, count)
+        leader_stats(port)
+        # Let the leader's samplers and cameras start before they are asked for readings.
+        time.sleep(3)
+
+        print(f"{count} worker(s):")
+        for method, path, body, headers, note in selected:
+            label = f"{method} {path.split('?')[0] if note else path}" + (f" ({note})" if note else "")
+            drive(port, method, path, body, headers, args.concurrency, args.concurrency)
+            latencies, statuses, elapsed = drive(port, method, path, body, headers, args.concurrency,
+                                                 args.requests)
+            rate = throughput.setdefault(label, {})[count] = len(latencies) / elapsed
+            print(f"  {label:<50} {rate:8.1f} req/s  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+                  f"statuses {statuses}")
+
+        answers = [leader_stats(port) for _ in range(20 * count)]
+        pids_seen = {answer["pid"] for answer in answers}
+        leaders = {answer["pid"] for answer in answers if answer["leader"]}
+        print(f"  /leader/stats answered by {len(pids_seen)} of {count} workers; leaders: {sorted(leaders)}")
+
+        if count > 1 and leaders:
+            old = leaders.pop()
+            os.kill(old, signal.SIGKILL)
+            os.waitpid(old, 0)
+            pids.remove(old)
+            started = time.monotonic()
+            while True:
+                answer = leader_stats(port)
+                if answer["leader_pid"] != old and answer["leader_pid"] in pids:
+                    break
+                time.sleep(0.1)
+            print(f"  leader {old} killed; worker {answer['leader_pid']} took over after "
+                  f"{time.monotonic() - started:.1f} s")
+
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        sock.close()
+
+    if len(args.workers) > 1:
+        first, last = args.workers[0], args.workers[-1]
+        print(f"speed-up {first} -> {last} workers:")
+        for label, rates in throughput.items():
+            print(f"  {label:<50} x{rates[last] / rates[first]:.2f}")
+    for device in devices.values():
+        device.unplug()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""In-memory stand-ins for the Azure Table and Blob clients used by the benchmarks.
+
+FakeTableClient keeps entities sorted by (PartitionKey, RowKey) and answers
+the simple `Field op @param [and ...]` filters built by table_query with an
+index range lookup, the same way the Table service serves a partition/RowKey
+range. It counts calls and returned entities so benchmarks can report
+upstream cost next to latency.
+
+FakeContainerClient stores blobs in a dict and charges each request a fixed
+latency plus transfer time at a per-connection bandwidth. Blobs larger than
+`max_single_put_size` are staged block by block, `max_concurrency` blocks
+at a time, and then committed, like the Blob SDK's block-blob upload.
+"""
+import bisect
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+_CLAUSE = re.compile(r"^\s*(\w+)\s+(eq|ne|gt|ge|lt|le)\s+(@\w+|'[^']*')\s*$")
+_OPS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+
+class ResourceNotFoundError(Exception):
+    pass
+
+
+class FakePaged:
+    def __init__(self, rows, page_size, page_latency, client):
+        self._rows = rows
+        self._page_size = page_size or 1000
+        self._page_latency = page_latency
+        self._client = client
+
+    def by_page(self):
+        rows = iter(self._rows)
+        first = True
+        while True:
+            page = []
+            for entity in rows:
+                page.append(entity)
+                if len(page) >= self._page_size:
+                    break
+            if not page:
+                # An empty result still costs its round trip.
+                if first and self._page_latency:
+                    time.sleep(self._page_latency)
+                return
+            first = False
+            self._client.pages += 1
+            self._client.entities_returned += len(page)
+            if self._page_latency:
+                time.sleep(self._page_latency)
+            yield page
+            if len(page) < self._page_size:
+                return
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+
+class FakeTableClient:
+    def __init__(self, page_latency=0.0):
+        self._sorted_keys = []
+        self._dirty = False
+        self._entities = {}
+        self.page_latency = page_latency
+        # Set to simulate a network outage: every request raises ConnectionError.
+        self.down = False
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.calls = 0
+        self.pages = 0
+        self.entities_returned = 0
+
+    def __len__(self):
+        return len(self._entities)
+
+    def _request(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("Table service unreachable")
+
+    @property
+    def _keys(self):
+        # The sorted index is rebuilt lazily so bulk writes stay O(1) each.
+        if self._dirty:
+            self._sorted_keys = sorted(self._entities)
+            self._dirty = False
+        return self._sorted_keys
+
+    def _put(self, entity):
+        key = (entity["PartitionKey"], entity["RowKey"])
+        if key not in self._entities:
+            self._dirty = True
+        self._entities[key] = dict(entity)
+
+    def _delete(self, key):
+        if self._entities.pop(key, None) is not None:
+            self._dirty = True
+
+    def load(self, entities):
+        """Bulk-seed the table without going through the counters."""
+        for entity in entities:
+            self._entities[(entity["PartitionKey"], entity["RowKey"])] = dict(entity)
+        self._dirty = True
+
+    def create_entity(self, entity):
+        self._request()
+        key = (entity["PartitionKey"], entity["RowKey"])
+        if key in self._entities:
+            raise ValueError(f"Entity already exists: {key}")
+        self._put(entity)
+
+    def upsert_entity(self, entity, mode=None):
+        self._request()
+        self._put(entity)
+
+    def delete_entity(self, partition_key, row_key):
+        self._request()
+        self._delete((partition_key, row_key))
+
+    def submit_transaction(self, operations):
+        self._request()
+        partitions = {operation[1]["PartitionKey"] for operation in operations}
+        if len(operations) > 100 or len(partitions) > 1:
+            raise ValueError("A transaction holds up to 100 operations on one partition")
+        for op, entity, *_ in operations:
+            if op == "delete":
+                self._delete((entity["PartitionKey"], entity["RowKey"]))
+            elif op == "create" and (entity["PartitionKey"], entity["RowKey"]) in self._entities:
+                raise ValueError("Entity already exists")
+            else:
+                self._put(entity)
+
+    def get_entity(self, partition_key, row_key, select=None):
+        self._request()
+        entity = self._entities.get((partition_key, row_key))
+        if entity is None:
+            raise ResourceNotFoundError(f"{partition_key}/{row_key}")
+        return self._project(entity, select)
+
+    def list_entities(self, select=None, results_per_page=None):
+        self._request()
+        return self._paged(iter(self._keys), [], select, results_per_page)
+
+    def query_entities(self, query_filter, parameters=None, select=None, results_per_page=None):
+        self._request()
+        predicates = self._parse(query_filter, parameters or {})
+        return self._paged(self._candidates(predicates), predicates, select, results_per_page)
+
+    def _paged(self, keys, predicates, select, results_per_page):
+        # Rows deleted mid-iteration are skipped, as with continuation tokens.
+        entities = (self._entities.get(key) for key in keys)
+        rows = (self._project(entity, select) for entity in entities
+                if entity is not None
+                and all(_OPS[op](entity.get(field), value) for field, op, value in predicates))
+        return FakePaged(rows, results_per_page, self.page_latency, self)
+
+    def _parse(self, query_filter, parameters):
+        predicates = []
+        for clause in query_filter.split(" and "):
+            match = _CLAUSE.match(clause)
+            if not match:
+                raise ValueError(f"Unsupported filter clause: {clause!r}")
+            field, op, operand = match.groups()
+            value = parameters[operand[1:]] if operand.startswith("@") else operand[1:-1]
+            predicates.append((field, op, value))
+        return predicates
+
+    def _candidates(self, predicates):
+        # Use the (PartitionKey, RowKey) index like the real service does.
+        keys = self._keys
+        partition = next((v for f, op, v in predicates if f == "PartitionKey" and op == "eq"), None)
+        if partition is None:
+            return iter(keys)
+        low = (partition, "")
+        high = (partition, "￿")
+        for field, op, value in predicates:
+            if field == "RowKey" and op in ("ge", "gt"):
+                low = max(low, (partition, value))
+            elif field == "RowKey" and op in ("le", "lt"):
+                high = min(high, (partition, value + "\x00"))
+        first, last = bisect.bisect_left(keys, low), bisect.bisect_left(keys, high)
+        return (keys[i] for i in range(first, last))
+
+    @staticmethod
+    def _project(entity, select):
+        if not select:
+            return dict(entity)
+        return {k: entity[k] for k in select if k in entity}
+
+
+BlobProperties = namedtuple("BlobProperties", "name size last_modified")
+
+
+class FakeContainerClient:
+    def __init__(self, request_latency=0.05, bandwidth=1024 * 1024,
+                 max_single_put_size=256 * 1024, max_block_size=128 * 1024):
+        self.request_latency = request_latency
+        self.bandwidth = bandwidth
+        self.max_single_put_size = max_single_put_size
+        self.max_block_size = max_block_size
+        self.blobs = {}
+        # Last-Modified per blob; blobs put straight into `blobs` date from the container's creation.
+        self.modified = {}
+        self.created = datetime.now(timezone.utc)
+        self.down = False
+        self._lock = threading.Lock()
+        self._active = 0
+
+        self._sorted_names = None
+
+        self.requests = 0
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        self.blobs_listed = 0
+        self.max_active = 0
+
+    def _request(self, size=0):
+        with self._lock:
+            if self.down:
+                raise ConnectionError("blob service unreachable")
+            self.requests += 1
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            time.sleep(self.request_latency + size / self.bandwidth)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.bytes_uploaded += size
+
+    def get_blob_client(self, blob_name):
+        return FakeBlobClient(self, blob_name)
+
+    def download_blob(self, blob_name):
+        return self.get_blob_client(blob_name).download_blob()
+
+    def list_blobs(self, name_starts_with=None, results_per_page=5000):
+        return FakeBlobPaged(self, name_starts_with or "", results_per_page)
+
+    def _names(self):
+        with self._lock:
+            if self._sorted_names is None or len(self._sorted_names) != len(self.blobs):
+                self._sorted_names = sorted(self.blobs)
+            return self._sorted_names
+
+
+class FakeBlobPaged:
+    """list_blobs() result: iterate for blobs, or by_page() for pages with a continuation token.
+
+    The token is simply the next blob name, which is enough for resuming.
+    """
+
+    def __init__(self, container, prefix, page_size):
+        self._container = container
+        self._prefix = prefix
+        self._page_size = page_size
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, continuation_token=None):
+        return FakeBlobPages(self._container, self._prefix, self._page_size, continuation_token)
+
+
+class FakeBlobPages:
+    def __init__(self, container, prefix, page_size, continuation_token):
+        self._container = container
+        self._prefix = prefix
+        self._page_size = page_size
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        container = self._container
+        while True:
+            names = container._names()
+            i = bisect.bisect_left(names, self.continuation_token or self._prefix)
+            container._request()
+            page = []
+            while i < len(names) and names[i].startswith(self._prefix) and len(page) < self._page_size:
+                page.append(BlobProperties(names[i], len(container.blobs[names[i]]),
+                                           container.modified.get(names[i], container.created)))
+                i += 1
+            container.blobs_listed += len(page)
+            more = i < len(names) and names[i].startswith(self._prefix)
+            self.continuation_token = names[i] if more else None
+            yield page
+            if not more:
+                return
+
+
+class FakeBlobClient:
+    def __init__(self, container, blob_name):
+        self.container = container
+        self.blob_name = blob_name
+
+    def upload_blob(self, data, overwrite=False, max_concurrency=1):
+        container = self.container
+        if not overwrite and self.blob_name in container.blobs:
+            raise ValueError(f"blob {self.blob_name} already exists")
+        data = bytes(data)
+        if len(data) <= container.max_single_put_size:
+            container._request(len(data))
+        else:
+            blocks = [len(data[i:i + container.max_block_size])
+                      for i in range(0, len(data), container.max_block_size)]
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                list(pool.map(container._request, blocks))
+            container._request()
+        container.blobs[self.blob_name] = data
+        container.modified[self.blob_name] = datetime.now(timezone.utc)
+
+    def download_blob(self):
+        container = self.container
+        data = container.blobs.get(self.blob_name)
+        if data is None:
+            raise ResourceNotFoundError(f"blob {self.blob_name} not found")
+        container._request()
+        time.sleep(len(data) / container.bandwidth)
+        with container._lock:
+            container.bytes_downloaded += len(data)
+        return FakeDownload(data)
+
+
+class FakeDownload:
+    def __init__(self, data):
+        self._data = data
+
+    def readall(self):
+        return self._data
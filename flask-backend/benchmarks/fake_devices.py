@@ -0,0 +1,346 @@
+"""Fake hardware drivers for running the capture and sensor code off a Pi."""
+import http.client
+import json
+import queue
+import os
+import random
+import select
+import threading
+import time
+import tty
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FakeFrameSource:
+    """Stands in for cv2.VideoCapture.
+
+    Opening takes `open_delay` seconds and `read()` blocks until the next
+    frame is due at `fps`, like a USB camera. Frames are uint8 arrays when
+    NumPy is installed and bytearrays otherwise; each frame's first byte is
+    a running frame counter. After `fail_after` reads the device "unplugs"
+    and every read fails.
+    """
+
+    opened = 0
+
+    def __init__(self, width=640, height=480, fps=30, open_delay=0.5, fail_after=None):
+        time.sleep(open_delay)
+        FakeFrameSource.opened += 1
+        self.shape = (height, width, 3)
+        self.frame_interval = 1.0 / fps
+        self.fail_after = fail_after
+        self.reads = 0
+        self._next_frame = time.monotonic()
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def set(self, prop, value):
+        return True
+
+    def read(self, image=None):
+        if not self._open or (self.fail_after is not None and self.reads >= self.fail_after):
+            return False, None
+        delay = self._next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame = max(self._next_frame + self.frame_interval, time.monotonic())
+        self.reads += 1
+        if image is None:
+            image = np.zeros(self.shape, dtype=np.uint8) if np is not None \
+                else bytearray(self.shape[0] * self.shape[1] * self.shape[2])
+        if np is not None:
+            image.flat[0] = self.reads % 256
+        else:
+            image[0] = self.reads % 256
+        return True, image
+
+    def release(self):
+        self._open = False
+
+
+class FakeSeesaw:
+    """Stands in for adafruit_seesaw.seesaw.Seesaw.
+
+    Each read is an I2C transaction lasting `bus_delay` seconds. Overlapping
+    transactions from two threads corrupt each other, as they can on the
+    real bus: both return garbage and `collisions` is incremented. A
+    fraction `glitch_rate` of reads return a spike, like a noisy sensor.
+    """
+
+    def __init__(self, moisture=700, bus_delay=0.005, glitch_rate=0.0, seed=1):
+        self.moisture = moisture
+        self.temperature = 22.5
+        self.bus_delay = bus_delay
+        self.glitch_rate = glitch_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._active = 0
+        self.reads = 0
+        self.collisions = 0
+
+    def _transaction(self, value):
+        with self._lock:
+            self._active += 1
+            overlapped = self._active > 1
+        time.sleep(self.bus_delay)
+        with self._lock:
+            overlapped = overlapped or self._active > 1
+            self._active -= 1
+            self.reads += 1
+            if overlapped:
+                self.collisions += 1
+                return 65535
+            if self._random.random() < self.glitch_rate:
+                return value * 3
+        return value
+
+    def moisture_read(self):
+        return self._transaction(self.moisture)
+
+    def get_temp(self):
+        return self._transaction(self.temperature)
+
+
+class PtySerialDevice:
+    """An Arduino on a pseudo-terminal, reachable through the symlink `path`.
+
+    In streaming mode it writes one reading line every 1/`rate` seconds, like
+    the LDR sketch; with `respond_to` set it only answers that request byte,
+    like the Plant 2 moisture sketch. unplug() closes the pty and plug()
+    creates a new one behind the same path, the way a USB device comes back.
+    """
+
+    def __init__(self, path, value=512, rate=10, respond_to=None, boot_noise=b"\x00\xffboot\n"):
+        self.path = path
+        self.value = value
+        self.rate = rate
+        self.respond_to = respond_to
+        self.boot_noise = boot_noise
+        self.lines_sent = 0
+        self._master = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.plug()
+
+    def plug(self):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+        os.symlink(os.ttyname(slave), self.path)
+        self._slave = slave
+        self._master = master
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(master,), daemon=True)
+        self._thread.start()
+
+    def unplug(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+        os.remove(self.path)
+
+    def _send(self, master, data):
+        os.write(master, data)
+
+    def _run(self, master):
+        self._send(master, self.boot_noise)
+        while not self._stop.is_set():
+            if self.respond_to is None:
+                self._send(master, f"{self.value}\n".encode())
+                self.lines_sent += 1
+                self._stop.wait(1.0 / self.rate)
+                continue
+            ready, _, _ = select.select([master], [], [], 0.05)
+            if ready and self.respond_to in os.read(master, 64):
+                self._send(master, f"{self.value}\n".encode())
+                self.lines_sent += 1
+
+
+class TtyPort:
+    """Minimal pyserial-like port over a tty path, for when pyserial isn't installed."""
+
+    def __init__(self, path, timeout=1.0):
+        self.timeout = timeout
+        self._fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self._fd)
+        self._buffer = b""
+
+    def readline(self):
+        deadline = time.monotonic() + self.timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if ready:
+                chunk = os.read(self._fd, 256)
+                if not chunk:
+                    raise OSError("device disconnected")
+                self._buffer += chunk
+        if b"\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            return line + b"\n"
+        line, self._buffer = self._buffer, b""
+        return line
+
+    def write(self, data):
+        return os.write(self._fd, data)
+
+    def reset_input_buffer(self):
+        self._buffer = b""
+
+    def close(self):
+        os.close(self._fd)
+
+
+def open_serial(path, baudrate=9600, timeout=1.0):
+    """pyserial port on `path` if pyserial is installed, else a TtyPort."""
+    try:
+        import serial
+    except ImportError:
+        return TtyPort(path, timeout)
+    return serial.Serial(path, baudrate, timeout=timeout)
+
+
+class FakeNodeServer:
+    """A node agent on localhost answering /sensor/moisture/<id> and /capture/<id>.
+
+    Every request waits `latency` seconds first (a Pi on Wi-Fi, or a busy
+    one), or `slow_latency` for a `slow_rate` fraction of them; HTTP/1.1
+    keep-alive is supported, and `hang` makes every request take that long
+    instead. `requests` and `connections` count what arrived.
+    """
+
+    def __init__(self, latency=0.03, hang=None, moisture=512, slow_rate=0.0, slow_latency=1.0, seed=0):
+        node = self
+        self.latency = latency
+        self.hang = hang
+        self.moisture = moisture
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle hold the body back.
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with node._lock:
+                    node.connections += 1
+
+            def do_GET(self):
+                self._answer()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self._answer(202)
+
+            def _answer(self, status=200):
+                with node._lock:
+                    node.requests += 1
+                    slow = node._random.random() < node.slow_rate
+                if node.hang is not None:
+                    time.sleep(node.hang)
+                else:
+                    time.sleep(node.slow_latency if slow else node.latency)
+                plant_id = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+                body = json.dumps({"plant_id": plant_id, "moisture": node.moisture, "status": "ok"}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    # The client timed out and hung up.
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class HttpResponse:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+
+class HttpClientSession:
+    """Minimal requests.Session-like client over http.client, for when requests isn't installed.
+
+    With `keep_alive`, idle connections are pooled per host and reused;
+    otherwise every request opens and closes its own connection, like a
+    bare requests.post().
+    """
+
+    def __init__(self, keep_alive=True):
+        self.keep_alive = keep_alive
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, data=None, files=None):
+        parts = urlsplit(url)
+        with self._lock:
+            idle = self._idle.setdefault(parts.netloc, queue.LifoQueue())
+        try:
+            conn = idle.get_nowait() if self.keep_alive else None
+        except queue.Empty:
+            conn = None
+        if conn is None:
+            conn = http.client.HTTPConnection(parts.netloc, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        body = data
+        if files:
+            body = b"".join(content for _, content, _ in files.values())
+        try:
+            conn.request(method, parts.path or "/", body=body)
+            resp = conn.getresponse()
+            result = HttpResponse(resp.status, resp.read())
+        except Exception:
+            conn.close()
+            raise
+        if self.keep_alive:
+            idle.put(conn)
+        else:
+            conn.close()
+        return result
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
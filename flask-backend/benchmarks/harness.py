@@ -0,0 +1,249 @@
+"""Runs app.py off a Pi, against in-memory Azure and fake sensors and cameras.
+
+prepare() seeds a folder and puts the stand-ins in place; load_app() then
+imports app.py (bench_workers.py forks web workers in between):
+
+* `azure.storage.blob` and `azure.data.tables` are replaced by modules
+  whose BlobServiceClient and TableClient hand out one FakeContainerClient
+  and one FakeTableClient (every table's partitions are distinct, so they
+  share it; per-table calls still show up by name in /metrics);
+* plants.json is replaced by PLANTS_CONFIG: `plants` plants on the hub,
+  odd ones on a FakeSeesaw, even ones on a PtySerialDevice answering "R"
+  like the Plant 2 Arduino, each with a camera serving a synthetic photo;
+* agent.open_seesaw/open_serial_port/open_camera open those fakes, still
+  instrumented like the real drivers and recorded in COMPONENTS.
+
+`client_delay` and `open_delay` make creating an Azure client and opening
+a device take that long, like the real SDK and drivers on a Pi.
+
+seed() fills the table, the rollup partitions, the local column store and
+the container with `months` of synthetic history first, so the routes
+answer over a realistic amount of data. Everything lives under `folder`,
+which becomes the working directory (app.py keeps `data/` and
+`temp_images/` relative to it).
+"""
+import json
+import math
+import os
+import random
+import sys
+import time
+import types
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmarks.fake_azure import FakeContainerClient, FakeTableClient
+from benchmarks.fake_devices import FakeFrameSource, FakeSeesaw, PtySerialDevice, open_serial
+from column_store import ColumnStore
+from components import COMPONENTS
+from metrics import instrument, span
+from rollups import RollupWriter
+from row_keys import make_row_key
+from sampling import window_columns
+
+ACCOUNT_NAME = "benchaccount"
+HUB = "hub"
+STEP = 60
+PHOTO_SIZE = (640, 480)
+
+
+def plant_photo(width, height, seed):
+    """A green canopy on soil, noisy enough that JPEG encoding costs what a real frame does."""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (40, 70, 110)
+    axes = (int(width * (0.2 + 0.02 * seed)), int(height * 0.3))
+    cv2.ellipse(frame, (width // 2, height // 2), axes, 0, 0, 360, (40, 160, 60), -1)
+    return cv2.add(frame, rng.integers(0, 20, frame.shape, dtype=np.uint8))
+
+
+class PhotoFrameSource(FakeFrameSource):
+    """FakeFrameSource whose frames are a fixed plant photo instead of black."""
+
+    def __init__(self, photo, fps=30):
+        super().__init__(photo.shape[1], photo.shape[0], fps=fps, open_delay=0)
+        self.photo = photo
+
+    def read(self, image=None):
+        ok, image = super().read(image)
+        if ok:
+            np.copyto(image, self.photo)
+        return ok, image
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install_azure(table, container, client_delay=0):
+    class TableClient:
+        @staticmethod
+        def from_table_url(url):
+            time.sleep(client_delay)
+            return table
+
+    class BlobServiceClient:
+        account_name = ACCOUNT_NAME
+
+        @classmethod
+        def from_connection_string(cls, connection_string, **kwargs):
+            time.sleep(client_delay)
+            return cls()
+
+        def get_container_client(self, name):
+            return container
+
+    class ContainerClient:
+        @staticmethod
+        def from_container_url(url):
+            return container
+
+    _module("azure")
+    _module("azure.storage")
+    _module("azure.storage.blob", BlobServiceClient=BlobServiceClient, ContainerClient=ContainerClient)
+    _module("azure.data")
+    _module("azure.data.tables", TableClient=TableClient)
+
+
+def write_config(folder, plants):
+    config = {"hub": HUB, "nodes": {HUB: {"url": "http://127.0.0.1:5071"}}, "plants": []}
+    devices = {}
+    for plant_id in range(1, plants + 1):
+        entry = {"id": plant_id, "node": HUB, "threshold": 600, "camera": plant_id - 1}
+        if plant_id % 2:
+            entry["moisture"] = {"driver": "seesaw", "address": 0x36 + plant_id}
+        else:
+            port = os.path.join(folder, f"ttyACM{plant_id}")
+            entry["moisture"] = {"driver": "serial", "port": port, "poll": "R"}
+            devices[port] = PtySerialDevice(port, value=500 + plant_id, respond_to=b"R", boot_noise=b"")
+        config["plants"].append(entry)
+    path = os.path.join(folder, "plants.json")
+    with open(path, "w") as f:
+        json.dump(config, f, indent=2)
+    return path, devices
+
+
+def install_drivers(plants, open_delay=0):
+    import agent
+    photos = [plant_photo(*PHOTO_SIZE, seed) for seed in range(plants)]
+
+    def open_seesaw(address=agent.SEESAW_ADDRESS):
+        def create():
+            with span("i2c", f"seesaw-{address}", "open"):
+                time.sleep(open_delay)
+                return instrument(FakeSeesaw(moisture=650 + address % 8), "i2c", f"seesaw-{address}")
+        return COMPONENTS.open(f"seesaw-{address}", create)
+
+    def open_serial_port(port, baudrate=9600):
+        def create():
+            with span("serial", port, "open"):
+                time.sleep(open_delay)
+                return instrument(open_serial(port, baudrate), "serial", port)
+        return COMPONENTS.open(f"serial-{port}", create)
+
+    def open_camera(index):
+        def create():
+            with span("camera", f"camera-{index}", "open"):
+                time.sleep(open_delay)
+            return instrument(PhotoFrameSource(photos[index % len(photos)]), "camera", f"camera-{index}")
+        return COMPONENTS.open(f"camera-{index}", create)
+
+    agent.open_seesaw = open_seesaw
+    agent.open_serial_port = open_serial_port
+    agent.open_camera = open_camera
+
+
+def moisture_at(ts, plant_id, rng):
+    """Dries by ~10/hour from 800 and is watered every ~2.5 days."""
+    period = (3600 + plant_id * 7) * 60
+    return 800 - (ts % period) / 360 + rng.gauss(0, 3)
+
+
+def _window(field, value, rng):
+    spread = abs(rng.gauss(0, 2))
+    return {field: round(value, 2), f"{field}_min": value - spread, f"{field}_max": value + spread,
+            f"{field}_std": round(spread / 2, 3), f"{field}_count": 30}
+
+
+def seed(folder, table, container, plants, months, images_per_day, end_ts=None, report=print):
+    """Fill the table, rollups, column store and container with `months` of history."""
+    rng = random.Random(1)
+    end_ts = int((end_ts or time.time()) // STEP * STEP)
+    start_ts = end_ts - int(months * 30 * 86400)
+    columns = ColumnStore(os.path.join(folder, "data", "columns"))
+    columns.create("temperature", window_columns(["Temperature", "Humidity"]))
+    columns.create("light", window_columns(["Light"]))
+    for plant_id in range(1, plants + 1):
+        columns.create(f"moisture-{plant_id}", window_columns(["moisture"]))
+    # Buckets go straight to the table; no spool.
+    rollups = RollupWriter(table)
+
+    started = time.perf_counter()
+    entities = []
+    for ts in range(start_ts, end_ts, STEP):
+        row_key = make_row_key(ts)
+        day = (ts % 86400) / 86400
+        temperature = _window("Temperature", 21 + 3 * math.sin(2 * math.pi * day) + rng.gauss(0, 0.2), rng)
+        humidity = _window("Humidity", 45 + rng.gauss(0, 1), rng)
+        light = _window("Light", max(0.0, 500 * math.sin(math.pi * day)), rng)
+        entities.append({"PartitionKey": "Enviroment", "RowKey": row_key, **temperature, **humidity})
+        entities.append({"PartitionKey": "LightLevel", "RowKey": row_key, **light})
+        columns.append("temperature", ts, {**temperature, **humidity})
+        columns.append("light", ts, light)
+        rollups.add("Enviroment", ts, {"Temperature": temperature["Temperature"], "Humidity": humidity["Humidity"]})
+        rollups.add("LightLevel", ts, {"Light": light["Light"]})
+        for plant_id in range(1, plants + 1):
+            moisture = _window("moisture", moisture_at(ts, plant_id, rng), rng)
+            entities.append({"PartitionKey": f"Plant{plant_id}", "RowKey": row_key, **moisture,
+                             "Status": "dry" if moisture["moisture"] < 600 else "ok"})
+            columns.append(f"moisture-{plant_id}", ts, moisture)
+            rollups.add(f"Plant{plant_id}", ts, {"moisture": moisture["moisture"]})
+    rollups.flush()
+    table.load(entities)
+    columns.close()
+
+    photos = []
+    for plant_id in range(1, plants + 1):
+        ok, encoded = cv2.imencode(".jpg", plant_photo(*PHOTO_SIZE, plant_id), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        photos.append(encoded.tobytes())
+    interval = 86400 // images_per_day if images_per_day else None
+    for ts in range(start_ts, end_ts, interval) if interval else ():
+        stamp = datetime.fromtimestamp(ts).strftime("%Y%m%d_%H%M%S")
+        for plant_id in range(1, plants + 1):
+            container.blobs[f"plant_{plant_id}_{stamp}.jpg"] = photos[plant_id - 1]
+    report(f"seeded {len(entities)} rows, {len(table) - len(entities)} rollups and {len(container.blobs)} "
+           f"images over {months} months in {time.perf_counter() - started:.1f} s")
+
+
+def prepare(folder, plants=4, months=1, images_per_day=24, table_latency=0.02, blob_latency=0.05,
+            report=print, client_delay=0, open_delay=0):
+    """Seed `folder` and put the fakes in place, so app.py can be imported; returns (table, container, devices)."""
+    table = FakeTableClient(page_latency=table_latency)
+    container = FakeContainerClient(request_latency=blob_latency, bandwidth=8 * 1024 * 1024)
+    seed(folder, table, container, plants, months, images_per_day, report=report)
+    table.reset_counters()
+
+    config, devices = write_config(folder, plants)
+    os.environ["PLANTS_CONFIG"] = config
+    os.chdir(folder)
+    install_azure(table, container, client_delay)
+    install_drivers(plants, open_delay)
+    return table, container, devices
+
+
+def load_app(folder, plants=4, months=1, images_per_day=24, table_latency=0.02, blob_latency=0.05,
+             report=print):
+    """prepare(), import app.py and start its hardware; returns (app, table, container, devices)."""
+    table, container, devices = prepare(folder, plants, months, images_per_day, table_latency, blob_latency,
+                                        report)
+    import app
+    app.startup()
+    app.start_hardware()
+    while not app.image_catalog.reconcile(app.container_client):
+        pass
+    return app, table, container, devices
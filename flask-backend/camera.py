@@ -0,0 +1,113 @@
+"""Long-lived camera capture worker.
+
+CaptureWorker owns the video device for the life of the process. A
+background thread reads frames into the back half of a double buffer and
+swaps it to the front under a lock, so scheduled and on-demand captures copy
+the newest frame without reopening the device or waiting for warm-up. If the
+device stops delivering frames it is released and reopened with backoff; an
+`open_source` that raises is retried the same way.
+A frame older than MAX_FRAME_AGE frame intervals (a hung or unplugged
+camera) is never handed out; capture() returns None instead.
+
+`open_source` is any callable returning an object with the
+cv2.VideoCapture `isOpened()` / `read(image)` / `release()` interface, which
+lets tests and benchmarks drive the worker with a fake frame source.
+"""
+import threading
+import time
+
+FRAME_RATE = 5
+WARMUP_FRAMES = 5
+CAPTURE_TIMEOUT = 2.0
+MAX_REOPEN_DELAY = 30.0
+# In frame intervals.
+MAX_FRAME_AGE = 5
+
+
+class CaptureWorker:
+    def __init__(self, open_source, frame_rate=FRAME_RATE, warmup_frames=WARMUP_FRAMES):
+        self.open_source = open_source
+        self.frame_interval = 1.0 / frame_rate
+        self.max_frame_age = MAX_FRAME_AGE * self.frame_interval
+        self.warmup_frames = warmup_frames
+        self._buffers = [None, None]
+        self._front = 0
+        self._frame_time = None
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.frames_read = 0
+        self.reopens = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def capture(self, timeout=CAPTURE_TIMEOUT):
+        """Return (frame, timestamp) for the newest frame, or (None, None) if none fresh arrives in time."""
+        with self._new_frame:
+            if not self._fresh():
+                self._new_frame.wait_for(self._fresh, timeout)
+            if not self._fresh():
+                return None, None
+            return self._buffers[self._front].copy(), self._frame_time
+
+    def _fresh(self):
+        return self._frame_time is not None and time.time() - self._frame_time <= self.max_frame_age
+
+    def _forget_frame(self):
+        with self._new_frame:
+            self._frame_time = None
+
+    def _open(self):
+        self._forget_frame()
+        delay = self.frame_interval
+        while not self._stop.is_set():
+            try:
+                source = self.open_source()
+            except Exception as e:
+                print(f"Error: Could not open camera ({e}), retrying in {delay:.1f}s")
+            else:
+                if source.isOpened():
+                    for _ in range(self.warmup_frames):
+                        source.read()
+                    return source
+                source.release()
+                print(f"Error: Could not open camera, retrying in {delay:.1f}s")
+            self._stop.wait(delay)
+            delay = min(delay * 2, MAX_REOPEN_DELAY)
+        return None
+
+    def _run(self):
+        source = self._open()
+        while source is not None and not self._stop.is_set():
+            started = time.monotonic()
+            back = 1 - self._front
+            ok, frame = source.read(self._buffers[back]) if self._buffers[back] is not None \
+                else source.read()
+            if not ok:
+                print("Error: Failed to capture image, reopening camera.")
+                self._forget_frame()
+                source.release()
+                self.reopens += 1
+                source = self._open()
+                continue
+            with self._new_frame:
+                self._buffers[back] = frame
+                self._front = back
+                self._frame_time = time.time()
+                self._new_frame.notify_all()
+            self.frames_read += 1
+            self._stop.wait(max(0.0, self.frame_interval - (time.monotonic() - started)))
+        if source is not None:
+            source.release()
@@ -0,0 +1,270 @@
+"""Local columnar time-series store, partitioned by series and day.
+
+Every series has a fixed list of numeric fields (schema.json). The rows of
+one UTC day live in <root>/<series>/<YYYY-MM-DD>/, one file per column:
+`t.f64` holds the unix timestamps, `<field>.f64` the values, all native
+doubles appended in time order (missing values are NaN). The loggers
+append each window row here next to queueing it for Azure.
+
+Reads memory-map the day files of the requested range, binary-search the
+timestamp column for both ends and copy each column slice in one go, so a
+query costs a couple of dozen comparisons per day plus the rows it
+returns; nothing is parsed. Columns come back as lists, or as NumPy arrays
+with numpy=True. to_arrow() / export_parquet() hand a range to pyarrow for
+offline analysis; NumPy and pyarrow are only imported when asked for.
+
+One process writes each series; any number may read. Columns of a day can
+differ in length after a crash, so readers use the shortest one, and the
+writer cuts every column back to the length of `t` when it opens the day.
+"""
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+MAX_OPEN_FILES = 256
+TIME_COLUMN = "t"
+_DOUBLE = struct.Struct("d")
+
+
+def day_of(ts):
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+class _Mapped:
+    """Read-only mapping of one column file and its double view."""
+
+    def __init__(self, path, size):
+        self.size = size
+        self._file = open(path, "rb")
+        self._mem = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._mem).cast("d")
+
+    def close(self):
+        self.view.release()
+        self._mem.close()
+        self._file.close()
+
+
+class ColumnStore:
+    def __init__(self, root, max_open=MAX_OPEN_FILES):
+        self.root = root
+        self.max_open = max_open
+        self._schemas = {}
+        self._writers = {}
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.rows_written = 0
+        self.queries = 0
+        self.rows_read = 0
+
+    def create(self, series, fields):
+        """Declare a series and its fields; reopening with the same fields is a no-op."""
+        fields = list(fields)
+        if not series.replace("-", "").replace("_", "").isalnum():
+            raise ValueError(f"Invalid series name {series!r}")
+        path = os.path.join(self.root, series, "schema.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            with open(path) as f:
+                existing = json.load(f)["fields"]
+            if existing != fields:
+                raise ValueError(f"{series} already stores {existing}, not {fields}")
+        else:
+            with open(path, "w") as f:
+                json.dump({"fields": fields}, f)
+        self._schemas[series] = fields
+
+    def series(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, "schema.json")))
+
+    def fields(self, series):
+        """Field names of `series`, or None if it doesn't exist."""
+        if series not in self._schemas:
+            path = os.path.join(self.root, series, "schema.json")
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                self._schemas[series] = json.load(f)["fields"]
+        return self._schemas[series]
+
+    def append(self, series, ts, values):
+        """Append one row; `values` maps field names to numbers (missing ones become NaN).
+
+        Raises TypeError or ValueError, with nothing written, if a value isn't a number.
+        """
+        fields = self.fields(series)
+        if fields is None:
+            raise KeyError(f"Unknown series {series!r}")
+        # Convert everything before writing, so a bad value can't leave a partial row.
+        packed = {name: _DOUBLE.pack(math.nan if values.get(name) is None else float(values[name]))
+                  for name in fields}
+        packed_ts = _DOUBLE.pack(float(ts))
+        day = day_of(ts)
+        with self._lock:
+            writer = self._writers.get(series)
+            if writer is None or writer[0] != day:
+                if writer is not None:
+                    for f in writer[1].values():
+                        f.close()
+                writer = self._writers[series] = (day, self._open_day(series, day, fields))
+            files = writer[1]
+            # Values first and the timestamp last, so a row is visible only once complete.
+            for name in fields:
+                files[name].write(packed[name])
+                files[name].flush()
+            files[TIME_COLUMN].write(packed_ts)
+            files[TIME_COLUMN].flush()
+            self.rows_written += 1
+
+    def _open_day(self, series, day, fields):
+        """Append handles for a day's columns, each cut back to the rows `t` has."""
+        folder = os.path.join(self.root, series, day)
+        os.makedirs(folder, exist_ok=True)
+        time_path = os.path.join(folder, f"{TIME_COLUMN}.f64")
+        rows = os.path.getsize(time_path) // 8 if os.path.exists(time_path) else 0
+        files = {}
+        for name in fields + [TIME_COLUMN]:
+            path = os.path.join(folder, f"{name}.f64")
+            mapped = self._maps.pop(path, None)
+            if mapped is not None:
+                mapped.close()
+            f = files[name] = open(path, "ab")
+            # Longer: values of a row whose timestamp a crash cut off. Shorter (lost
+            # writes): padded with NaN so the columns stay aligned.
+            kept = min(f.tell() // 8, rows)
+            if f.tell() != kept * 8:
+                f.truncate(kept * 8)
+            f.write(_DOUBLE.pack(math.nan) * (rows - kept))
+        return files
+
+    def days(self, series, start_ts=None, end_ts=None):
+        folder = os.path.join(self.root, series)
+        if not os.path.isdir(folder):
+            return []
+        first = day_of(start_ts) if start_ts is not None else ""
+        last = day_of(end_ts) if end_ts is not None else "9999"
+        return sorted(name for name in os.listdir(folder)
+                      if name[:1].isdigit() and first <= name <= last)
+
+    def _column(self, series, day, name):
+        """Double view of one column file (None if empty), remapped when the file has grown."""
+        path = os.path.join(self.root, series, day, f"{name}.f64")
+        try:
+            size = os.path.getsize(path) // 8 * 8
+        except OSError:
+            return None
+        mapped = self._maps.get(path)
+        if mapped is not None and mapped.size != size:
+            self._maps.pop(path).close()
+            mapped = None
+        if mapped is None:
+            if size == 0:
+                return None
+            mapped = self._maps[path] = _Mapped(path, size)
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)[1].close()
+        self._maps.move_to_end(path)
+        return mapped.view
+
+    def _rows(self, series, day, names):
+        """Complete rows of one day: the length of its shortest column."""
+        folder = os.path.join(self.root, series, day)
+        try:
+            return min(os.path.getsize(os.path.join(folder, f"{name}.f64")) for name in names) // 8
+        except OSError:
+            return 0
+
+    def columns(self, series, start_ts=None, end_ts=None, fields=None, limit=None, every=1, numpy=False):
+        """{"t": [...], field: [...]} for rows with start_ts <= t <= end_ts, oldest first.
+
+        `limit` keeps the newest rows; `every` keeps every n-th row of the
+        range (a cheap way to thin out a year for a chart).
+        """
+        all_fields = self.fields(series)
+        if all_fields is None:
+            raise KeyError(f"Unknown series {series!r}")
+        fields = all_fields if fields is None else [f for f in fields if f in all_fields]
+        names = [TIME_COLUMN] + fields
+        if numpy:
+            import numpy as np
+        result = {name: [] for name in names}
+        with self._lock:
+            self.queries += 1
+            # Locate the slice of every day first, then copy only what the limit keeps.
+            slices = []
+            for day in self.days(series, start_ts, end_ts):
+                count = self._rows(series, day, names)
+                times = self._column(series, day, TIME_COLUMN) if count else None
+                if times is None:
+                    continue
+                lo = bisect.bisect_left(times, start_ts, 0, count) if start_ts is not None else 0
+                hi = bisect.bisect_right(times, end_ts, lo, count) if end_ts is not None else count
+                if hi > lo:
+                    slices.append((day, lo, hi))
+            if limit is not None:
+                remaining = limit * every
+                for i in range(len(slices) - 1, -1, -1):
+                    day, lo, hi = slices[i]
+                    if remaining <= 0:
+                        slices = slices[i + 1:]
+                        break
+                    if hi - lo > remaining:
+                        slices[i] = (day, hi - remaining, hi)
+                    remaining -= slices[i][2] - slices[i][1]
+            skip = 0
+            for day, lo, hi in slices:
+                start = lo + skip
+                if start >= hi:
+                    skip = start - hi
+                    continue
+                for name in names:
+                    chunk = self._column(series, day, name)[start:hi:every]
+                    # Both copy straight out of the mapping; nothing keeps it referenced.
+                    if numpy:
+                        result[name].append(np.array(chunk, dtype=np.float64))
+                    else:
+                        result[name] += chunk.tolist()
+                # Keep the stride across day boundaries.
+                skip = (start - hi) % every
+        if numpy:
+            result = {name: np.concatenate(chunks) if chunks else np.empty(0)
+                      for name, chunks in result.items()}
+        self.rows_read += len(result[TIME_COLUMN])
+        return result
+
+    def to_arrow(self, series, start_ts=None, end_ts=None, fields=None):
+        import pyarrow as pa
+        columns = self.columns(series, start_ts, end_ts, fields)
+        times = pa.array([int(ts * 1000) for ts in columns.pop(TIME_COLUMN)], pa.int64()).cast(pa.timestamp("ms", "UTC"))
+        return pa.table({"time": times, **{name: pa.array(values, pa.float64()) for name, values in columns.items()}},
+                        metadata={"series": series})
+
+    def export_parquet(self, series, path, start_ts=None, end_ts=None, fields=None):
+        """Write a range of `series` to a Parquet file (path or binary file object); returns the number of rows."""
+        import pyarrow.parquet as pq
+        table = self.to_arrow(series, start_ts, end_ts, fields)
+        pq.write_table(table, path, compression="zstd")
+        return table.num_rows
+
+    def close(self):
+        with self._lock:
+            for _, files in self._writers.values():
+                for f in files.values():
+                    f.close()
+            self._writers.clear()
+            while self._maps:
+                self._maps.popitem()[1].close()
+
+    def stats(self):
+        return {"series": self.series(), "rows_written": self.rows_written, "queries": self.queries,
+                "rows_read": self.rows_read, "open_files": len(self._maps)}
@@ -0,0 +1,160 @@
+"""Hardware and cloud clients created on first use, with their health.
+
+Importing app.py, agent.py or enviroment.py should not wait for the Azure
+SDK, its clients or the sensors before the first request can be served,
+and a missing device or bad credential should not take the whole process
+down. Each such dependency is therefore a Component: a name and a factory.
+There are two kinds:
+
+* shared clients (Azure tables and containers, the DHT22, app.py's SQLite
+  stores) are created by lazy(), which returns a stand-in that builds the real object on first
+  attribute access. A factory that raises is retried at most every
+  `retry_after` seconds; meanwhile callers get ComponentUnavailable, which
+  the existing error handling around every upstream call already turns into
+  an error reading instead of a crash;
+* devices the samplers and capture workers reopen themselves (Seesaw,
+  serial ports, cameras) go through open(), which only records how each
+  attempt went.
+
+stats() reports every component's state (idle, ready, failed), init time,
+attempts and last error; the apps serve it at /health. warm() creates the
+idle ones, e.g. in the background once the web server is up.
+"""
+import threading
+import time
+
+RETRY_AFTER = 30.0
+
+
+class ComponentUnavailable(Exception):
+    pass
+
+
+class Component:
+    def __init__(self, name, factory, retry_after=RETRY_AFTER, shared=True):
+        self.name = name
+        self.factory = factory
+        self.retry_after = retry_after
+        # False for devices opened through ComponentRegistry.open(); warm() leaves those alone.
+        self.shared = shared
+        self._object = None
+        self._lock = threading.Lock()
+        self.state = "idle"
+        self.error = None
+        self.failed_at = None
+        self.init_ms = None
+        self.attempts = 0
+
+    def _record(self, started, error=None):
+        self.attempts += 1
+        self.init_ms = round((time.perf_counter() - started) * 1000, 1)
+        if error is None:
+            self.state, self.error = "ready", None
+        else:
+            self.state, self.error, self.failed_at = "failed", repr(error), time.monotonic()
+            print(f"[COMPONENT] {self.name} unavailable: {error}")
+
+    def get(self):
+        """The object, created now if needed; raises ComponentUnavailable while it can't be."""
+        obj = self._object
+        if obj is not None:
+            return obj
+        with self._lock:
+            if self._object is not None:
+                return self._object
+            if self.failed_at is not None and time.monotonic() - self.failed_at < self.retry_after:
+                raise ComponentUnavailable(f"{self.name}: {self.error}")
+            started = time.perf_counter()
+            try:
+                self._object = self.factory()
+            except Exception as e:
+                self._record(started, e)
+                raise ComponentUnavailable(f"{self.name}: {e!r}") from e
+            self._record(started)
+            return self._object
+
+    def open(self):
+        """Call the factory every time, recording the outcome; the factory's exception propagates."""
+        started = time.perf_counter()
+        try:
+            obj = self.factory()
+        except Exception as e:
+            with self._lock:
+                self._record(started, e)
+            raise
+        with self._lock:
+            self._record(started)
+        return obj
+
+    def stats(self):
+        return {"state": self.state, "ready": self.state == "ready", "init_ms": self.init_ms,
+                "attempts": self.attempts, "error": self.error}
+
+
+class _Lazy:
+    """Stand-in for a component's object; see ComponentRegistry.lazy()."""
+
+    def __init__(self, component):
+        object.__setattr__(self, "_component", component)
+
+    def __getattr__(self, attr):
+        return getattr(self._component.get(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._component.get(), attr, value)
+
+
+class ComponentRegistry:
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, factory, retry_after=RETRY_AFTER, shared=True):
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                component = self._components[name] = Component(name, factory, retry_after, shared)
+            component.factory = factory
+            return component
+
+    def lazy(self, name, factory, retry_after=RETRY_AFTER):
+        """Object created by `factory` on first attribute access."""
+        return _Lazy(self.add(name, factory, retry_after))
+
+    def get(self, name):
+        return self._components[name].get()
+
+    def open(self, name, factory):
+        """factory(), timed and recorded under `name`; for devices whose owner reopens them."""
+        return self.add(name, factory, shared=False).open()
+
+    def warm(self, names=None):
+        """Create the idle lazy components now; returns the names that failed."""
+        failed = []
+        with self._lock:
+            components = [c for c in self._components.values() if names is None or c.name in names]
+        for component in components:
+            if not component.shared or component.state != "idle":
+                continue
+            try:
+                component.get()
+            except ComponentUnavailable:
+                failed.append(component.name)
+        return failed
+
+    def warm_async(self, names=None):
+        threading.Thread(target=self.warm, args=(names,), daemon=True, name="components-warm").start()
+
+    def stats(self):
+        with self._lock:
+            components = list(self._components.values())
+        return {c.name: c.stats() for c in components}
+
+    def health(self):
+        """Overall status: "degraded" while any component that was tried is unavailable, else "ok"."""
+        components = self.stats()
+        status = "degraded" if any(c["state"] == "failed" for c in components.values()) else "ok"
+        return {"status": status, "components": components}
+
+
+COMPONENTS = ComponentRegistry()
@@ -1,35 +1,74 @@
-import adafruit_dht
-import board
 from datetime import datetime
-from azure.data.tables import TableClient
-import threading
-from apscheduler.schedulers.background import BackgroundScheduler
 import time
-import serial
-
-dht_sensor = adafruit_dht.DHT22(board.D4)
+import os
+from row_keys import make_row_key
+from rollups import RollupWriter
+from telemetry_writer import TelemetryWriter
+from serial_reader import SerialReader
+from sampling import (PeriodicSampler, RateLimiter, RingBuffer, WindowAggregator, window_columns,
+                      window_entity, window_values)
+from column_store import ColumnStore
+from metrics import REGISTRY, instrument, serve, span
+from components import COMPONENTS, ComponentUnavailable
 
 TEMP_TABLE_SAS_URL = "key"
 LIGHT_TABLE_SAS_URL = "key"
+ROLLUP_TABLE_SAS_URL = "key"
 
-temp_table_client = TableClient.from_table_url(TEMP_TABLE_SAS_URL)
-light_table_client = TableClient.from_table_url(LIGHT_TABLE_SAS_URL)
+SPOOL_PATH = "data/enviroment_spool.db"
+
+# Per-sensor sampling rates (Hz). Azure gets one min/max/mean/std row per
+# AGGREGATE_WINDOW seconds whatever the rate; raw samples of the last
+# RAW_SECONDS stay in ring buffers the Flask app serves at /sensor/raw/<series>.
+DHT_SAMPLE_RATE = 0.5  # the DHT22 needs 2 s between reads
+LDR_SAMPLE_RATE = 5
+AGGREGATE_WINDOW = 60
+RAW_FOLDER = "data/raw"
+RAW_SECONDS = 6 * 3600
+# Window rows are also kept locally in columns the Flask app serves at /sensor/columns/<series>.
+COLUMN_FOLDER = "data/columns"
+# Prometheus metrics of this script (sensor reads, Azure calls, spool) and /health are served here.
+METRICS_PORT = 9101
+
+# The DHT22, the LDR port and the Azure clients are opened on first use; a
+# missing one shows up in /health instead of stopping the script.
+def open_dht():
+    import adafruit_dht
+    import board
+    return adafruit_dht.DHT22(board.D4)
+
+
+def open_table(url, name):
+    from azure.data.tables import TableClient
+    return instrument(TableClient.from_table_url(url), "azure_table", name)
 
-def get_ldr_value():
-    try:
-        arduino = serial.Serial('/dev/ttyUSB0', 9600, timeout=1)
-        time.sleep(1)
-        ldr_value = arduino.readline().decode('utf-8').strip()
-        arduino.close()
-        return int(ldr_value)
-    except Exception as e:
-        print(f"LDR read error: {e}")
-        return None
+
+dht_sensor = COMPONENTS.lazy("dht22", open_dht)
+temp_table_client = COMPONENTS.lazy("azure-table-temperature", lambda: open_table(TEMP_TABLE_SAS_URL, "temperature"))
+light_table_client = COMPONENTS.lazy("azure-table-light", lambda: open_table(LIGHT_TABLE_SAS_URL, "light"))
+rollup_table_client = COMPONENTS.lazy("azure-table-rollups", lambda: open_table(ROLLUP_TABLE_SAS_URL, "rollups"))
+
+# Spool, rollups, column store and raw buffers; opened by main().
+telemetry = None
+rollup_writer = None
+column_store = None
+raw_buffers = {}
+
+def raw_buffer(series, rate):
+    return RingBuffer(int(rate * RAW_SECONDS), os.path.join(RAW_FOLDER, f"{series}.ring"))
+
+def open_ldr_port():
+    def create():
+        import serial
+        with span("serial", "/dev/ttyUSB0", "open"):
+            return instrument(serial.Serial('/dev/ttyUSB0', 9600, timeout=1), "serial", "/dev/ttyUSB0")
+    return COMPONENTS.open("serial-/dev/ttyUSB0", create)
 
 def get_temperature_and_humidity():
     try:
-        temperature_c = dht_sensor.temperature
-        humidity = dht_sensor.humidity
+        with span("i2c", "dht22", "read"):
+            temperature_c = dht_sensor.temperature
+            humidity = dht_sensor.humidity
 
         if temperature_c is not None and humidity is not None:
             return {
@@ -39,57 +78,95 @@ def get_temperature_and_humidity():
         else:
             print("DHT sensor read failed: Received None value(s)")
             return {"temperature": None, "humidity": None}
-    except RuntimeError as e:
+    except (RuntimeError, ComponentUnavailable) as e:
         print(f"DHT sensor error: {e}")
         return {"temperature": None, "humidity": None}
 
-def log_environmental_data():
-    data = get_temperature_and_humidity()
-    ldr_value = get_ldr_value()
-    timestamp = datetime.utcnow().isoformat()
-    row_key = str(datetime.now().timestamp())
-
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Temp: {data['temperature']}Â°C, Humidity: {data['humidity']}%, LDR: {ldr_value}")
-
-    if data["temperature"] is not None and data["humidity"] is not None:
-        try:
-            temp_entity = {
-                "PartitionKey": "Enviroment",
-                "RowKey": row_key,
-                "Temperature": data["temperature"],
-                "Humidity": data["humidity"]
-            }
-            temp_table_client.create_entity(entity=temp_entity)
-        except Exception as e:
-            print(f"Azure Temp Table Insert Error: {e}")
-
-    if ldr_value is not None:
-        try:
-            light_entity = {
-                "PartitionKey": "LightLevel",
-                "RowKey": row_key,
-                "Light": ldr_value
-            }
-            light_table_client.create_entity(entity=light_entity)
-        except Exception as e:
-            print(f"Azure Light Table Insert Error: {e}")
+def log_temperature_window(stats):
+    temp = stats.fields.get("Temperature")
+    humidity = stats.fields.get("Humidity")
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Temp: {temp.mean:.1f}Â°C, "
+          f"Humidity: {humidity.mean:.1f}% over {temp.count} samples")
+    try:
+        temp_entity = window_entity("Enviroment", make_row_key(stats.start), stats)
+        telemetry.append("temperature", temp_entity)
+        rollup_writer.record("Enviroment", stats.start, {"Temperature": temp_entity["Temperature"],
+                                                         "Humidity": temp_entity["Humidity"]})
+        column_store.append("temperature", stats.start, window_values(stats))
+    except Exception as e:
+        print(f"Temp spool error: {e}")
+
+def log_light_window(stats):
+    light = stats.fields["Light"]
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] LDR: {light.mean:.0f} over {light.count} samples")
+    try:
+        light_entity = window_entity("LightLevel", make_row_key(stats.start), stats)
+        telemetry.append("light", light_entity)
+        rollup_writer.record("LightLevel", stats.start, {"Light": light_entity["Light"]})
+        column_store.append("light", stats.start, window_values(stats))
+    except Exception as e:
+        print(f"Light spool error: {e}")
+
+temperature_windows = WindowAggregator(log_temperature_window, ("Temperature", "Humidity"),
+                                       window=AGGREGATE_WINDOW)
+light_windows = WindowAggregator(log_light_window, ("Light",), window=AGGREGATE_WINDOW)
+
+def record_temperature(ts, data):
+    if data["temperature"] is None or data["humidity"] is None:
+        return
+    raw_buffers["temperature"].append(ts, data["temperature"])
+    raw_buffers["humidity"].append(ts, data["humidity"])
+    temperature_windows.add(ts, {"Temperature": data["temperature"], "Humidity": data["humidity"]})
 
-def log_environmental_data_async():
-    threading.Thread(target=log_environmental_data).start()
+# The Arduino streams faster than needed; keep LDR_SAMPLE_RATE readings per second.
+ldr_limiter = RateLimiter(LDR_SAMPLE_RATE)
 
-scheduler = BackgroundScheduler()
+def record_light(reading):
+    if ldr_limiter.ready(reading.taken_at):
+        raw_buffers["light"].append(reading.taken_at, reading.value)
+        light_windows.add(reading.taken_at, {"Light": reading.value})
 
-def schedule_jobs():
-    for job in scheduler.get_jobs():
-        job.remove()
-    scheduler.add_job(func=log_environmental_data_async, trigger="interval", seconds=60, max_instances=3)
+# The port stays open; the Arduino streams readings into the reader's buffer.
+ldr_reader = SerialReader(open_ldr_port, name="LDR", on_reading=record_light)
+dht_sampler = PeriodicSampler(get_temperature_and_humidity, DHT_SAMPLE_RATE, record_temperature, name="DHT")
+
+
+def main():
+    """Open the spool and buffers, start sampling and serve the metrics until interrupted."""
+    global telemetry, rollup_writer, column_store
+    os.makedirs(os.path.dirname(SPOOL_PATH), exist_ok=True)
+    telemetry = TelemetryWriter(SPOOL_PATH, {"temperature": temp_table_client,
+                                             "light": light_table_client,
+                                             "rollups": rollup_table_client})
+    telemetry.start()
+    rollup_writer = RollupWriter(rollup_table_client, spool=telemetry)
+    column_store = ColumnStore(COLUMN_FOLDER)
+    column_store.create("temperature", window_columns(["Temperature", "Humidity"]))
+    column_store.create("light", window_columns(["Light"]))
+    raw_buffers.update({
+        "temperature": raw_buffer("temperature", DHT_SAMPLE_RATE),
+        "humidity": raw_buffer("humidity", DHT_SAMPLE_RATE),
+        "light": raw_buffer("light", LDR_SAMPLE_RATE),
+    })
+
+    ldr_reader.start()
+    dht_sampler.start()
+
+    REGISTRY.register_stats("telemetry", telemetry.stats)
+    REGISTRY.register_stats("ldr", ldr_reader.stats)
+    REGISTRY.register_stats("columns", column_store.stats)
+    REGISTRY.register_stats("component", COMPONENTS.stats, label="component")
+    serve(METRICS_PORT, routes={"/health": COMPONENTS.health})
+    COMPONENTS.warm_async()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Program interrupted. Exiting...")
+        temperature_windows.flush()
+        light_windows.flush()
 
-if not scheduler.running:
-    schedule_jobs()
-    scheduler.start()
 
-try:
-    while True:
-        time.sleep(1)
-except KeyboardInterrupt:
-    print("Program interrupted. Exiting...")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+"""gunicorn settings for wsgi.py: `gunicorn -c gunicorn.conf.py wsgi:app`."""
+import os
+
+bind = "0.0.0.0:5071"
+workers = int(os.environ.get("WEB_WORKERS", min(4, os.cpu_count() or 1)))
+# Threads per worker; every open /stream holds one.
+worker_class = "gthread"
+threads = 16
+timeout = 60
+# Importing app.py is side-effect free, but wsgi.py then calls startup() and
+# elect_leader(). Preloaded, the master would take data/leader.lock and fork
+# the image-metrics pool and start threads none of the workers inherit.
+preload_app = False
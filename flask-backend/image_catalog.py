@@ -0,0 +1,244 @@
+"""Local index of the plant images in Blob Storage.
+
+Blob names look like `plant_<id>_<YYYYmmdd_HHMMSS>.jpg`. ImageCatalog keeps
+one SQLite row per image, indexed by (plant_id, taken_at), so /analytics
+pages through a plant's images with a keyset query whose cost does not
+depend on how many images exist. Rows are added when an upload finishes;
+reconcile() picks up blobs written by anything else:
+
+- until a first full listing of the container has finished, each call
+  continues it for up to `max_pages` pages from the saved continuation
+  token, so the initial import is resumable and never blocks for long;
+- after that, each call lists only the `plant_<id>_<day>` prefixes of the
+  days since the previous call (the persisted `reconciled_at` day, at most
+  RECONCILE_DAYS back), for every catalogued plant and every plant passed
+  in `plant_ids`;
+- every DISCOVERY_INTERVAL, a resumable listing of the `plant_` prefix
+  adds the blobs modified since the previous one. It finds plants that have
+  no catalogued image yet, late uploads to older days and whatever the
+  day cap skipped after a long outage.
+
+Each row also records which derivatives (thumbnail, preview) have been
+uploaded for it, as a bit mask over VARIANT_FLAGS. Only an original's own
+upload (or a listing) creates its row; a derivative that finishes first is
+remembered in memory and applied when the row is added.
+"""
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+BLOB_NAME = re.compile(r"plant_(\d+)_(\d{8}_\d{6})\.jpg$")
+PAGE_SIZE = 20
+LIST_PAGE_SIZE = 1000
+MAX_PAGES = 100
+VARIANT_FLAGS = {"thumb": 1, "preview": 2}
+# Day prefixes listed per plant and call, whatever the gap since the previous call.
+RECONCILE_DAYS = 7
+# Must stay below RECONCILE_DAYS days, so the discovery covers what the cap skips.
+DISCOVERY_INTERVAL = 24 * 3600
+# Allowance for clock skew between this host and Blob Storage's Last-Modified.
+CLOCK_SKEW = 3600
+
+
+def parse_blob_name(blob_name):
+    """Return (plant_id, taken_at) for an image blob name, or None."""
+    match = BLOB_NAME.match(blob_name)
+    if not match:
+        return None
+    return int(match.group(1)), match.group(2)
+
+
+class ImageCatalog:
+    def __init__(self, db_path):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " blob_name TEXT PRIMARY KEY, plant_id INTEGER NOT NULL,"
+            " taken_at TEXT NOT NULL, size INTEGER, variants INTEGER NOT NULL DEFAULT 0)")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(images)")]
+        if "variants" not in columns:
+            self._db.execute("ALTER TABLE images ADD COLUMN variants INTEGER NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS images_plant_time ON images (plant_id, taken_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        # Variant flags of originals that aren't catalogued yet.
+        self._early_variants = {}
+
+        self.blobs_listed = 0
+        self.list_pages = 0
+        self.discoveries = 0
+
+    def add(self, blob_name, size=None):
+        self.add_many([(blob_name, size)])
+
+    def add_many(self, blobs):
+        """Insert (blob_name, size) pairs; names that aren't plant images are ignored."""
+        rows = []
+        for blob_name, size in blobs:
+            parsed = parse_blob_name(blob_name)
+            if parsed:
+                rows.append((blob_name, parsed[0], parsed[1], size))
+        if rows:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT INTO images (blob_name, plant_id, taken_at, size) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (blob_name) DO UPDATE SET size = excluded.size", rows)
+                early = [(self._early_variants.pop(row[0]), row[0]) for row in rows
+                         if row[0] in self._early_variants]
+                if early:
+                    self._db.executemany(
+                        "UPDATE images SET variants = variants | ? WHERE blob_name = ?", early)
+                self._db.commit()
+        return len(rows)
+
+    def add_variant(self, blob_name, variant):
+        """Record that `variant` of the catalogued original `blob_name` has been uploaded."""
+        if not parse_blob_name(blob_name):
+            return
+        flag = VARIANT_FLAGS[variant]
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE images SET variants = variants | ? WHERE blob_name = ?", (flag, blob_name)).rowcount
+            self._db.commit()
+            if not updated:
+                # The variant finished uploading before its original; add_many() applies it.
+                self._early_variants[blob_name] = self._early_variants.get(blob_name, 0) | flag
+
+    def plants(self):
+        # One index seek per plant; SELECT DISTINCT would walk every row.
+        plant_ids = []
+        with self._lock:
+            while True:
+                plant_id = self._db.execute(
+                    "SELECT MIN(plant_id) FROM images WHERE plant_id > ?",
+                    (plant_ids[-1] if plant_ids else -1,)).fetchone()[0]
+                if plant_id is None:
+                    return plant_ids
+                plant_ids.append(plant_id)
+
+    def page(self, plant_id, start=None, end=None, before=None, limit=PAGE_SIZE):
+        """Newest-first images of one plant, optionally within [start, end].
+
+        `start`, `end` and `before` are `YYYYmmdd_HHMMSS` strings; pass the
+        returned cursor as `before` to get the next (older) page. Returns
+        (rows, cursor) where rows are (blob_name, taken_at, variants), variants
+        being the set of uploaded derivative names, and cursor is None on the
+        last page.
+        """
+        clauses = ["plant_id = ?"]
+        params = [plant_id]
+        if start:
+            clauses.append("taken_at >= ?")
+            params.append(start)
+        if end:
+            clauses.append("taken_at <= ?")
+            params.append(end)
+        if before:
+            clauses.append("taken_at < ?")
+            params.append(before)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT blob_name, taken_at, variants FROM images WHERE {' AND '.join(clauses)}"
+                " ORDER BY taken_at DESC LIMIT ?", params + [limit + 1]).fetchall()
+        rows = [(blob_name, taken_at, {name for name, flag in VARIANT_FLAGS.items() if variants & flag})
+                for blob_name, taken_at, variants in rows]
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1][1]
+        return rows, None
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def _state(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                             (key, value))
+            self._db.commit()
+
+    def _list(self, container_client, prefix, token=None, max_pages=None, state_key=None,
+              modified_since=None):
+        """Catalog blobs under `prefix`; returns the continuation token, or None when done.
+
+        The token is saved under `state_key` after every page; with
+        `modified_since` (epoch seconds) older blobs are skipped.
+        """
+        pager = container_client.list_blobs(name_starts_with=prefix,
+                                            results_per_page=LIST_PAGE_SIZE).by_page(continuation_token=token)
+        pages = 0
+        for page in pager:
+            listed = list(page)
+            self.add_many((blob.name, blob.size) for blob in listed
+                          if modified_since is None or blob.last_modified.timestamp() >= modified_since)
+            self.blobs_listed += len(listed)
+            self.list_pages += 1
+            pages += 1
+            token = pager.continuation_token
+            if state_key:
+                self._set_state(state_key, token or "")
+            if max_pages is not None and pages >= max_pages:
+                return token
+        return None
+
+    def reconcile(self, container_client, max_pages=MAX_PAGES, today=None, plant_ids=()):
+        """Bring the catalog in line with the container; returns True once fully synced.
+
+        `plant_ids` are plants whose recent days are listed even before any
+        of their images is catalogued.
+        """
+        today = today or datetime.now()
+        if self._state("full_scan_done") != "1":
+            token = self._state("full_scan_token") or None
+            if token is None:
+                self._set_state("full_scan_started", str(time.time()))
+            token = self._list(container_client, "plant_", token, max_pages, "full_scan_token")
+            if token:
+                return False
+            self._set_state("full_scan_done", "1")
+            self._set_state("reconciled_at", f"{today:%Y%m%d}")
+            self._set_state("discovered_at", self._state("full_scan_started") or "0")
+            return True
+
+        first = today - timedelta(days=RECONCILE_DAYS - 1)
+        reconciled_at = self._state("reconciled_at")
+        if reconciled_at:
+            first = max(first, datetime.strptime(reconciled_at, "%Y%m%d"))
+        for plant_id in sorted(set(self.plants()) | set(plant_ids)):
+            day = first
+            while day.date() <= today.date():
+                self._list(container_client, f"plant_{plant_id}_{day:%Y%m%d}")
+                day += timedelta(days=1)
+        self._set_state("reconciled_at", f"{today:%Y%m%d}")
+        return self._discover(container_client, max_pages)
+
+    def _discover(self, container_client, max_pages):
+        """Run or continue the listing of recently modified blobs if due; returns True when none is left."""
+        token = self._state("discovery_token") or None
+        if token is None:
+            now = time.time()
+            if now - float(self._state("discovered_at") or 0) < DISCOVERY_INTERVAL:
+                return True
+            self._set_state("discovery_started", str(now))
+        since = float(self._state("discovered_at") or 0) - CLOCK_SKEW
+        token = self._list(container_client, "plant_", token, max_pages, "discovery_token", since)
+        if token:
+            return False
+        self._set_state("discovered_at", self._state("discovery_started"))
+        self.discoveries += 1
+        return True
+
+    def stats(self):
+        return {"images": self.count(), "full_scan_done": self._state("full_scan_done") == "1",
+                "reconciled_at": self._state("reconciled_at"), "blobs_listed": self.blobs_listed,
+                "list_pages": self.list_pages, "discoveries": self.discoveries}
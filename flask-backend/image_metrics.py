@@ -0,0 +1,360 @@
+"""Plant health metrics of every uploaded image, computed in worker processes.
+
+compute_metrics() decodes one JPEG at reduced size and measures, on an
+ANALYSIS_WIDTH-wide copy:
+
+- coverage: fraction of green pixels (HSV hue 35-85, not too dark or grey)
+- canopy: area of the convex hull around all green pixels, as a fraction
+  of the frame (the plant's footprint, gaps between leaves included)
+- yellow: fraction of yellow pixels, an early sign of a wilting plant
+- hue / saturation / brightness: means over the green pixels, and
+  normalized H, S and V histograms of the whole frame
+- a 64x48 bit signature of the green mask
+
+It is CPU-bound, so MetricsPipeline runs it on a process pool started with
+start_pool(): capture and upload routes only hand over the JPEG bytes, and
+if `max_pending` images are already waiting new ones are skipped. The pool
+forks its workers when it is created, so call MetricsPipeline.start() from
+the application's startup, before it starts any threads (not at import, so
+importing the app doesn't fork). If a worker dies (e.g. the OOM killer),
+the pool is broken; the pipeline then starts a new one and carries on. If
+the process that forked the pool is killed, its workers exit by themselves.
+
+ImageMetricsStore keeps one row per image in the catalog database, indexed
+by (plant_id, taken_at) like the catalog itself. When a row is added, its
+growth (coverage change) and change (1 - overlap of the green masks) are
+computed against the previous image of the plant, and the next image's are
+updated, so out-of-order inserts from a backfill still link up.
+backfill() runs the same computation over images catalogued before the
+pipeline existed.
+"""
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+from image_catalog import VARIANT_FLAGS, parse_blob_name
+from thumbnails import variant_name
+
+WORKERS = 2
+MAX_PENDING = 10
+ANALYSIS_WIDTH = 320
+SIGNATURE_SIZE = (64, 48)
+GREEN = ((35, 40, 40), (85, 255, 255))
+YELLOW = ((20, 60, 60), (34, 255, 255))
+HISTOGRAM_BINS = {"h": (0, 18, 180), "s": (1, 8, 256), "v": (2, 8, 256)}
+SERIES_LIMIT = 2000
+BATCH_SIZE = 32
+DOWNLOAD_WORKERS = 4
+REPORT_INTERVAL = 5.0
+# How often a pool worker checks that the process that forked it is still alive.
+PARENT_CHECK_INTERVAL = 1.0
+METRICS = ("coverage", "canopy", "yellow", "hue", "saturation", "brightness", "growth", "change")
+
+
+def _init_worker(parent_pid):
+    # One OpenCV thread per worker process; the pool is the parallelism.
+    cv2.setNumThreads(1)
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), daemon=True).start()
+
+
+def _exit_with_parent(parent_pid):
+    # A killed parent (gunicorn's SIGKILL on timeout) can't shut the pool down, and
+    # each worker holds the others' end of the call queue open, so none sees EOF.
+    while os.getppid() == parent_pid:
+        time.sleep(PARENT_CHECK_INTERVAL)
+    os._exit(0)
+
+
+def start_pool(workers=WORKERS):
+    """Process pool for compute_metrics() with its workers already forked."""
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                               initializer=_init_worker, initargs=(os.getpid(),))
+    pool.submit(os.getpid).result()
+    return pool
+
+
+def compute_metrics(data):
+    """Metrics of one JPEG image (see the module docstring); raises ValueError if it can't be decoded."""
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+    if frame is None:
+        raise ValueError("not a decodable image")
+    height, width = frame.shape[:2]
+    if width > ANALYSIS_WIDTH:
+        frame = cv2.resize(frame, (ANALYSIS_WIDTH, round(height * ANALYSIS_WIDTH / width)),
+                           interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    pixels = hsv.shape[0] * hsv.shape[1]
+
+    green = cv2.morphologyEx(cv2.inRange(hsv, *GREEN), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    yellow = cv2.inRange(hsv, *YELLOW)
+    green_pixels = cv2.countNonZero(green)
+    points = cv2.findNonZero(green)
+    canopy = 0.0
+    if points is not None and len(points) >= 3:
+        canopy = cv2.contourArea(cv2.convexHull(points)) / pixels
+    means = cv2.mean(hsv, mask=green) if green_pixels else (None, None, None)
+
+    histogram = {}
+    for name, (channel, bins, top) in HISTOGRAM_BINS.items():
+        counts = cv2.calcHist([hsv], [channel], None, [bins], [0, top]).ravel()
+        histogram[name] = [round(float(c), 4) for c in counts / pixels]
+    signature = cv2.resize(green, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA) > 127
+
+    return {
+        "coverage": round(green_pixels / pixels, 4),
+        "canopy": round(canopy, 4),
+        "yellow": round(cv2.countNonZero(yellow) / pixels, 4),
+        "hue": round(means[0], 1) if green_pixels else None,
+        "saturation": round(means[1], 1) if green_pixels else None,
+        "brightness": round(means[2], 1) if green_pixels else None,
+        "histogram": histogram,
+        "signature": np.packbits(signature).tobytes(),
+    }
+
+
+def mask_change(a, b):
+    """1 - intersection/union of two signatures: 0 for the same green area, 1 for disjoint ones."""
+    a = np.unpackbits(np.frombuffer(a, np.uint8)).astype(bool)
+    b = np.unpackbits(np.frombuffer(b, np.uint8)).astype(bool)
+    union = np.count_nonzero(a | b)
+    return round(1 - np.count_nonzero(a & b) / union, 4) if union else 0.0
+
+
+class ImageMetricsStore:
+    def __init__(self, db_path):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS image_metrics ("
+            " blob_name TEXT PRIMARY KEY, plant_id INTEGER NOT NULL, taken_at TEXT NOT NULL,"
+            " coverage REAL, canopy REAL, yellow REAL, hue REAL, saturation REAL, brightness REAL,"
+            " histogram TEXT, signature BLOB, growth REAL, change REAL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS image_metrics_plant_time ON image_metrics (plant_id, taken_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def _neighbour(self, plant_id, taken_at, older):
+        op, order = ("<", "DESC") if older else (">", "ASC")
+        return self._db.execute(
+            f"SELECT blob_name, coverage, signature FROM image_metrics"
+            f" WHERE plant_id = ? AND taken_at {op} ? ORDER BY taken_at {order} LIMIT 1",
+            (plant_id, taken_at)).fetchone()
+
+    def add(self, blob_name, metrics):
+        """Store the metrics of `blob_name` and link it to the plant's previous and next image."""
+        parsed = parse_blob_name(blob_name)
+        if not parsed:
+            return
+        plant_id, taken_at = parsed
+        with self._lock:
+            previous = self._neighbour(plant_id, taken_at, older=True)
+            following = self._neighbour(plant_id, taken_at, older=False)
+            growth = change = None
+            if previous:
+                growth = round(metrics["coverage"] - previous[1], 4)
+                change = mask_change(previous[2], metrics["signature"])
+            self._db.execute(
+                "INSERT OR REPLACE INTO image_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (blob_name, plant_id, taken_at, metrics["coverage"], metrics["canopy"], metrics["yellow"],
+                 metrics["hue"], metrics["saturation"], metrics["brightness"],
+                 json.dumps(metrics["histogram"]), metrics["signature"], growth, change))
+            if following:
+                self._db.execute(
+                    "UPDATE image_metrics SET growth = ?, change = ? WHERE blob_name = ?",
+                    (round(following[1] - metrics["coverage"], 4),
+                     mask_change(metrics["signature"], following[2]), following[0]))
+            self._db.commit()
+
+    def series(self, plant_id, start=None, end=None, limit=SERIES_LIMIT):
+        """{"time": [...], metric: [...]} of one plant, oldest first; the newest `limit` images in [start, end]."""
+        clauses = ["plant_id = ?"]
+        params = [plant_id]
+        if start:
+            clauses.append("taken_at >= ?")
+            params.append(start)
+        if end:
+            clauses.append("taken_at <= ?")
+            params.append(end)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT taken_at, {', '.join(METRICS)} FROM image_metrics WHERE {' AND '.join(clauses)}"
+                " ORDER BY taken_at DESC LIMIT ?", params + [limit]).fetchall()
+        rows.reverse()
+        series = {"time": [row[0] for row in rows]}
+        for i, name in enumerate(METRICS, start=1):
+            series[name] = [row[i] for row in rows]
+        return series
+
+    def latest_histogram(self, plant_id):
+        """H/S/V histograms of the plant's newest analysed image, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT histogram FROM image_metrics WHERE plant_id = ? ORDER BY taken_at DESC LIMIT 1",
+                (plant_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def missing(self, after="", limit=BATCH_SIZE):
+        """Catalogued images without metrics, by name after `after`: [(blob_name, variants)]."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT i.blob_name, i.variants FROM images i LEFT JOIN image_metrics m USING (blob_name)"
+                " WHERE m.blob_name IS NULL AND i.blob_name > ? ORDER BY i.blob_name LIMIT ?",
+                (after, limit)).fetchall()
+        return [(blob_name, {name for name, flag in VARIANT_FLAGS.items() if variants & flag})
+                for blob_name, variants in rows]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM image_metrics").fetchone()[0]
+
+    def count_missing(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM images i LEFT JOIN image_metrics m USING (blob_name)"
+                " WHERE m.blob_name IS NULL").fetchone()[0]
+
+
+class MetricsPipeline:
+    """Hands images to compute_metrics() on `pool` (None: see start()) and stores the results in `store`."""
+
+    def __init__(self, pool, store, max_pending=MAX_PENDING, workers=WORKERS):
+        self.pool = pool
+        self.store = store
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        self.analyzed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.pool_restarts = 0
+
+    def start(self):
+        """Fork the pool now, while the process has no other threads."""
+        self._pool()
+
+    def _pool(self, broken=None):
+        # Started here only if start() wasn't called, or to replace a broken pool.
+        with self._lock:
+            if broken is not None and self.pool is broken:
+                broken.shutdown(wait=False)
+                self.pool = None
+                self.pool_restarts += 1
+                print("Image metrics pool broken, starting a new one")
+            if self.pool is None:
+                self.pool = start_pool(self.workers)
+            return self.pool
+
+    def submit(self, blob_name, data):
+        """Queue `blob_name`; returns False if the pool is saturated or can't take it."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            print(f"Image metrics queue full, skipping {blob_name}")
+            return False
+        with self._lock:
+            self._pending += 1
+        pool = self._pool()
+        try:
+            try:
+                future = pool.submit(compute_metrics, data)
+            except BrokenProcessPool:
+                future = self._pool(broken=pool).submit(compute_metrics, data)
+        except Exception as e:
+            self._finish(failed=True)
+            print(f"Error queueing image metrics for {blob_name}: {e}")
+            return False
+        future.add_done_callback(lambda done: self._done(blob_name, done))
+        return True
+
+    def _done(self, blob_name, future):
+        try:
+            self.store.add(blob_name, future.result())
+        except Exception as e:
+            self._finish(failed=True)
+            print(f"Error computing image metrics for {blob_name}: {e}")
+        else:
+            self._finish(failed=False)
+
+    def _finish(self, failed):
+        # Runs on request threads and on the pool's callback thread.
+        with self._lock:
+            self._pending -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.analyzed += 1
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
+
+    def stats(self):
+        images = self.store.count()
+        with self._lock:
+            return {"images": images, "analyzed": self.analyzed, "failed": self.failed,
+                    "skipped": self.skipped, "pending": self._pending, "pool_restarts": self.pool_restarts}
+
+
+def backfill(store, download, pool, batch_size=BATCH_SIZE, download_workers=DOWNLOAD_WORKERS,
+             limit=None, report=print):
+    """Compute metrics for catalogued images that have none; returns (done, failed, seconds).
+
+    `download(blob_name)` returns the bytes to analyse; each image's preview
+    is fetched instead of the original when it has one. Batches of
+    `batch_size` are downloaded on `download_workers` threads, and every
+    image goes to the process pool as soon as it has arrived.
+    """
+    started = time.monotonic()
+    last_report = started
+    total = store.count_missing()
+    if limit is not None:
+        total = min(total, limit)
+    done = failed = 0
+    after = ""
+
+    def fetch(blob_name, variants):
+        return download(variant_name(blob_name, "preview") if "preview" in variants else blob_name)
+
+    with ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="backfill") as downloads:
+        while done + failed < total:
+            batch = store.missing(after, min(batch_size, total - done - failed))
+            if not batch:
+                break
+            after = batch[-1][0]
+            fetched = {downloads.submit(fetch, *row): row[0] for row in batch}
+            computing = {}
+            for future in as_completed(fetched):
+                try:
+                    computing[pool.submit(compute_metrics, future.result())] = fetched[future]
+                except Exception as e:
+                    failed += 1
+                    print(f"Error downloading {fetched[future]}: {e}")
+            for future in as_completed(computing):
+                try:
+                    store.add(computing[future], future.result())
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"Error computing image metrics for {computing[future]}: {e}")
+
+            now = time.monotonic()
+            if now - last_report >= REPORT_INTERVAL or done + failed >= total:
+                rate = (done + failed) / (now - started)
+                remaining = (total - done - failed) / rate if rate else 0
+                report(f"{done + failed}/{total} images, {failed} failed, {rate:.1f}/s, "
+                       f"~{remaining:.0f} s left")
+                last_report = now
+    return done, failed, time.monotonic() - started
@@ -0,0 +1,87 @@
+"""In-memory store for the latest encoded image of each plant.
+
+Captures are JPEG-encoded once into an immutable bytes object; the same
+object is uploaded to Blob Storage and kept here for `/temp_images/<name>`,
+so nothing is copied or reread from disk on the hot path. Writing the file
+to disk is optional and happens on a background thread; if several captures
+land before a write runs, only the newest one is written.
+
+With a folder, the file is what all web workers share: it is replaced
+atomically and stamped with the capture time, a write never replaces a
+newer image, and get() drops this process's copy once another worker has
+written a newer one, so the caller serves the file instead. Several
+workers therefore need a folder.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+StoredImage = namedtuple("StoredImage", "data etag updated_at")
+
+
+class LatestImageStore:
+    def __init__(self, folder=None):
+        self.folder = folder
+        self._images = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._disk = ThreadPoolExecutor(max_workers=1) if folder else None
+
+        self.disk_writes = 0
+        self.bytes_written = 0
+
+    def put(self, filename, data):
+        with self._lock:
+            updated_at = time.time_ns()
+            self._images[filename] = StoredImage(data, f"{updated_at}-{len(data)}", updated_at)
+            if self._disk is not None:
+                scheduled = filename in self._pending
+                self._pending[filename] = data
+                if not scheduled:
+                    self._disk.submit(self._write, filename)
+
+    def get(self, filename):
+        """The newest image, or None if there is none here or another worker wrote a newer file."""
+        with self._lock:
+            image = self._images.get(filename)
+        if image is None or self.folder is None:
+            return image
+        try:
+            newer = os.stat(os.path.join(self.folder, filename)).st_mtime_ns > image.updated_at
+        except OSError:
+            newer = False
+        if newer:
+            with self._lock:
+                if self._images.get(filename) is image:
+                    del self._images[filename]
+            return None
+        return image
+
+    def close(self):
+        """Wait for pending disk writes."""
+        if self._disk is not None:
+            self._disk.shutdown(wait=True)
+
+    def _write(self, filename):
+        with self._lock:
+            data = self._pending.pop(filename)
+            image = self._images.get(filename)
+        if image is None:
+            return
+        updated_at = image.updated_at
+        path = os.path.join(self.folder, filename)
+        try:
+            if os.path.exists(path) and os.stat(path).st_mtime_ns > updated_at:
+                return
+            # Per process, so two workers writing at once don't share a temp file.
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.utime(tmp_path, ns=(updated_at, updated_at))
+            os.replace(tmp_path, path)
+            self.disk_writes += 1
+            self.bytes_written += len(data)
+        except OSError as e:
+            print(f"Error saving {filename}: {e}")
@@ -0,0 +1,95 @@
+"""Leader election between the web workers of one hub.
+
+Under gunicorn every worker imports app.py, but the sensors, cameras,
+telemetry shipping and scheduled jobs must run exactly once: two workers
+sharing the I2C bus or a camera corrupt each other's reads, and two
+schedulers capture and write every row twice. Workers therefore race for
+an exclusive flock() on one lock file. The winner runs `on_elected` (app.py
+starts the hardware and serves the hardware routes to the other workers on
+a localhost port); the others keep serving requests and retry every
+`retry` seconds. The kernel drops the lock when the leader's process dies,
+however it dies, so another worker takes over within one retry.
+"""
+import fcntl
+import os
+import threading
+import time
+
+LOCK_PATH = os.path.join("data", "leader.lock")
+RETRY = 5.0
+
+
+class Leadership:
+    def __init__(self, on_elected, path=LOCK_PATH, retry=RETRY):
+        self.on_elected = on_elected
+        self.path = path
+        self.retry = retry
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.elected_at = None
+        self.attempts = 0
+
+    @property
+    def is_leader(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        """Take the lock if it is free; returns True if this process is (now) the leader."""
+        if self._file is not None:
+            return True
+        self.attempts += 1
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lock_file = open(self.path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        self.elected_at = time.time()
+        print(f"[LEADER] Worker {os.getpid()} owns the hardware and the scheduled jobs")
+        self.on_elected()
+        return True
+
+    def start(self):
+        """Try now; if another worker leads, keep trying in the background."""
+        if self.try_acquire() or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="leader-election")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.retry):
+            if self.try_acquire():
+                return
+
+    def leader_pid(self):
+        """Pid written by the current leader, or None."""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def stats(self):
+        return {"pid": os.getpid(), "leader": self.is_leader, "leader_pid": self.leader_pid(),
+                "elected_at": self.elected_at, "attempts": self.attempts}
+
+
+def serve(app, port, host="127.0.0.1"):
+    """Serve the WSGI `app` on `port` from a daemon thread; the leader's channel for the other workers."""
+    from werkzeug.serving import make_server
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True, name="leader-server").start()
+    return server
@@ -0,0 +1,128 @@
+"""Server-Sent Events fan-out for live sensor readings.
+
+Broadcaster.publish() serializes an event once and drops the same bytes
+into every connected client's queue, so the work per reading is one JSON
+encode plus a queue put per client, whatever the number of dashboards.
+Each /stream response is a Broadcaster.stream() generator that waits on
+its own queue; new clients immediately get the last value of every event.
+A client that stops reading loses its oldest queued events rather than
+growing memory without limit.
+
+ChangePoller is the shared producer for readings that come from another
+process (e.g. enviroment.py via Azure): one thread calls each source every
+`interval` seconds and publishes only values that changed.
+"""
+import json
+import queue
+import threading
+
+CLIENT_QUEUE_SIZE = 50
+HEARTBEAT = 15.0
+POLL_INTERVAL = 5.0
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class Broadcaster:
+    def __init__(self, queue_size=CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._clients = set()
+        self._last = {}
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event, data):
+        payload = format_event(event, data)
+        with self._lock:
+            self._last[event] = payload
+            clients = list(self._clients)
+            self.published += 1
+        for client in clients:
+            self._put(client, payload)
+
+    def _put(self, client, payload):
+        while True:
+            try:
+                client.put_nowait(payload)
+                return
+            except queue.Full:
+                try:
+                    client.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def subscribe(self):
+        client = queue.Queue(self.queue_size)
+        with self._lock:
+            for payload in self._last.values():
+                client.put_nowait(payload)
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def stream(self, heartbeat=HEARTBEAT):
+        """Generator of SSE chunks for one client; comments keep idle connections open."""
+        client = self.subscribe()
+        try:
+            # Tell EventSource to reconnect after 3 s if the connection drops.
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    yield client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(client)
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._clients), "published": self.published,
+                    "dropped": self.dropped}
+
+
+class ChangePoller:
+    def __init__(self, broadcaster, sources, interval=POLL_INTERVAL):
+        """`sources` maps event names to callables returning JSON-serializable data, or None to skip a round."""
+        self.broadcaster = broadcaster
+        self.sources = sources
+        self.interval = interval
+        self._last = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        for event, source in self.sources.items():
+            try:
+                data = source()
+            except Exception as e:
+                print(f"Error polling {event} for the live stream: {e}")
+                continue
+            if data is None:
+                continue
+            if data != self._last.get(event):
+                self._last[event] = data
+                self.broadcaster.publish(event, data)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
@@ -0,0 +1,401 @@
+"""Prometheus-style metrics and per-request tracing, without dependencies.
+
+Counters and histograms live in one process-wide Registry and are rendered
+in the Prometheus text format by render() (served at /metrics by the Flask
+apps, and by serve() for plain scripts). Existing `stats()` methods are
+exported as gauges with register_stats(), so every component's counters
+show up without being rewritten.
+
+Upstream calls are measured with span(kind, target, op), or by wrapping a
+client in instrument(): every method call on the wrapper (and on clients
+it hands out, e.g. get_blob_client()) is timed into
+`upstream_call_seconds{kind,target,op}`; errors count into
+`upstream_call_errors_total`, paged Azure results count the entities they
+yield into `upstream_items_total` and bytes passed to upload calls into
+`upstream_bytes_total`.
+
+install(app) times every Flask request into `http_request_seconds` and
+traces it: spans recorded while the request runs (also on pools fed
+through propagate()) are returned in a Server-Timing header, so the
+browser's network panel shows which upstream calls a slow request waited
+on, and requests slower than SLOW_REQUEST are kept for /metrics/traces.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST = 1.0
+SLOW_TRACES = 50
+MAX_SPANS = 200
+
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.label_names), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # key -> [count per bucket (+Inf last), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self._values.get(tuple(labels.get(name, "") for name in self.label_names))
+        return entry[2] if entry else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            entries = sorted((key, (list(counts), total, count))
+                             for key, (counts, total, count) in self._values.items())
+        names = self.label_names + ("le",)
+        for key, (counts, total, count) in entries:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._stats = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def register_stats(self, prefix, stats, label=None):
+        """Export the numbers in `stats()` as gauges `<prefix>_<key>`.
+
+        If `stats()` returns a dict of dicts (e.g. per plant or per peer),
+        pass `label` to name the outer key.
+        """
+        with self._lock:
+            self._stats.append((prefix, stats, label))
+
+    def _render_stats(self, prefix, stats, label):
+        try:
+            values = stats()
+        except Exception as e:
+            return [f"# {prefix}: stats unavailable ({e})"]
+        rows = [((), values)] if label is None else [(((label, outer),), inner) for outer, inner in values.items()]
+        gauges = {}
+        for labels, row in rows:
+            for key, value in (row or {}).items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(f"{prefix}_{key}", []).append((labels, value))
+        lines = []
+        for name, samples in gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels([n for n, _ in labels], [v for _, v in labels])} {value}")
+        return lines
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            stats = list(self._stats)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        for prefix, source, label in stats:
+            lines += self._render_stats(prefix, source, label)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+upstream_seconds = REGISTRY.histogram("upstream_call_seconds", "Duration of calls to Azure, sensors, cameras "
+                                      "and other nodes", ("kind", "target", "op"))
+upstream_errors = REGISTRY.counter("upstream_call_errors_total", "Upstream calls that raised",
+                                   ("kind", "target", "op"))
+upstream_items = REGISTRY.counter("upstream_items_total", "Entities or blobs returned by paged calls",
+                                  ("kind", "target", "op"))
+upstream_bytes = REGISTRY.counter("upstream_bytes_total", "Bytes sent by upload calls", ("kind", "target", "op"))
+request_seconds = REGISTRY.histogram("http_request_seconds", "Flask request duration",
+                                     ("method", "route", "status"))
+job_seconds = REGISTRY.histogram("job_seconds", "Scheduled job run time", ("job",))
+job_skipped = REGISTRY.counter("job_skipped_total", "Job runs skipped because the previous one was still "
+                               "running", ("job",))
+job_errors = REGISTRY.counter("job_errors_total", "Job runs that raised", ("job",))
+slow_traces = deque(maxlen=SLOW_TRACES)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def _record(kind, target, op, seconds, error=None, items=None):
+    upstream_seconds.observe(seconds, kind=kind, target=target, op=op)
+    if error is not None:
+        upstream_errors.inc(kind=kind, target=target, op=op)
+    if items:
+        upstream_items.inc(items, kind=kind, target=target, op=op)
+    spans = _trace.get()
+    if spans is not None and len(spans) < MAX_SPANS:
+        spans.append({"kind": kind, "target": target, "op": op, "ms": round(seconds * 1000, 2),
+                      "items": items, "error": None if error is None else repr(error)})
+
+
+@contextmanager
+def span(kind, target, op):
+    """Time the enclosed upstream call."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        _record(kind, target, op, time.perf_counter() - started, e)
+        raise
+    _record(kind, target, op, time.perf_counter() - started)
+
+
+@contextmanager
+def trace():
+    """Collect the spans recorded in the enclosed block (and on pools fed through propagate())."""
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def propagate(call):
+    """`call` bound to the current trace, for handing to a thread pool."""
+    return functools.partial(contextvars.copy_context().run, call)
+
+
+class _Instrumented:
+    """Times every method call of the wrapped object; see instrument()."""
+
+    def __init__(self, target, kind, name):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_kind", kind)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+        kind, name = self._kind, self._name
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = value(*args, **kwargs)
+            except Exception as e:
+                _record(kind, name, attr, time.perf_counter() - started, e)
+                raise
+            # Handing out sub-clients and pagers does no I/O; their calls and pages are measured instead.
+            if attr.startswith("get_") and attr.endswith("_client"):
+                return _Instrumented(result, kind, name)
+            if hasattr(result, "by_page"):
+                return _Paged(result, kind, name, attr)
+            _record(kind, name, attr, time.perf_counter() - started)
+            if args and isinstance(args[0], (bytes, bytearray, memoryview)):
+                upstream_bytes.inc(len(args[0]), kind=kind, target=name, op=attr)
+            return result
+        # Cached on the proxy, so later lookups skip __getattr__ and this closure is built once.
+        self.__dict__[attr] = call
+        return call
+
+    def __setattr__(self, attr, value):
+        setattr(self._target, attr, value)
+
+
+class _Paged:
+    """Azure ItemPaged: times each page fetch and counts the items it yields."""
+
+    def __init__(self, paged, kind, name, op):
+        self._paged, self._kind, self._name, self._op = paged, kind, name, op
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, *args, **kwargs):
+        return _Pages(self._paged.by_page(*args, **kwargs), self._kind, self._name, self._op)
+
+
+class _Pages:
+    def __init__(self, pages, kind, name, op):
+        self._pages, self._kind, self._name, self._op = pages, kind, name, op
+
+    def __getattr__(self, attr):
+        # continuation_token changes as pages are consumed.
+        return getattr(self._pages, attr)
+
+    def __iter__(self):
+        pages = iter(self._pages)
+        while True:
+            started = time.perf_counter()
+            try:
+                page = list(next(pages))
+            except StopIteration:
+                return
+            except Exception as e:
+                _record(self._kind, self._name, self._op, time.perf_counter() - started, e)
+                raise
+            _record(self._kind, self._name, self._op, time.perf_counter() - started, items=len(page))
+            yield page
+
+
+def instrument(target, kind, name):
+    """Wrap a client, driver or port so every method call is measured as (kind, name, method)."""
+    return _Instrumented(target, kind, name)
+
+
+def timed_job(name):
+    """Decorator for scheduled jobs: run time into job_seconds, errors into job_errors_total."""
+    def decorate(job):
+        @functools.wraps(job)
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return job(*args, **kwargs)
+            except Exception:
+                job_errors.inc(job=name)
+                raise
+            finally:
+                job_seconds.observe(time.perf_counter() - started, job=name)
+        return run
+    return decorate
+
+
+def install(app):
+    """Time and trace every request of the Flask `app`."""
+    from flask import g, request
+
+    @app.before_request
+    def start_trace():
+        g.metrics_started = time.perf_counter()
+        g.metrics_token = _trace.set([])
+
+    @app.after_request
+    def finish_trace(response):
+        started = g.pop("metrics_started", None)
+        spans = _trace.get()
+        if started is None or spans is None:
+            return response
+        seconds = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_seconds.observe(seconds, method=request.method, route=route, status=response.status_code)
+        totals = {}
+        for s in spans:
+            key = f"{s['kind']}-{s['op']}"
+            count, ms = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, ms + s["ms"])
+        timing = [f'{key};desc="{count} calls";dur={ms:.1f}' for key, (count, ms) in totals.items()]
+        timing.append(f"total;dur={seconds * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(timing)
+        if seconds >= SLOW_REQUEST:
+            slow_traces.append({"at": time.time(), "method": request.method, "path": request.full_path,
+                                "status": response.status_code, "ms": round(seconds * 1000, 1),
+                                "spans": list(spans)})
+        return response
+
+    @app.teardown_request
+    def end_trace(error=None):
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            _trace.reset(token)
+
+
+def serve(port, host="0.0.0.0", routes=None):
+    """Serve /metrics on `port` from a daemon thread, for scripts without a web app.
+
+    `routes` maps further paths to callables whose result is served as JSON (e.g. /health).
+    """
+    routes = routes or {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path in routes:
+                body, content_type = json.dumps(routes[path]()).encode(), "application/json"
+            elif path.startswith("/metrics"):
+                body, content_type = render().encode(), CONTENT_TYPE
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
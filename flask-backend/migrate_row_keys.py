@@ -0,0 +1,88 @@
+"""Rewrite a sensor table from `str(timestamp)` RowKeys to the inverted layout.
+
+Each legacy row is copied under its new key and deleted in the same
+entity-group transaction, so the table never holds a half-moved row. The
+command only visits rows still on the old layout, which makes it safe to
+interrupt and simply run again to resume.
+
+    python migrate_row_keys.py "<table SAS URL>" [--batch-size 50] [--dry-run]
+"""
+import argparse
+import time
+
+from row_keys import LEGACY_KEY_CEILING, is_legacy_key, make_row_key, row_key_ts
+from table_query import iter_entities
+
+# A transaction holds at most 100 operations: one upsert and one delete per row.
+MAX_BATCH_ROWS = 50
+REPORT_INTERVAL = 5.0
+
+
+def migrated_entity(entity):
+    moved = dict(entity)
+    moved["RowKey"] = make_row_key(row_key_ts(entity["RowKey"]))
+    return moved
+
+
+def legacy_batches(table_client, batch_size):
+    """Yield lists of legacy entities that share a partition."""
+    batch = []
+    for entity in iter_entities(table_client, high_key=LEGACY_KEY_CEILING, high_inclusive=False):
+        if not is_legacy_key(entity["RowKey"]):
+            continue
+        if batch and (len(batch) >= batch_size
+                      or batch[0]["PartitionKey"] != entity["PartitionKey"]):
+            yield batch
+            batch = []
+        batch.append(entity)
+    if batch:
+        yield batch
+
+
+def migrate_table(table_client, batch_size=MAX_BATCH_ROWS, dry_run=False):
+    """Migrate every legacy row; returns (rows_moved, seconds)."""
+    batch_size = max(1, min(batch_size, MAX_BATCH_ROWS))
+    started = time.monotonic()
+    moved = 0
+    last_report = started
+    for batch in legacy_batches(table_client, batch_size):
+        operations = []
+        for entity in batch:
+            operations.append(("upsert", migrated_entity(entity)))
+            operations.append(("delete", {"PartitionKey": entity["PartitionKey"],
+                                          "RowKey": entity["RowKey"]}))
+        if not dry_run:
+            table_client.submit_transaction(operations)
+        moved += len(batch)
+        now = time.monotonic()
+        if now - last_report >= REPORT_INTERVAL:
+            last_report = now
+            elapsed = now - started
+            print(f"[MIGRATE] {moved} rows, {moved / elapsed:.0f} rows/s, "
+                  f"last partition {batch[0]['PartitionKey']}")
+    return moved, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move a sensor table to inverted RowKeys.")
+    parser.add_argument("table_url", help="SAS URL of the table to migrate")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_ROWS,
+                        help=f"rows per transaction (max {MAX_BATCH_ROWS})")
+    parser.add_argument("--dry-run", action="store_true", help="count rows without writing")
+    args = parser.parse_args()
+
+    from azure.data.tables import TableClient
+    table_client = TableClient.from_table_url(args.table_url)
+
+    try:
+        moved, elapsed = migrate_table(table_client, args.batch_size, args.dry_run)
+    except KeyboardInterrupt:
+        print("[MIGRATE] Interrupted; run the command again to resume.")
+        return
+    rate = moved / elapsed if elapsed else 0.0
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"[MIGRATE] {verb} {moved} rows in {elapsed:.1f}s ({rate:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
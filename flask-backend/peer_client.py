@@ -0,0 +1,199 @@
+"""Shared HTTP client for Pi-to-Pi calls (hub <-> node agents).
+
+PeerClient sends every request through one pooled session, so calls to
+the same Pi reuse keep-alive connections instead of opening a TCP
+connection each time. Each peer (scheme://host:port) gets its own
+CircuitBreaker: after `failures` consecutive errors or 5xx answers the
+peer is skipped for `reset_after` seconds (calls raise PeerUnavailable at
+once, so callers fall back instead of blocking a Flask worker), then a
+single probe request decides whether it closes again.
+
+Idempotent calls can be hedged: if the first attempt has not answered
+after `hedge_after` seconds a second identical request is sent and
+whichever answers first wins, which cuts the tail latency of a Pi that
+is briefly busy (an SD-card flush, a camera warm-up).
+
+`session` is anything with requests.Session's `request(method, url,
+timeout=..., **kwargs)`; by default a requests.Session with a pool of
+`pool_size` connections per peer.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
+
+from metrics import span
+
+TIMEOUT = 5.0
+HEDGE_AFTER = 0.5
+POOL_SIZE = 16
+FAILURES = 5
+RESET_AFTER = 30.0
+
+
+class PeerUnavailable(ConnectionError):
+    """The peer's circuit is open; the request was not sent."""
+
+
+def default_session(pool_size=POOL_SIZE):
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class CircuitBreaker:
+    def __init__(self, failures=FAILURES, reset_after=RESET_AFTER):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.opens = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def retry_in(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        """True if a request may be sent; once open, lets one probe through per `reset_after`."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._consecutive = 0
+                self._opened_at = None
+                return
+            self._consecutive += 1
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                if self._opened_at is None:
+                    self.opens += 1
+                self._opened_at = time.monotonic()
+
+
+class _Peer:
+    def __init__(self, name, breaker):
+        self.name = name
+        self.breaker = breaker
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.latency_total = 0.0
+
+    def stats(self):
+        answered = self.requests - self.failures
+        return {"state": self.breaker.state, "requests": self.requests, "failures": self.failures,
+                "rejected": self.rejected, "hedges": self.hedges, "opens": self.breaker.opens,
+                "avg_ms": round(self.latency_total / answered * 1000, 1) if answered else None}
+
+
+class PeerClient:
+    def __init__(self, session=None, timeout=TIMEOUT, hedge_after=HEDGE_AFTER, pool_size=POOL_SIZE,
+                 failures=FAILURES, reset_after=RESET_AFTER):
+        self.session = session if session is not None else default_session(pool_size)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.failures = failures
+        self.reset_after = reset_after
+        self._peers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="peer")
+
+    def _peer(self, url):
+        parts = urlsplit(url)
+        name = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            peer = self._peers.get(name)
+            if peer is None:
+                peer = self._peers[name] = _Peer(name, CircuitBreaker(self.failures, self.reset_after))
+            return peer
+
+    def request(self, method, url, timeout=None, hedge=False, **kwargs):
+        """Send one request and return the response (any status).
+
+        Raises PeerUnavailable while the peer's circuit is open, and the
+        transport's exception on connection errors and timeouts. With
+        `hedge`, only use for idempotent requests.
+        """
+        peer = self._peer(url)
+        if not peer.breaker.allow():
+            peer.rejected += 1
+            raise PeerUnavailable(f"{peer.name} is failing, retrying in {peer.breaker.retry_in():.0f}s")
+        timeout = timeout or self.timeout
+        peer.requests += 1
+        started = time.monotonic()
+        try:
+            with span("http", peer.name, method):
+                if hedge and self.hedge_after is not None and self.hedge_after < timeout:
+                    resp = self._hedged(peer, method, url, timeout, kwargs)
+                else:
+                    resp = self.session.request(method, url, timeout=timeout, **kwargs)
+        except Exception:
+            peer.failures += 1
+            peer.breaker.record(False)
+            raise
+        ok = resp.status_code < 500
+        peer.breaker.record(ok)
+        if ok:
+            peer.latency_total += time.monotonic() - started
+        else:
+            peer.failures += 1
+        return resp
+
+    def get(self, url, timeout=None, hedge=True, **kwargs):
+        return self.request("GET", url, timeout, hedge, **kwargs)
+
+    def post(self, url, timeout=None, **kwargs):
+        return self.request("POST", url, timeout, False, **kwargs)
+
+    def _hedged(self, peer, method, url, timeout, kwargs):
+        deadline = time.monotonic() + timeout
+        first = self._executor.submit(self.session.request, method, url, timeout=timeout, **kwargs)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+        peer.hedges += 1
+        second = self._executor.submit(self.session.request, method, url, timeout=timeout, **kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{peer.name} did not answer within {timeout}s")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        with self._lock:
+            peers = list(self._peers.values())
+        return {peer.name: peer.stats() for peer in peers}
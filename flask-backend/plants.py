@@ -0,0 +1,103 @@
+"""Plant and node registry shared by the hub (app.py) and node agents (agent.py).
+
+plants.json names the hub node (the one running app.py), lists the
+Raspberry Pi nodes (name -> base URL) and, per plant,
+the node it is attached to, its moisture driver, camera and dry threshold.
+Set PLANTS_CONFIG to load another file (the load-test harness does).
+Adding a plant or a Pi is a config change: the hub serves and fans out to
+whatever the registry lists, and each agent runs the plants of its node.
+
+fan_out() runs one call per plant concurrently on a bounded thread pool and
+gives up on stragglers after `timeout`, so a page that needs every plant
+takes about as long as the slowest node, not the sum of all of them.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metrics import propagate
+
+CONFIG_PATH = os.environ.get("PLANTS_CONFIG",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "plants.json"))
+DEFAULT_THRESHOLD = 600
+FAN_OUT_WORKERS = 16
+FAN_OUT_TIMEOUT = 3.0
+
+
+class Plant:
+    def __init__(self, plant_id, node, name=None, threshold=DEFAULT_THRESHOLD, moisture=None, camera=None):
+        self.id = plant_id
+        self.node = node
+        self.name = name or f"Plant {plant_id}"
+        self.threshold = threshold
+        # e.g. {"driver": "seesaw", "address": 54} or {"driver": "serial", "port": "/dev/ttyACM0", "poll": "R"}
+        self.moisture = moisture or {}
+        self.camera = camera
+
+    def status(self, moisture):
+        if moisture is None:
+            return None
+        return "dry" if moisture < self.threshold else "ok"
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "node": self.node, "threshold": self.threshold,
+                "camera": self.camera is not None}
+
+
+class PlantRegistry:
+    def __init__(self, hub, nodes, plants):
+        self.hub = hub
+        self.nodes = nodes
+        self.plants = {plant.id: plant for plant in plants}
+        self._executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="fan-out")
+
+    @classmethod
+    def load(cls, path=CONFIG_PATH):
+        with open(path) as f:
+            config = json.load(f)
+        nodes = {name: node["url"].rstrip("/") for name, node in config["nodes"].items()}
+        if config["hub"] not in nodes:
+            raise ValueError(f"Hub {config['hub']!r} is not a configured node")
+        plants = []
+        for entry in config["plants"]:
+            if entry["node"] not in nodes:
+                raise ValueError(f"Plant {entry['id']} is on unknown node {entry['node']!r}")
+            plants.append(Plant(entry["id"], entry["node"], entry.get("name"),
+                                entry.get("threshold", DEFAULT_THRESHOLD),
+                                entry.get("moisture"), entry.get("camera")))
+        return cls(config["hub"], nodes, plants)
+
+    def get(self, plant_id):
+        return self.plants.get(plant_id)
+
+    def all(self):
+        return [self.plants[plant_id] for plant_id in sorted(self.plants)]
+
+    def on_node(self, node):
+        return [plant for plant in self.all() if plant.node == node]
+
+    def remote(self, node):
+        """Plants attached to nodes other than `node`."""
+        return [plant for plant in self.all() if plant.node != node]
+
+    def node_url(self, plant):
+        return self.nodes[plant.node]
+
+    def fan_out(self, call, plants, timeout=FAN_OUT_TIMEOUT):
+        """Run call(plant) for every plant concurrently; returns {plant_id: (result, error)}.
+
+        Calls still running after `timeout` are reported as timed out (their
+        threads finish in the background).
+        """
+        # propagate() keeps the calls' upstream spans on the caller's request trace.
+        futures = {self._executor.submit(propagate(call), plant): plant for plant in plants}
+        done, _ = wait(futures, timeout=timeout)
+        results = {}
+        for future, plant in futures.items():
+            if future not in done:
+                results[plant.id] = (None, TimeoutError(f"no answer within {timeout}s"))
+            elif future.exception() is not None:
+                results[plant.id] = (None, future.exception())
+            else:
+                results[plant.id] = (future.result(), None)
+        return results
@@ -0,0 +1,210 @@
+"""Cached, compressed pages for the per-series history endpoints.
+
+A history page is keyed on its normalized query: series, resolution, page
+size, cursor and either the absolute window (explicit start/end dates, any
+ISO spelling) or the span of a "last N days" window. The builder of a page
+says whether it can still change: a non-empty page of an explicit window
+whose last bucket closed at least SETTLE_SECONDS ago (is_settled()), with
+nothing older than its end still queued locally, is final. Such pages are
+kept until evicted and sent with a long `immutable` Cache-Control; a
+browser re-opening the chart doesn't even ask. Other pages are rebuilt at
+most every `max_age` seconds and revalidated with their ETag. Concurrent
+requests for a missing page share one build.
+
+Each page is serialized once. gzip and, when the `brotli` package is
+installed, brotli variants are compressed on first demand and kept with
+it, so a cached page costs neither a query nor a compression.
+
+Pages come in two formats: "rows" (a list of point objects, the endpoints'
+original shape) and "columns" (parallel arrays with epoch-second times,
+about half the bytes before compression). Points are newest first; a full
+page carries a cursor for the next, older one.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from rollups import RAW_INTERVAL, RESOLUTIONS, bucket_start
+
+FORMATS = ("rows", "columns")
+MAX_AGE = 10.0
+MAX_BYTES = 16 * 1024 * 1024
+# Margin for late telemetry after a window's last bucket closes (spool backoff, rollup flushes).
+SETTLE_SECONDS = 3600
+IMMUTABLE_MAX_AGE = 86400
+# Bodies smaller than this go out uncompressed.
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def is_settled(end_ts, resolution, now=None):
+    """True when no reading can still arrive for a window ending at end_ts."""
+    seconds = RESOLUTIONS.get(resolution, RAW_INTERVAL)
+    return (now or time.time()) >= bucket_start(end_ts, seconds) + seconds + SETTLE_SECONDS
+
+
+def make_cursor(ts):
+    return str(int(round(ts * 1_000_000)))
+
+
+def parse_cursor(cursor):
+    """Timestamp of the oldest point already served; raises ValueError on a malformed cursor."""
+    return int(cursor) / 1_000_000
+
+
+def to_rows(points):
+    return [{name: value for name, value in point.items() if name != "ts"} for point in points]
+
+
+def to_columns(points):
+    names = [name for name in points[0] if name not in ("ts", "time")] if points else []
+    columns = {"time": [int(point["ts"]) for point in points]}
+    for name in names:
+        columns[name] = [point.get(name) for point in points]
+    return columns
+
+
+def negotiate(accept_encoding):
+    """Best encoding this cache offers for an Accept-Encoding header: "br", "gzip" or "identity"."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0 and (encoding != "br" or _brotli()):
+            return encoding
+    return "identity"
+
+
+class CachedPage:
+    def __init__(self, key, data, immutable, next_cursor=None):
+        self.key = key
+        self.body = json.dumps(data, separators=(",", ":")).encode()
+        self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+        self.immutable = immutable
+        self.next_cursor = next_cursor
+        self.built_at = time.monotonic()
+        self._encoded = {"identity": self.body}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return sum(len(body) for body in self._encoded.values())
+
+    def encoded(self, encoding):
+        """(encoding, bytes, bytes added); compresses on first use, small bodies stay uncompressed."""
+        if len(self.body) < MIN_COMPRESS_BYTES:
+            encoding = "identity"
+        with self._lock:
+            body = self._encoded.get(encoding)
+            if body is not None:
+                return encoding, body, 0
+            if encoding == "br":
+                body = _brotli().compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+            self._encoded[encoding] = body
+        return encoding, body, len(body)
+
+
+class ResponseCache:
+    def __init__(self, max_age=MAX_AGE, max_bytes=MAX_BYTES):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.immutable_hits = 0
+        self.builds = 0
+        self.shared_builds = 0
+        self.evictions = 0
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+
+    def _fresh(self, entry):
+        return entry.immutable or time.monotonic() - entry.built_at < self.max_age
+
+    def get(self, key, build):
+        """Page for `key`; `build()` returns (data, next_cursor, immutable) and runs only when there's no fresh page."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.immutable_hits += entry.immutable
+                return entry
+            pending = self._building.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._building[key] = Future()
+            else:
+                self.shared_builds += 1
+        if not owner:
+            return pending.result()
+
+        try:
+            data, next_cursor, immutable = build()
+            entry = CachedPage(key, data, immutable, next_cursor)
+        except Exception as e:
+            with self._lock:
+                del self._building[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self.builds += 1
+            self._store(key, entry)
+            del self._building[key]
+        pending.set_result(entry)
+        return entry
+
+    def _store(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def encode(self, entry, accept_encoding):
+        """(encoding, bytes) of `entry` for a request's Accept-Encoding header."""
+        encoding, body, added = entry.encoded(negotiate(accept_encoding))
+        with self._lock:
+            # A new compressed variant grows the entry, if it is still cached.
+            if added and self._entries.get(entry.key) is entry:
+                self._bytes += added
+            self.bytes_raw += len(entry.body)
+            self.bytes_sent += len(body)
+        return encoding, body
+
+    def stats(self):
+        with self._lock:
+            immutable = sum(entry.immutable for entry in self._entries.values())
+            return {"entries": len(self._entries), "immutable_entries": immutable, "bytes": self._bytes,
+                    "hits": self.hits, "immutable_hits": self.immutable_hits, "builds": self.builds,
+                    "shared_builds": self.shared_builds, "evictions": self.evictions,
+                    "compression_ratio": round(self.bytes_sent / self.bytes_raw, 3) if self.bytes_raw else None}
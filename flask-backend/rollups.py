@@ -0,0 +1,267 @@
+"""Pre-aggregated min/max/mean/count buckets for long-range history charts.
+
+Rollups live in their own table. Each series (a raw PartitionKey such as
+"Plant1" or "Enviroment") gets one partition per resolution, e.g.
+"Plant1-1h", keyed by the inverted bucket start like the raw tables. A rollup
+entity carries, for every raw field, `<field>` (the mean) plus `<field>_min`,
+`<field>_max`, `<field>_sum` and `<field>_count`, so readers can treat it like
+a raw row with extra columns.
+"""
+import threading
+import time
+
+from row_keys import make_row_key, row_key_ts
+from table_query import is_not_found, query_window
+
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+# Auto-selected resolutions aim to return at most this many points.
+MAX_POINTS = 200
+RAW_INTERVAL = 60
+MAX_ROWS = 1000
+
+
+def rollup_partition(series, resolution):
+    return f"{series}-{resolution}"
+
+
+def bucket_start(ts, seconds):
+    return int(ts // seconds * seconds)
+
+
+def choose_resolution(start_ts, end_ts, max_points=MAX_POINTS):
+    """Pick the finest resolution that keeps the window under `max_points` rows."""
+    span = max(end_ts - start_ts, 0)
+    if span / RAW_INTERVAL <= max_points:
+        return "raw"
+    for name, seconds in sorted(RESOLUTIONS.items(), key=lambda item: item[1]):
+        if span / seconds <= max_points:
+            return name
+    return max(RESOLUTIONS, key=RESOLUTIONS.get)
+
+
+def query_rollups(table_client, series, resolution, start_ts, end_ts, limit=MAX_ROWS):
+    """Rollup entities whose bucket starts within the window, newest first."""
+    start_ts = bucket_start(start_ts, RESOLUTIONS[resolution])
+    return query_window(table_client, rollup_partition(series, resolution), start_ts, end_ts,
+                        limit=limit)
+
+
+class Bucket:
+    def __init__(self):
+        self.stats = {}
+
+    def add(self, values):
+        for field, value in values.items():
+            if value is None:
+                continue
+            stats = self.stats.get(field)
+            if stats is None:
+                self.stats[field] = [value, value, value, 1]
+            else:
+                stats[0] = min(stats[0], value)
+                stats[1] = max(stats[1], value)
+                stats[2] += value
+                stats[3] += 1
+
+    def merge(self, other):
+        for field, (low, high, total, count) in other.stats.items():
+            stats = self.stats.get(field)
+            if stats is None:
+                self.stats[field] = [low, high, total, count]
+            else:
+                stats[0] = min(stats[0], low)
+                stats[1] = max(stats[1], high)
+                stats[2] += total
+                stats[3] += count
+
+    def to_entity(self, series, resolution, start):
+        entity = {"PartitionKey": rollup_partition(series, resolution), "RowKey": make_row_key(start)}
+        for field, (low, high, total, count) in self.stats.items():
+            entity[field] = round(total / count, 2)
+            entity[f"{field}_min"] = low
+            entity[f"{field}_max"] = high
+            entity[f"{field}_sum"] = total
+            entity[f"{field}_count"] = count
+        return entity
+
+    @classmethod
+    def from_entity(cls, entity):
+        bucket = cls()
+        for key in entity:
+            if key.endswith("_count"):
+                field = key[:-len("_count")]
+                bucket.stats[field] = [entity[f"{field}_min"], entity[f"{field}_max"],
+                                       entity[f"{field}_sum"], entity[key]]
+        return bucket
+
+
+class RollupWriter:
+    """Folds raw readings into the open bucket of every resolution and upserts them.
+
+    Only the current bucket per series and resolution is kept in memory. A
+    bucket that may already hold readings written before this process started
+    (or a late reading for an older bucket) is first read back from the table
+    so a restart never overwrites earlier aggregates. While that read fails
+    (anything but "not found"), the readings are held and the bucket is not
+    written; every flush retries the read. With a `spool` (TelemetryWriter),
+    bucket upserts go through it under `spool_table` instead of straight to
+    the table, and every flush saves the held readings in the spool in the
+    same commit, so a writer opened on it after a restart carries on with
+    them. Without a spool they are only kept in memory.
+    """
+
+    def __init__(self, table_client, resolutions=RESOLUTIONS, spool=None, spool_table="rollups"):
+        self.table_client = table_client
+        self.resolutions = resolutions
+        self.spool = spool
+        self.spool_table = spool_table
+        self._open = {}
+        self._dirty = set()
+        # Open buckets whose stored row hasn't been read yet, and readings for
+        # closed buckets still to be merged into theirs.
+        self._unloaded = set()
+        self._late = {}
+        # Held readings are read back from the spool on first use, not here:
+        # the spool may be a component that isn't open yet.
+        self._restored = spool is None
+        self._held = False
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+
+    def _restore(self):
+        if self._restored:
+            return
+        for entity in self.spool.held(self.spool_table):
+            series, _, resolution = entity["PartitionKey"].rpartition("-")
+            start = int(round(row_key_ts(entity["RowKey"])))
+            self._late.setdefault((series, resolution, start), Bucket()).merge(Bucket.from_entity(entity))
+            self._held = True
+        self._restored = True
+
+    def add(self, series, ts, values):
+        with self._lock:
+            self._restore()
+            for resolution, seconds in self.resolutions.items():
+                start = bucket_start(ts, seconds)
+                key = (series, resolution)
+                current = self._open.get(key)
+                if current is not None and current[0] == start:
+                    bucket = current[1]
+                elif current is not None and start < current[0]:
+                    # Late reading for a closed bucket: merged into the stored row by flush().
+                    self._late.setdefault((series, resolution, start), Bucket()).add(values)
+                    continue
+                else:
+                    if current is not None and key in self._unloaded:
+                        self._unloaded.discard(key)
+                        self._late.setdefault((series, resolution, current[0]), Bucket()).merge(current[1])
+                    elif current is not None and key in self._dirty:
+                        self._write(series, resolution, current[0], current[1])
+                    bucket = Bucket()
+                    self._open[key] = (start, bucket)
+                    if start < self._started_at:
+                        self._unloaded.add(key)
+                bucket.add(values)
+                self._dirty.add(key)
+
+    def flush(self):
+        with self._lock:
+            self._restore()
+            for key in list(self._unloaded):
+                start, bucket = self._open[key]
+                stored = self._try_load(key[0], key[1], start)
+                if stored is not None:
+                    bucket.merge(stored)
+                    # Readings held for this bucket before a restart.
+                    held = self._late.pop((key[0], key[1], start), None)
+                    if held is not None:
+                        bucket.merge(held)
+                    self._unloaded.discard(key)
+            written = [key for key in self._dirty if key not in self._unloaded]
+            buckets = {}
+            for series, resolution in written:
+                start, bucket = self._open[(series, resolution)]
+                buckets[(series, resolution, start)] = bucket
+            merged = []
+            held = {}
+            for late_key, bucket in self._late.items():
+                stored = self._try_load(*late_key)
+                if stored is None:
+                    held.setdefault(late_key, Bucket()).merge(bucket)
+                    continue
+                stored.merge(bucket)
+                buckets[late_key] = stored
+                merged.append(late_key)
+            for series, resolution in self._unloaded:
+                start, bucket = self._open[(series, resolution)]
+                held.setdefault((series, resolution, start), Bucket()).merge(bucket)
+            if not buckets and not held and not self._held:
+                return
+            if self._write_all([bucket.to_entity(*key) for key, bucket in buckets.items()],
+                               [bucket.to_entity(*key) for key, bucket in held.items()]):
+                self._dirty.difference_update(written)
+                for late_key in merged:
+                    del self._late[late_key]
+
+    def pending(self):
+        """Buckets held back because their stored row couldn't be read yet."""
+        with self._lock:
+            return len(self._unloaded) + len(self._late)
+
+    def oldest_pending(self):
+        """Start of the oldest bucket not written yet (held back or failed), or None."""
+        with self._lock:
+            starts = [self._open[key][0] for key in self._dirty | self._unloaded]
+            starts += [start for _, _, start in self._late]
+        return min(starts, default=None)
+
+    def record(self, series, ts, values):
+        """Add one reading and push the affected buckets to the table."""
+        self.add(series, ts, values)
+        self.flush()
+
+    def _load(self, series, resolution, start):
+        """The stored bucket, an empty one if there is none; raises when the table can't be read."""
+        partition, row_key = rollup_partition(series, resolution), make_row_key(start)
+        entity = self.spool.spooled(self.spool_table, partition, row_key) if self.spool else None
+        if entity is None:
+            try:
+                entity = self.table_client.get_entity(partition, row_key)
+            except Exception as e:
+                if is_not_found(e):
+                    return Bucket()
+                raise
+        return Bucket.from_entity(entity)
+
+    def _try_load(self, series, resolution, start):
+        try:
+            return self._load(series, resolution, start)
+        except Exception as e:
+            print(f"Error reading {rollup_partition(series, resolution)} rollup, keeping it pending: {e}")
+            return None
+
+    def _write_all(self, entities, held):
+        """Upsert `entities`; with a spool, also replace the held readings in the same commit."""
+        try:
+            if self.spool is not None:
+                self.spool.append_many(self.spool_table, entities, held)
+                self._held = bool(held)
+            else:
+                for entity in entities:
+                    self.table_client.upsert_entity(entity=entity)
+            return True
+        except Exception as e:
+            print(f"Error writing {len(entities)} rollups: {e}")
+            return False
+
+    def _write(self, series, resolution, start, bucket):
+        entity = bucket.to_entity(series, resolution, start)
+        try:
+            if self.spool is not None:
+                self.spool.append(self.spool_table, entity)
+            else:
+                self.table_client.upsert_entity(entity=entity)
+            return True
+        except Exception as e:
+            print(f"Error writing {rollup_partition(series, resolution)} rollup: {e}")
+            return False
@@ -0,0 +1,27 @@
+"""RowKey layout shared by every sensor writer.
+
+RowKeys are fixed-width, zero-padded, inverted microsecond timestamps, so the
+Table service's ascending key order is newest-first and "latest reading" is
+the first row of a partition. Older rows used `str(timestamp)`; those keys
+start with "1" until 2033 while inverted keys start with "7" or higher, which
+lets `migrate_row_keys.py` select them with a single range filter.
+"""
+
+KEY_WIDTH = 16
+MAX_MICROS = 10 ** KEY_WIDTH - 1
+LEGACY_KEY_CEILING = "2"
+
+
+def make_row_key(ts):
+    return f"{MAX_MICROS - int(round(ts * 1_000_000)):0{KEY_WIDTH}d}"
+
+
+def is_legacy_key(row_key):
+    return len(row_key) != KEY_WIDTH or not row_key.isdigit()
+
+
+def row_key_ts(row_key):
+    """Return the POSIX timestamp encoded in either key layout."""
+    if is_legacy_key(row_key):
+        return float(row_key)
+    return (MAX_MICROS - int(row_key)) / 1_000_000
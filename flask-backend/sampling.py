@@ -0,0 +1,270 @@
+"""High-rate sampling helpers: raw ring buffers and windowed aggregation.
+
+Sensors can be sampled at several Hz while Azure still gets one row per
+window. Each raw sample goes to a RingBuffer, a fixed-size circular array
+of (timestamp, value) doubles, optionally backed by a memory-mapped file so
+another process (the Flask app) can read what a logger script recorded.
+WindowAggregator folds the same samples into count/min/max/mean/stddev per
+wall-clock-aligned window and hands each finished window to a callback,
+which writes one row.
+
+A file-backed RingBuffer has a single writer. Readers copy the slots they
+need and then drop any the writer may have overwritten meanwhile, so they
+never see a torn sample.
+"""
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b"RINGBUF1"
+HEADER_SIZE = 32
+WINDOW = 60
+
+# count, min, max, mean, stddev of one field over one window
+FieldStats = namedtuple("FieldStats", "count min max mean stddev")
+WindowStats = namedtuple("WindowStats", "start end fields")
+
+
+class RingBuffer:
+    def __init__(self, capacity, path=None):
+        """In-memory buffer, or a file-backed one at `path` (reused if it has the same capacity)."""
+        size = HEADER_SIZE + capacity * 16
+        self.path = path
+        self._file = None
+        if path is None:
+            self._mem = bytearray(size)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            fresh = not os.path.exists(path) or os.path.getsize(path) != size
+            self._file = open(path, "w+b" if fresh else "r+b")
+            if fresh:
+                self._file.truncate(size)
+            self._mem = mmap.mmap(self._file.fileno(), size)
+        self._attach()
+        if self._mem[:8] != MAGIC or self._header[1] != capacity:
+            self._mem[:HEADER_SIZE] = MAGIC + struct.pack("QQQ", capacity, 0, 0)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        """Attach to an existing file-backed buffer, e.g. one written by another process."""
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if header[:8] != MAGIC:
+            raise ValueError(f"{path} is not a ring buffer")
+        return cls(struct.unpack_from("Q", header, 8)[0], path)
+
+    def _attach(self):
+        view = memoryview(self._mem)
+        self._header = view[:HEADER_SIZE].cast("Q")
+        self._data = view[HEADER_SIZE:].cast("d")
+
+    def __len__(self):
+        return min(self._header[2], self.capacity)
+
+    @property
+    def total(self):
+        """Samples appended over the buffer's lifetime."""
+        return self._header[2]
+
+    def append(self, ts, value):
+        with self._lock:
+            total = self._header[2]
+            slot = 2 * (total % self.capacity)
+            self._data[slot] = ts
+            self._data[slot + 1] = value
+            # Publish only after the slot is written.
+            self._header[2] = total + 1
+
+    def samples(self, since=None, limit=None):
+        """(timestamps, values) lists, oldest first, optionally newer than `since`.
+
+        Returns at most capacity - 1 samples: the oldest slot is the one the
+        writer fills next, so it is never trusted.
+        """
+        total = self._header[2]
+        first = max(0, total - self.capacity + 1)
+        if since is not None:
+            first = self._search(first, total, since)
+        if limit is not None:
+            first = max(first, total - limit)
+        flat = self._copy(first, total)
+        overwritten = self._header[2] - self.capacity
+        if overwritten >= first:
+            flat = flat[2 * (overwritten - first + 1):]
+        return flat[0::2], flat[1::2]
+
+    def _search(self, lo, hi, since):
+        # Binary search over logical indices; timestamps are appended in order.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._data[2 * (mid % self.capacity)] <= since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _copy(self, first, total):
+        start, end = first % self.capacity, total % self.capacity
+        if total - first == 0:
+            return []
+        if start < end:
+            return self._data[2 * start:2 * end].tolist()
+        return self._data[2 * start:].tolist() + self._data[:2 * end].tolist()
+
+    def close(self):
+        self._header.release()
+        self._data.release()
+        if self._file is not None:
+            self._mem.close()
+            self._file.close()
+
+
+class _Running:
+    __slots__ = ("count", "min", "max", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        # Welford's update keeps the variance stable over long windows.
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def stats(self):
+        stddev = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return FieldStats(self.count, self.min, self.max, self.mean, stddev)
+
+
+class WindowAggregator:
+    def __init__(self, on_window, fields, window=WINDOW):
+        self.on_window = on_window
+        self.fields = fields
+        self.window = window
+        self._start = None
+        self._running = None
+        self._lock = threading.Lock()
+
+        self.windows = 0
+
+    def add(self, ts, values):
+        """Add one sample ({field: value}, missing fields skipped); may emit the previous window."""
+        finished = None
+        start = ts - ts % self.window
+        with self._lock:
+            if self._start is not None and start != self._start:
+                finished = self._take()
+            if self._start is None:
+                self._start = start
+                self._running = {field: _Running() for field in self.fields}
+            for field in self.fields:
+                if values.get(field) is not None:
+                    self._running[field].add(values[field])
+        if finished:
+            self._emit(finished)
+
+    def flush(self):
+        """Emit the current partial window, e.g. on shutdown."""
+        with self._lock:
+            finished = self._take() if self._start is not None else None
+        if finished:
+            self._emit(finished)
+
+    def _take(self):
+        fields = {field: running.stats() for field, running in self._running.items() if running.count}
+        finished = WindowStats(self._start, self._start + self.window, fields)
+        self._start = None
+        self._running = None
+        return finished if fields else None
+
+    def _emit(self, finished):
+        self.windows += 1
+        try:
+            self.on_window(finished)
+        except Exception as e:
+            print(f"Error handling {self.window}s window at {finished.start}: {e}")
+
+
+def window_values(stats):
+    """Values of one window: the mean under the field name, plus _min/_max/_std/_count."""
+    values = {}
+    for field, s in stats.fields.items():
+        values[field] = round(s.mean, 2)
+        values[f"{field}_min"] = s.min
+        values[f"{field}_max"] = s.max
+        values[f"{field}_std"] = round(s.stddev, 3)
+        values[f"{field}_count"] = s.count
+    return values
+
+
+def window_columns(fields):
+    """Names window_values() produces for `fields`."""
+    return [f"{field}{suffix}" for field in fields for suffix in ("", "_min", "_max", "_std", "_count")]
+
+
+def window_entity(partition_key, row_key, stats):
+    """Table entity for one window (see window_values)."""
+    return {"PartitionKey": partition_key, "RowKey": row_key, **window_values(stats)}
+
+
+class PeriodicSampler:
+    """Calls `read()` every 1/`rate` seconds on its own thread and passes
+    non-None results to `on_value(ts, value)`."""
+
+    def __init__(self, read, rate, on_value, name="sampler"):
+        self.read = read
+        self.interval = 1.0 / rate
+        self.on_value = on_value
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                value = self.read()
+                if value is not None:
+                    self.on_value(time.time(), value)
+            except Exception as e:
+                print(f"[{self.name}] Sampling error: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+class RateLimiter:
+    """Lets through at most `rate` samples per second from a faster source."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    def ready(self, ts):
+        if ts < self._next:
+            return False
+        self._next = ts + self.interval
+        return True
@@ -0,0 +1,119 @@
+"""Background sampler that owns the Seesaw soil sensor.
+
+SensorSampler is the only code that talks to the I2C device: one thread
+reads moisture and temperature every 1/`sample_rate` seconds, holding a
+lock for the whole transaction, and keeps the last `window` samples.
+HTTP handlers and the Azure logger call latest(), which returns the median
+of that window (so a single glitched read doesn't show up) without touching
+the bus. If the sensor stops answering, latest() goes stale and returns
+None, and the driver is recreated with backoff.
+
+`open_driver` is a callable returning an object with Seesaw's
+`moisture_read()` / `get_temp()` methods; it is called on the sampling
+thread, so a missing or unplugged sensor doesn't break importing the app.
+`on_sample(sample)`, if given, also receives every raw sample on that
+thread (for raw buffers and windowed aggregation).
+"""
+import statistics
+import threading
+import time
+from collections import deque, namedtuple
+
+SAMPLE_RATE = 1.0
+WINDOW = 5
+STALE_AFTER = 10.0
+MAX_REOPEN_DELAY = 60.0
+ERRORS_BEFORE_REOPEN = 3
+
+Sample = namedtuple("Sample", "moisture temperature taken_at")
+
+
+class SensorSampler:
+    def __init__(self, open_driver, sample_rate=SAMPLE_RATE, window=WINDOW, stale_after=STALE_AFTER,
+                 on_sample=None):
+        self.open_driver = open_driver
+        self.on_sample = on_sample
+        self.interval = 1.0 / sample_rate
+        self.stale_after = stale_after
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._bus_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.reads = 0
+        self.errors = 0
+        self.reopens = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def latest(self):
+        """Median-filtered Sample over the window, or None if there is no recent sample."""
+        with self._lock:
+            samples = list(self._samples)
+        if not samples or time.time() - samples[-1].taken_at > self.stale_after:
+            return None
+        return Sample(statistics.median_low(s.moisture for s in samples),
+                      statistics.median(s.temperature for s in samples),
+                      samples[-1].taken_at)
+
+    def _open(self):
+        delay = self.interval
+        while not self._stop.is_set():
+            try:
+                return self.open_driver()
+            except Exception as e:
+                print(f"Error opening soil sensor, retrying in {delay:.1f}s: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_REOPEN_DELAY)
+        return None
+
+    def _run(self):
+        driver = self._open()
+        failures = 0
+        while driver is not None and not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                with self._bus_lock:
+                    moisture = driver.moisture_read()
+                    temperature = driver.get_temp()
+                sample = Sample(moisture, temperature, time.time())
+                with self._lock:
+                    self._samples.append(sample)
+                self.reads += 1
+                failures = 0
+                self._ready.set()
+            except Exception as e:
+                self.errors += 1
+                failures += 1
+                print(f"Error reading soil sensor: {e}")
+                if failures >= ERRORS_BEFORE_REOPEN:
+                    self.reopens += 1
+                    driver = self._open()
+                    failures = 0
+            else:
+                if self.on_sample is not None:
+                    try:
+                        self.on_sample(sample)
+                    except Exception as e:
+                        print(f"Error handling soil sensor sample: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stats(self):
+        sample = self.latest()
+        return {"reads": self.reads, "errors": self.errors, "reopens": self.reopens,
+                "age": round(time.time() - sample.taken_at, 3) if sample else None}
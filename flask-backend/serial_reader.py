@@ -0,0 +1,138 @@
+"""Persistent reader for Arduino sensors on a serial port.
+
+SerialReader opens the port once and keeps it open (every open resets
+most Arduinos). A background thread reads newline-framed readings, parses
+them and appends them with a timestamp to a bounded buffer, so latest() is
+a deque lookup. Devices that only answer on request get `poll` written
+every `poll_interval` seconds. If the port disappears or errors, it is
+closed and reopened with backoff.
+
+`open_port` is any callable returning an object with pyserial's
+`readline()` / `write()` / `close()` interface, e.g.
+`lambda: serial.Serial('/dev/ttyUSB0', 9600, timeout=1)`; the port's
+read timeout bounds how long stop() and polling can be delayed.
+`on_reading(reading)`, if given, is called on the reader thread for every
+parsed reading.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+HISTORY = 600
+STALE_AFTER = 120.0
+MAX_REOPEN_DELAY = 30.0
+
+Reading = namedtuple("Reading", "value taken_at")
+
+
+def parse_int(line):
+    """Integer reading from one line, or None for anything else."""
+    text = line.decode("utf-8", "replace").strip()
+    return int(text) if text.isdigit() else None
+
+
+class SerialReader:
+    def __init__(self, open_port, parse=parse_int, poll=None, poll_interval=5.0,
+                 history=HISTORY, stale_after=STALE_AFTER, name="serial", on_reading=None):
+        self.open_port = open_port
+        self.on_reading = on_reading
+        self.parse = parse
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.name = name
+        self._readings = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.lines = 0
+        self.bad_frames = 0
+        self.reconnects = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def latest(self):
+        """Newest Reading, or None if nothing arrived in the last `stale_after` seconds."""
+        with self._lock:
+            reading = self._readings[-1] if self._readings else None
+        if reading is None or time.time() - reading.taken_at > self.stale_after:
+            return None
+        return reading
+
+    def readings(self, since=None):
+        with self._lock:
+            return [r for r in self._readings if since is None or r.taken_at >= since]
+
+    def _open(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                return self.open_port()
+            except Exception as e:
+                print(f"[{self.name}] Could not open port, retrying in {delay:.0f}s: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_REOPEN_DELAY)
+        return None
+
+    def _run(self):
+        port = self._open()
+        partial = b""
+        next_poll = 0.0
+        while port is not None and not self._stop.is_set():
+            try:
+                if self.poll is not None and not partial:
+                    # Only read after asking; an idle readline() would block for the full timeout.
+                    self._stop.wait(max(0.0, next_poll - time.monotonic()))
+                    port.write(self.poll)
+                    next_poll = time.monotonic() + self.poll_interval
+                # readline() returns early with a partial line on timeout.
+                partial += port.readline()
+                if not partial.endswith(b"\n"):
+                    continue
+                line, partial = partial, b""
+                self._handle(line)
+            except Exception as e:
+                print(f"[{self.name}] Port error, reconnecting: {e}")
+                try:
+                    port.close()
+                except Exception:
+                    pass
+                self.reconnects += 1
+                partial = b""
+                next_poll = 0.0
+                self._stop.wait(1.0)
+                port = self._open()
+        if port is not None:
+            port.close()
+
+    def _handle(self, line):
+        self.lines += 1
+        value = self.parse(line)
+        if value is None:
+            self.bad_frames += 1
+            print(f"[{self.name}] Ignoring malformed line: {line!r}")
+            return
+        reading = Reading(value, time.time())
+        with self._lock:
+            self._readings.append(reading)
+        if self.on_reading is not None:
+            try:
+                self.on_reading(reading)
+            except Exception as e:
+                print(f"[{self.name}] Error handling reading: {e}")
+
+    def stats(self):
+        reading = self.latest()
+        return {"lines": self.lines, "bad_frames": self.bad_frames, "reconnects": self.reconnects,
+                "age": round(time.time() - reading.taken_at, 3) if reading else None}
@@ -0,0 +1,133 @@
+"""In-process cache of recent sensor rows, one ring buffer per table partition.
+
+Each SeriesCache keeps the newest `max_rows` entities of a partition in
+memory, newest first. A read older than `max_age` seconds triggers one
+incremental refresh that fetches only rows newer than the cached high-water
+mark; concurrent readers wait for that refresh instead of issuing their own,
+so any number of dashboard tabs cost one upstream query per interval.
+"""
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from row_keys import row_key_ts
+from table_query import iter_entities, query_window
+
+MAX_AGE = 10
+MAX_ROWS = 7 * 24 * 60
+
+
+class SeriesCache:
+    def __init__(self, table_client, partition, select, max_rows=MAX_ROWS, max_age=MAX_AGE):
+        self.table_client = table_client
+        self.partition = partition
+        self.select = select
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._rows = deque(maxlen=max_rows)
+        self._complete = False
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.upstream_queries = 0
+        self.rows_fetched = 0
+        self.refresh_seconds_total = 0.0
+        self.refresh_seconds_max = 0.0
+
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if (not force and self._refreshed_at is not None
+                    and now - self._refreshed_at < self.max_age):
+                self.hits += 1
+                return
+            self.misses += 1
+            started = time.perf_counter()
+            try:
+                if self._rows:
+                    new_rows = list(iter_entities(self.table_client, self.partition,
+                                                  high_key=self._rows[0][1]["RowKey"],
+                                                  high_inclusive=False, select=self.select))
+                else:
+                    new_rows = list(islice(iter_entities(self.table_client, self.partition,
+                                                         select=self.select), self.max_rows))
+                    self._complete = len(new_rows) < self.max_rows
+                self.upstream_queries += 1
+            except Exception as e:
+                # Keep serving what we have; retry after the next staleness interval.
+                print(f"Error refreshing {self.partition} cache: {e}")
+                new_rows = []
+            if len(self._rows) + len(new_rows) > self.max_rows:
+                self._complete = False
+            self._rows.extendleft((row_key_ts(e["RowKey"]), e) for e in reversed(new_rows))
+            self.rows_fetched += len(new_rows)
+            self._refreshed_at = now
+            elapsed = time.perf_counter() - started
+            self.refresh_seconds_total += elapsed
+            self.refresh_seconds_max = max(self.refresh_seconds_max, elapsed)
+
+    def latest(self):
+        self.refresh()
+        with self._lock:
+            return self._rows[0][1] if self._rows else None
+
+    def window(self, start_ts, end_ts, limit=None):
+        """Entities recorded between start_ts and end_ts, newest first.
+
+        Served from memory when the buffer reaches back to start_ts, otherwise
+        from a server-side filtered query.
+        """
+        self.refresh()
+        with self._lock:
+            covered = self._complete or (self._rows and self._rows[-1][0] <= start_ts)
+            if covered:
+                rows = []
+                for ts, entity in self._rows:
+                    if ts > end_ts:
+                        continue
+                    if ts < start_ts or (limit is not None and len(rows) >= limit):
+                        break
+                    rows.append(entity)
+                return rows
+            self.upstream_queries += 1
+        return query_window(self.table_client, self.partition, start_ts, end_ts,
+                            select=self.select, limit=limit)
+
+    def stats(self):
+        refreshes = self.misses
+        return {
+            "rows": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "upstream_queries": self.upstream_queries,
+            "rows_fetched": self.rows_fetched,
+            "refresh_ms_avg": round(self.refresh_seconds_total / refreshes * 1000, 2) if refreshes else None,
+            "refresh_ms_max": round(self.refresh_seconds_max * 1000, 2),
+        }
+
+
+class SeriesCacheRegistry:
+    """SeriesCache instances keyed by (table name, partition), created on first use."""
+
+    def __init__(self, max_rows=MAX_ROWS, max_age=MAX_AGE):
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_name, table_client, partition, select):
+        key = (table_name, partition)
+        with self._lock:
+            cache = self._caches.get(key)
+            if cache is None:
+                cache = SeriesCache(table_client, partition, select, self.max_rows, self.max_age)
+                self._caches[key] = cache
+            return cache
+
+    def stats(self):
+        with self._lock:
+            caches = dict(self._caches)
+        return {f"{table}/{partition}": cache.stats() for (table, partition), cache in caches.items()}
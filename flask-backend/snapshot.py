@@ -0,0 +1,106 @@
+"""Bulk sensor snapshots for /sensor/snapshot and /sensor/history.
+
+gather() runs a dict of zero-argument calls concurrently on a shared pool
+and waits at most `timeout`, so a snapshot of every sensor and plant takes
+as long as its slowest source rather than the sum of all of them.
+
+SnapshotCache keeps the last body built for each key as compact JSON with
+an ETag (a hash of those bytes) for `max_age` seconds. Requests inside that
+window, including If-None-Match revalidations answered with 304, are
+served without calling any source. After it expires, concurrent requests
+share one rebuild, and a rebuild that produces the same bytes keeps the
+ETag, so clients still get a 304.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from metrics import propagate
+
+GATHER_WORKERS = 16
+GATHER_TIMEOUT = 5.0
+MAX_AGE = 5.0
+MAX_ENTRIES = 32
+
+Snapshot = namedtuple("Snapshot", "body etag built_at")
+
+_executor = ThreadPoolExecutor(max_workers=GATHER_WORKERS, thread_name_prefix="gather")
+
+
+def gather(calls, timeout=GATHER_TIMEOUT):
+    """Run {name: call} concurrently; returns {name: (result, error)}, timed-out calls as errors."""
+    futures = {name: _executor.submit(propagate(call)) for name, call in calls.items()}
+    done, _ = wait(futures.values(), timeout=timeout)
+    results = {}
+    for name, future in futures.items():
+        if future not in done:
+            results[name] = (None, TimeoutError(f"no answer within {timeout}s"))
+        elif future.exception() is not None:
+            results[name] = (None, future.exception())
+        else:
+            results[name] = (future.result(), None)
+    return results
+
+
+def make_snapshot(data):
+    body = json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+    return Snapshot(body, hashlib.blake2b(body, digest_size=8).hexdigest(), time.monotonic())
+
+
+class SnapshotCache:
+    def __init__(self, max_age=MAX_AGE, max_entries=MAX_ENTRIES):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.builds = 0
+        self.shared_builds = 0
+        self.build_seconds_total = 0.0
+
+    def get(self, key, build):
+        """Snapshot for `key`, calling `build()` for fresh data only when the cached one expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.built_at < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            pending = self._building.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._building[key] = Future()
+            else:
+                self.shared_builds += 1
+        if not owner:
+            return pending.result()
+
+        started = time.monotonic()
+        try:
+            entry = make_snapshot(build())
+        except Exception as e:
+            with self._lock:
+                del self._building[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self.builds += 1
+            self.build_seconds_total += time.monotonic() - started
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._building[key]
+        pending.set_result(entry)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "builds": self.builds,
+                    "shared_builds": self.shared_builds,
+                    "avg_build_ms": round(self.build_seconds_total / self.builds * 1000, 1) if self.builds else None}
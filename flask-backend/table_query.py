@@ -0,0 +1,72 @@
+"""Server-side filtered, partition-scoped queries against the sensor tables.
+
+Rows are keyed by `PartitionKey` (plant / sensor group) and an inverted
+timestamp `RowKey` (see row_keys.py), so a time window maps directly onto an
+OData range filter that the Table service answers from its index, and rows
+come back newest first.
+"""
+from itertools import islice
+
+from row_keys import make_row_key
+
+PAGE_SIZE = 1000
+
+
+def odata_filter(partition=None, low_key=None, high_key=None, high_inclusive=True):
+    clauses = []
+    parameters = {}
+    if partition is not None:
+        clauses.append("PartitionKey eq @pk")
+        parameters["pk"] = partition
+    if low_key is not None:
+        clauses.append("RowKey ge @lo")
+        parameters["lo"] = low_key
+    if high_key is not None:
+        clauses.append("RowKey le @hi" if high_inclusive else "RowKey lt @hi")
+        parameters["hi"] = high_key
+    return " and ".join(clauses), parameters
+
+
+def iter_entities(table_client, partition=None, low_key=None, high_key=None,
+                  select=None, high_inclusive=True, page_size=PAGE_SIZE):
+    """Lazily yield matching entities page by page, in ascending key order."""
+    query_filter, parameters = odata_filter(partition, low_key, high_key, high_inclusive)
+    if query_filter:
+        pages = table_client.query_entities(
+            query_filter, parameters=parameters, select=select,
+            results_per_page=page_size).by_page()
+    else:
+        pages = table_client.list_entities(select=select, results_per_page=page_size).by_page()
+    for page in pages:
+        for entity in page:
+            yield entity
+
+
+def query_window(table_client, partition, start_ts, end_ts, select=None, limit=None):
+    """Return entities of `partition` recorded between start_ts and end_ts, newest first.
+
+    Paging stops as soon as `limit` rows are in hand.
+    """
+    page_size = min(limit, PAGE_SIZE) if limit else PAGE_SIZE
+    rows = iter_entities(table_client, partition, make_row_key(end_ts), make_row_key(start_ts),
+                         select, page_size=page_size)
+    return list(islice(rows, limit))
+
+
+def query_latest(table_client, partition, select=None):
+    """Return the newest entity of `partition` with a `top=1` query, or None."""
+    return next(iter_entities(table_client, partition, select=select, page_size=1), None)
+
+
+# The SDK's errors are told apart by name and HTTP status, so this module
+# (and the benchmarks' fakes) need no Azure import.
+def is_not_found(error):
+    """True when a lookup failed because the entity doesn't exist (404)."""
+    return type(error).__name__ == "ResourceNotFoundError" or getattr(error, "status_code", None) == 404
+
+
+def is_rejected(error):
+    """True when the service refused the request itself (a 4xx other than timeout or
+    throttling), e.g. a bad property type or an entity too large; retrying can't help."""
+    status = getattr(error, "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
@@ -0,0 +1,222 @@
+"""Buffered telemetry writer with a local write-ahead spool.
+
+Every reading is first committed to a SQLite spool on local storage, then a
+background thread ships the spool to Azure in entity-group transactions of
+up to 100 rows per table partition. Rows leave the spool only after their
+transaction succeeds; failures back off exponentially and the spool is
+replayed once the network is back, including after a restart. Rows are sent
+as upserts, so replaying a batch that reached Azure before a crash is
+harmless, and repeated upserts of the same key (e.g. an open rollup bucket)
+collapse into the newest one.
+
+Each partition is shipped on its own, so one that fails doesn't hold back
+the others. Rows the service rejects outright (a bad property type, an
+entity too large) would fail every retry; they are moved to a dead_letter
+table in the spool and logged instead of blocking their partition.
+
+A writer that can't build its rows yet (RollupWriter while a stored bucket
+can't be read) parks what it has in the `held` table, replaced in the same
+commit as the rows it queues, and reads it back after a restart.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from row_keys import row_key_ts
+from table_query import is_rejected
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 5.0
+MAX_BACKOFF = 300.0
+
+
+class TelemetryWriter:
+    def __init__(self, spool_path, table_clients, flush_interval=FLUSH_INTERVAL,
+                 max_backoff=MAX_BACKOFF):
+        self.table_clients = table_clients
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._db = sqlite3.connect(spool_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " table_name TEXT NOT NULL, partition TEXT NOT NULL, row_key TEXT NOT NULL,"
+            " body TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS spool_partition ON spool (table_name, partition, id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " table_name TEXT NOT NULL, partition TEXT NOT NULL, row_key TEXT NOT NULL,"
+            " body TEXT NOT NULL, error TEXT NOT NULL, failed_at REAL NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS held ("
+            " table_name TEXT NOT NULL, partition TEXT NOT NULL, row_key TEXT NOT NULL,"
+            " body TEXT NOT NULL, PRIMARY KEY (table_name, partition, row_key))")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.requests = 0
+        self.rows_sent = 0
+        self.failures = 0
+
+    def append(self, table_name, entity):
+        """Durably queue one entity for `table_name`; returns once it is on disk."""
+        self.append_many(table_name, [entity])
+
+    def append_many(self, table_name, entities, held=None):
+        """Durably queue `entities`; with `held`, also replace the entities held for `table_name`, in one commit."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO spool (table_name, partition, row_key, body) VALUES (?, ?, ?, ?)",
+                [(table_name, e["PartitionKey"], e["RowKey"], json.dumps(e)) for e in entities])
+            if held is not None:
+                self._db.execute("DELETE FROM held WHERE table_name = ?", (table_name,))
+                self._db.executemany(
+                    "INSERT INTO held (table_name, partition, row_key, body) VALUES (?, ?, ?, ?)",
+                    [(table_name, e["PartitionKey"], e["RowKey"], json.dumps(e)) for e in held])
+            self._db.commit()
+
+    def held(self, table_name):
+        """Entities held for `table_name` by append_many()."""
+        with self._lock:
+            rows = self._db.execute("SELECT body FROM held WHERE table_name = ?", (table_name,)).fetchall()
+        return [json.loads(body) for body, in rows]
+
+    def spooled(self, table_name, partition_key, row_key):
+        """Newest not-yet-sent version of an entity, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM spool WHERE table_name = ? AND partition = ? AND row_key = ?"
+                " ORDER BY id DESC LIMIT 1", (table_name, partition_key, row_key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def oldest_pending(self):
+        """Timestamp of the oldest row not sent yet, or None if the spool is empty."""
+        with self._lock:
+            # Inverted RowKeys: the greatest is the oldest.
+            row_key = self._db.execute("SELECT MAX(row_key) FROM spool").fetchone()[0]
+        return row_key_ts(row_key) if row_key is not None else None
+
+    def flush(self):
+        """Send everything spooled; if a partition failed, raises once the others are sent."""
+        with self._lock:
+            groups = self._db.execute("SELECT DISTINCT table_name, partition FROM spool").fetchall()
+        sent = 0
+        error = None
+        for table_name, partition in groups:
+            try:
+                sent += self._flush_partition(table_name, partition)
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+        return sent
+
+    def _flush_partition(self, table_name, partition):
+        table_client = self.table_clients[table_name]
+        sent = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, body FROM spool WHERE table_name = ? AND partition = ?"
+                    " ORDER BY id LIMIT ?", (table_name, partition, BATCH_SIZE)).fetchall()
+            if not rows:
+                return sent
+            # A transaction may not touch the same row twice; keep the newest version.
+            latest, ids = {}, {}
+            for row_id, body in rows:
+                entity = json.loads(body)
+                latest[entity["RowKey"]] = entity
+                ids.setdefault(entity["RowKey"], []).append(row_id)
+            try:
+                self._submit(table_client, list(latest.values()))
+            except Exception as e:
+                if not is_rejected(e):
+                    raise
+                # One bad row fails the whole transaction; send them one by one to find it.
+                for row_key, entity in latest.items():
+                    try:
+                        self._submit(table_client, [entity])
+                    except Exception as e:
+                        if not is_rejected(e):
+                            raise
+                        self._dead_letter(table_name, entity, ids[row_key], e)
+                        continue
+                    self._delete(ids[row_key])
+                    sent += 1
+                continue
+            self._delete([row_id for row_id, _ in rows])
+            sent += len(latest)
+
+    def _submit(self, table_client, entities):
+        self.requests += 1
+        table_client.submit_transaction([("upsert", entity) for entity in entities])
+        self.rows_sent += len(entities)
+
+    def _delete(self, row_ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM spool WHERE id = ?", [(row_id,) for row_id in row_ids])
+            self._db.commit()
+
+    def _dead_letter(self, table_name, entity, row_ids, error):
+        print(f"[SPOOL] {table_name} row {entity['PartitionKey']}/{entity['RowKey']} rejected, "
+              f"moved to dead_letter: {error}")
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO dead_letter (table_name, partition, row_key, body, error, failed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (table_name, entity["PartitionKey"], entity["RowKey"], json.dumps(entity), repr(error),
+                 time.time()))
+            self._db.executemany("DELETE FROM spool WHERE id = ?", [(row_id,) for row_id in row_ids])
+            self._db.commit()
+
+    def dead_letters(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def held_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM held").fetchone()[0]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        delay = self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+                delay = self.flush_interval
+            except Exception as e:
+                self.failures += 1
+                delay = min(max(delay, self.flush_interval) * 2, self.max_backoff)
+                print(f"[SPOOL] Flush failed, {self.pending()} rows kept, retrying in {delay:.0f}s: {e}")
+
+    def stats(self):
+        return {"pending": self.pending(), "requests": self.requests,
+                "rows_sent": self.rows_sent, "failures": self.failures, "dead_letters": self.dead_letters(),
+                "held": self.held_count()}
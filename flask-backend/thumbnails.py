@@ -0,0 +1,86 @@
+"""Thumbnail and preview derivatives of uploaded images.
+
+Every image uploaded as `plant_<id>_<stamp>.jpg` also gets a small WebP
+thumbnail under `thumbs/` and a medium JPEG preview under `previews/`, so
+/analytics can show the gallery without downloading originals. Variants
+the original is already smaller than are skipped. Resizing and encoding run
+on a small thread pool (OpenCV releases the GIL), off the capture path; if
+`max_pending` images are already waiting, new ones are skipped rather than
+queued without limit.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+WORKERS = 2
+MAX_PENDING = 10
+# (variant, max width, extension, encode params)
+VARIANTS = (
+    ("thumb", 320, ".webp", [cv2.IMWRITE_WEBP_QUALITY, 70]),
+    ("preview", 1024, ".jpg", [cv2.IMWRITE_JPEG_QUALITY, 80]),
+)
+
+
+def variant_name(blob_name, variant):
+    """Blob name of a variant, e.g. thumbs/plant_1_20250101_120000.webp."""
+    for name, _, ext, _ in VARIANTS:
+        if name == variant:
+            return f"{variant}s/{os.path.splitext(blob_name)[0]}{ext}"
+    raise KeyError(variant)
+
+
+def make_derivatives(data, frame=None):
+    """Return {variant: encoded bytes}; pass the decoded `frame` if the caller has it."""
+    if frame is None:
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("not a decodable image")
+    height, width = frame.shape[:2]
+    derivatives = {}
+    for variant, max_width, ext, params in VARIANTS:
+        if width <= max_width:
+            continue
+        size = (max_width, round(height * max_width / width))
+        resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(ext, resized, params)
+        if ok:
+            derivatives[variant] = encoded.tobytes()
+    return derivatives
+
+
+class DerivativeWorker:
+    """Builds variants in the background and hands each to `upload(original, variant, data)`."""
+
+    def __init__(self, upload, workers=WORKERS, max_pending=MAX_PENDING):
+        self.upload = upload
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbs")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+        self.generated = 0
+        self.skipped = 0
+
+    def submit(self, blob_name, data, frame=None):
+        """Queue variants for `blob_name`; returns False if the worker is saturated."""
+        if not self._slots.acquire(blocking=False):
+            self.skipped += 1
+            print(f"Thumbnail queue full, skipping {blob_name}")
+            return False
+        self._executor.submit(self._run, blob_name, data, frame)
+        return True
+
+    def _run(self, blob_name, data, frame):
+        try:
+            derivatives = make_derivatives(data, frame)
+            for variant, payload in derivatives.items():
+                self.upload(blob_name, variant, payload)
+            self.generated += 1
+        except Exception as e:
+            print(f"Error creating thumbnails for {blob_name}: {e}")
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
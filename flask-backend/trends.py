@@ -0,0 +1,214 @@
+"""Trend, drying-rate and glitch detection over the window rows of every sensor.
+
+A TrendEngine follows a set of series in the local ColumnStore (e.g. the
+`moisture` field of `moisture-1`, `Temperature` of `temperature`). It keeps
+the last `history` seconds of each one on a shared time grid of `step`
+seconds in a single NumPy matrix, one row per tracked series, and pulls
+only the rows appended since its previous look, so months of stored data
+cost nothing after the first load. analyze() then computes everything for
+all series in one vectorized pass:
+
+* smoothed value: median of the last SMOOTH_ROWS rows
+* mean/std over the last hour, min/max over the last day
+* rate_per_hour: least-squares slope over the last SLOPE_SECONDS
+* glitches_24h: isolated spikes, rows that jump more than ANOMALY_SIGMAS
+  robust standard deviations (1.4826 * median absolute step) away from
+  both neighbours; anomaly: the newest row jumped that far from both the
+  row before it and `smoothed` (it may still turn out to be a step change)
+* with a threshold (plant moisture): `state` "dry"/"ok" with hysteresis
+  (dry below the threshold, ok again only above threshold * (1 +
+  HYSTERESIS), so a reading hovering at the threshold doesn't flap;
+  glitches are ignored) and hours_until_dry, extrapolated from the
+  drying rate
+
+Results are cached until new rows arrive or the grid moves on a step, so
+callers may ask on every request.
+"""
+import threading
+import time
+import warnings
+
+import numpy as np
+
+STEP = 60
+HISTORY = 24 * 3600
+SMOOTH_ROWS = 15
+SLOPE_SECONDS = 6 * 3600
+MIN_SLOPE_ROWS = 30
+ANOMALY_SIGMAS = 6.0
+MIN_SIGMA = 0.01
+HYSTERESIS = 0.05
+MAX_FORECAST_HOURS = 24 * 14
+
+
+def _round(value, digits=2):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _last_true(mask):
+    """Index of the last True in each row of `mask`, -1 for rows without one."""
+    last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return np.where(mask.any(axis=1), last, -1)
+
+
+class TrendEngine:
+    def __init__(self, store, step=STEP, history=HISTORY, clock=time.time):
+        self.store = store
+        self.step = step
+        self.rows = int(history // step)
+        self.clock = clock
+        self._names = []
+        self._sources = []
+        self._thresholds = []
+        self._values = np.empty((0, self.rows))
+        self._steps = np.empty((0, self.rows), dtype=np.int64)
+        self._last_ts = []
+        self._result = None
+        self._result_step = None
+        self._lock = threading.Lock()
+
+        self.rows_loaded = 0
+        self.analyses = 0
+        self.analyze_seconds_total = 0.0
+
+    def track(self, name, series, field, threshold=None):
+        """Follow `field` of the stored `series` as `name`; a threshold adds state and hours_until_dry."""
+        with self._lock:
+            if name in self._names:
+                raise ValueError(f"{name} is already tracked")
+            self._names.append(name)
+            self._sources.append((series, field))
+            self._thresholds.append(np.nan if threshold is None else float(threshold))
+            self._values = np.vstack([self._values, np.full(self.rows, np.nan)])
+            self._steps = np.vstack([self._steps, np.full(self.rows, -1, dtype=np.int64)])
+            self._last_ts.append(None)
+            self._result = None
+
+    def _refresh(self, now):
+        """Copy rows appended to the store since the last call into the grid; True if there were any."""
+        changed = False
+        for i, (series, field) in enumerate(self._sources):
+            last_ts = self._last_ts[i]
+            start_ts = now - self.rows * self.step if last_ts is None else last_ts
+            try:
+                columns = self.store.columns(series, start_ts, None, [field], numpy=True)
+            except KeyError:
+                continue
+            times, values = columns["t"], columns.get(field)
+            if values is None:
+                continue
+            if last_ts is not None:
+                newer = times > last_ts
+                times, values = times[newer], values[newer]
+            if not len(times):
+                continue
+            steps = (times // self.step).astype(np.int64)
+            slots = steps % self.rows
+            self._values[i, slots] = values
+            self._steps[i, slots] = steps
+            self._last_ts[i] = float(times[-1])
+            self.rows_loaded += len(times)
+            changed = True
+        return changed
+
+    def analyze(self):
+        """{name: trend} for every tracked series, recomputed only when something changed."""
+        with self._lock:
+            now = self.clock()
+            current = int(now // self.step)
+            if not self._refresh(now) and self._result is not None and self._result_step == current:
+                return self._result
+            started = time.perf_counter()
+            self._result = self._analyze(now, current)
+            self._result_step = current
+            self.analyses += 1
+            self.analyze_seconds_total += time.perf_counter() - started
+            return self._result
+
+    def trend(self, name):
+        return self.analyze().get(name)
+
+    def _analyze(self, now, current):
+        if not self._names:
+            return {}
+        # Oldest step first; slots not written during the last `rows` steps are gaps.
+        expected = np.arange(current - self.rows + 1, current + 1)
+        slots = expected % self.rows
+        values = np.where(self._steps[:, slots] == expected, self._values[:, slots], np.nan)
+        present = ~np.isnan(values)
+        thresholds = np.array(self._thresholds)
+        hour = max(1, 3600 // self.step)
+        slope_rows = max(2, SLOPE_SECONDS // self.step)
+
+        with warnings.catch_warnings():
+            # All-NaN rows (series without recent data) come out as NaN.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            last = _last_true(present)
+            latest = values[np.arange(len(values)), last]
+            smoothed = np.nanmedian(values[:, -SMOOTH_ROWS:], axis=1)
+            mean_1h = np.nanmean(values[:, -hour:], axis=1)
+            std_1h = np.nanstd(values[:, -hour:], axis=1)
+            low, high = np.nanmin(values, axis=1), np.nanmax(values, axis=1)
+
+            # Drying rate: weighted least squares over the rows present in the slope window.
+            tail = values[:, -slope_rows:]
+            weight = ~np.isnan(tail)
+            x = np.arange(slope_rows, dtype=float)
+            n = weight.sum(axis=1)
+            x_mean = (weight * x).sum(axis=1) / n
+            y_mean = np.nansum(tail, axis=1) / n
+            dx = np.where(weight, x - x_mean[:, None], 0.0)
+            dy = np.where(weight, tail - y_mean[:, None], 0.0)
+            slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+            rate = np.where(n >= MIN_SLOPE_ROWS, slope * 3600 / self.step, np.nan)
+
+            # Spikes: rows far from both neighbours in the same direction (a step change is not one).
+            sigma = 1.4826 * np.nanmedian(np.abs(np.diff(values, axis=1)), axis=1)
+            # Quantized, mostly flat series have no step noise at all; allow 1% of their level.
+            sigma = np.fmax(sigma, MIN_SIGMA * np.abs(np.nanmedian(values, axis=1)))
+            limit = ANOMALY_SIGMAS * np.maximum(sigma, 1e-9)[:, None]
+            rise = values[:, 1:-1] - values[:, :-2]
+            fall = values[:, 1:-1] - values[:, 2:]
+            spikes = (np.abs(rise) > limit) & (np.abs(fall) > limit) & (np.sign(rise) == np.sign(fall))
+            glitches = spikes.sum(axis=1)
+            previous = values[np.arange(len(values)), last - 1]
+            anomaly = (np.abs(latest - smoothed) > limit[:, 0]) & (np.abs(latest - previous) > limit[:, 0])
+            clean = values.copy()
+            clean[:, 1:-1][spikes] = np.nan
+            clean[anomaly, last[anomaly]] = np.nan
+
+            # Hysteresis: the later of entering and leaving "dry" wins.
+            entered = _last_true(clean < thresholds[:, None])
+            left = _last_true(clean > (thresholds * (1 + HYSTERESIS))[:, None])
+            dry = np.where((entered < 0) & (left < 0), smoothed < thresholds, entered > left)
+            hours = np.where(smoothed <= thresholds, 0.0,
+                             np.where(rate < 0, (smoothed - thresholds) / -rate, np.inf))
+
+        result = {}
+        for i, name in enumerate(self._names):
+            if last[i] < 0:
+                result[name] = None
+                continue
+            trend = {
+                "latest": _round(latest[i]),
+                "age": int(now - self._last_ts[i]),
+                "smoothed": _round(smoothed[i]),
+                "mean_1h": _round(mean_1h[i]),
+                "std_1h": _round(std_1h[i], 3),
+                "min_24h": _round(low[i]),
+                "max_24h": _round(high[i]),
+                "rate_per_hour": _round(rate[i], 3),
+                "anomaly": bool(anomaly[i]),
+                "glitches_24h": int(glitches[i]),
+            }
+            if not np.isnan(thresholds[i]):
+                trend["state"] = "dry" if dry[i] else "ok"
+                trend["hours_until_dry"] = _round(hours[i], 1) if hours[i] <= MAX_FORECAST_HOURS else None
+            result[name] = trend
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"series": list(self._names), "rows_loaded": self.rows_loaded, "analyses": self.analyses,
+                    "avg_analyze_ms": round(self.analyze_seconds_total / self.analyses * 1000, 2)
+                    if self.analyses else None}
@@ -0,0 +1,107 @@
+"""Bounded background queue for Blob Storage uploads.
+
+Routes and the capture job hand encoded images to UploadQueue.submit(),
+which returns a job ID at once; a thread pool uploads them, `workers` at a
+time, each as a block blob staged with `max_concurrency` parallel block
+uploads (block sizes come from the BlobServiceClient). At most
+`max_pending` jobs may be queued or in flight; past that, submit() raises
+queue.Full so callers can push back instead of buffering without limit.
+Finished jobs are kept for status queries until `history` newer ones exist.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+UPLOAD_WORKERS = 2
+MAX_PENDING = 20
+BLOCK_CONCURRENCY = 4
+JOB_HISTORY = 200
+
+
+class UploadQueue:
+    def __init__(self, container_client, workers=UPLOAD_WORKERS, max_pending=MAX_PENDING,
+                 max_concurrency=BLOCK_CONCURRENCY, history=JOB_HISTORY):
+        self.container_client = container_client
+        self.max_concurrency = max_concurrency
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+
+    def submit(self, blob_name, data, on_done=None):
+        """Queue `data` for upload as `blob_name`; returns the job ID.
+
+        `on_done(job)` runs on the worker thread after a successful upload.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise queue.Full(f"{len(self._jobs)} uploads pending")
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._jobs[job_id] = {"id": job_id, "blob": blob_name, "bytes": len(data),
+                                  "state": "queued", "queued_at": time.time(),
+                                  "started_at": None, "finished_at": None, "error": None}
+        self._executor.submit(self._run, job_id, data, on_done)
+        return job_id
+
+    def _run(self, job_id, data, on_done):
+        job = self._jobs[job_id]
+        job["state"] = "in_flight"
+        job["started_at"] = time.time()
+        try:
+            blob_client = self.container_client.get_blob_client(job["blob"])
+            blob_client.upload_blob(data, overwrite=True, max_concurrency=self.max_concurrency)
+            job["state"] = "done"
+        except Exception as e:
+            print(f"Azure Upload Error: {e}")
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+            self._slots.release()
+            self._prune()
+        if job["state"] == "done" and on_done is not None:
+            try:
+                on_done(job)
+            except Exception as e:
+                print(f"Error after uploading {job['blob']}: {e}")
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items()
+                        if job["state"] in ("done", "failed")]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[job_id]
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def summary(self, recent=20):
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values()]
+        counts = {"queued": 0, "in_flight": 0, "done": 0, "failed": 0}
+        for job in jobs:
+            counts[job["state"]] += 1
+        counts["rejected"] = self.rejected
+        return {"counts": counts, "jobs": jobs[-recent:]}
+
+    def wait(self, timeout=None):
+        """Block until nothing is queued or in flight; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                busy = any(job["state"] in ("queued", "in_flight") for job in self._jobs.values())
+            if not busy:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
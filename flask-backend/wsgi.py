@@ -0,0 +1,16 @@
+"""Production entry point: several web workers, exactly one of them running the hardware.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every worker imports app.py, runs startup() and serves requests.
+elect_leader() lets one of them (whichever takes data/leader.lock first)
+start the sensors, cameras, telemetry shipping and scheduled jobs; the
+others forward capture requests and local plant readings to it on
+app.LEADER_PORT, and one of them takes over if it dies. `python app.py`
+still runs everything in one process.
+"""
+import app as hub
+
+hub.startup()
+hub.elect_leader()
+app = hub.app